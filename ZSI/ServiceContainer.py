@@ -11,11 +11,15 @@ from ZSI import _get_idstr
 from ZSI.address import Address
 from ZSI.parse import ParsedSoap
 from ZSI.writer import SoapWriter
+from ZSI.diagnostics import PhaseTimings, accept_request_id
+from ZSI.telemetry import traced
 from ZSI.dispatch import _ModPythonSendXML, _ModPythonSendFault, _CGISendXML, _CGISendFault
 from ZSI.dispatch import SOAPRequestHandler as BaseSOAPRequestHandler
 
 """
 Functions:
+    _GetOperation
+    _SerializeResponse
     _Dispatch
     AsServer
     GetSOAPContext
@@ -43,7 +47,7 @@ class ServiceAlreadyPresent(Exception): pass
 
 class SOAPContext:
     def __init__(self, container, xmldata, ps, connection, httpheaders,
-                 soapaction):
+                 soapaction, timings=None):
 
         self.container = container
         self.xmldata    = xmldata
@@ -51,94 +55,104 @@ class SOAPContext:
         self.connection = connection
         self.httpheaders= httpheaders
         self.soapaction = soapaction
+        self.timings    = timings
 
 _contexts = dict()
 def GetSOAPContext():
     global _contexts
     return _contexts[_thread.get_ident()]
 
-def _Dispatch(ps, server, SendResponse, SendFault, post, action, nsdict={}, **kw):
-    '''Send ParsedSoap instance to ServiceContainer, which dispatches to
-    appropriate service via post, and method via action.  Response is a
-    self-describing pyobj, which is passed to a SoapWriter.
-
-    Call SendResponse or SendFault to send the reply back, appropriately.
-        server -- ServiceContainer instance
-
+def _GetOperation(ps, service, post, action, localURL):
+    '''Map a request to an operation of service, as _Dispatch does.
+    Returns (method, args, action, address): call method(*args); action
+    is the WS-Action of a WSAResource request, address its Address.
+    Raises NotAuthorized if the service does not authorize the request.
     '''
-    localURL = 'http://%s:%d%s' %(server.server_name,server.server_port,post)
     address = action
-    service = server.getNode(post)
-    isWSResource = False
-    if isinstance(service, WSAResource):
-        isWSResource = True
+    isWSResource = isinstance(service, WSAResource)
+    if isWSResource:
         service.setServiceURL(localURL)
         address = Address()
-        try:
-            address.parse(ps)
-        except Exception as e:
-            return SendFault(FaultFromException(e, 0, sys.exc_info()[2]), **kw)
+        address.parse(ps)
         if action and action != address.getAction():
-            e = WSActionException('SOAP Action("%s") must match WS-Action("%s") if specified.' \
+            raise WSActionException('SOAP Action("%s") must match WS-Action("%s") if specified.' \
                 %(action,address.getAction()))
-            return SendFault(FaultFromException(e, 0, None), **kw)
         action = address.getAction()
 
     if isinstance(service, ServiceInterface) is False:
-        e = NoSuchService('no service at POST(%s) in container: %s' %(post,server))
-        return SendFault(FaultFromException(e, 0, sys.exc_info()[2]), **kw)
+        raise NoSuchService('no service at POST(%s)' %post)
 
     if not service.authorize(None, post, action):
-        return SendFault(Fault(Fault.Server, "Not authorized"), code=401)
-        #try:
-        #    raise NotAuthorized()
-        #except Exception, e:
-            #return SendFault(FaultFromException(e, 0, None), code=401, **kw)
-            ##return SendFault(FaultFromException(NotAuthorized(), 0, None), code=401, **kw)
+        raise NotAuthorized()
+
+    method = service.getOperation(ps, address)
+    if isWSResource:
+        return method, (ps, address), action, address
+    return method, (ps,), action, address
+
+def _SerializeResponse(sw, ps, service, result, action, address, localURL):
+    '''Serialize the result of an operation of service into sw, with
+    the WS-Addressing reply headers of a WSAResource, and sign it.
+    '''
+    sw.serialize(result)
+    if isinstance(service, WSAResource):
+        action = service.getResponseAction(ps, action)
+        addressRsp = Address(action=action)
+        addressRsp.setResponseFromWSAddress(address, localURL)
+        addressRsp.serialize(sw)
 
+    # Create Signatures
+    service.sign(sw)
+
+@traced("zsi.dispatch", phase="dispatch")
+def _Dispatch(ps, server, SendResponse, SendFault, post, action, nsdict={},
+              timings=None, **kw):
+    '''Send ParsedSoap instance to ServiceContainer, which dispatches to
+    appropriate service via post, and method via action.  Response is a
+    self-describing pyobj, which is passed to a SoapWriter.
+
+    Call SendResponse or SendFault to send the reply back, appropriately.
+        server -- ServiceContainer instance
+        timings -- ZSI.diagnostics.PhaseTimings; the dispatch and serialize
+            phases are marked on it.
+
+    '''
+    localURL = 'http://%s:%d%s' %(server.server_name,server.server_port,post)
+    service = server.getNode(post)
     try:
-        method = service.getOperation(ps, address)
+        method, args, action, address = _GetOperation(ps, service, post, action, localURL)
+    except NotAuthorized:
+        return SendFault(Fault(Fault.Server, "Not authorized"), code=401)
     except Exception as e:
         return SendFault(FaultFromException(e, 0, sys.exc_info()[2]), **kw)
 
     try:
-        if isWSResource is True:
-            request,result = method(ps, address)
-        else:
-            request,result = method(ps)
+        request,result = method(*args)
     except Exception as e:
         return SendFault(FaultFromException(e, 0, sys.exc_info()[2]), **kw)
 
     # Verify if Signed
     service.verify(ps)
+    if timings is not None:
+        timings.mark('dispatch')
 
     # If No response just return.
     if result is None:
         return SendResponse('', **kw)
 
-    sw = SoapWriter(nsdict=nsdict)
-    try:
-        sw.serialize(result)
-    except Exception as e:
-        return SendFault(FaultFromException(e, 0, sys.exc_info()[2]), **kw)
-
-    if isWSResource is True:
-        action = service.getResponseAction(ps, action)
-        addressRsp = Address(action=action)
+    with SoapWriter(nsdict=nsdict) as sw:
         try:
-            addressRsp.setResponseFromWSAddress(address, localURL)
-            addressRsp.serialize(sw)
+            _SerializeResponse(sw, ps, service, result, action, address, localURL)
         except Exception as e:
             return SendFault(FaultFromException(e, 0, sys.exc_info()[2]), **kw)
 
-    # Create Signatures
-    service.sign(sw)
-
-    try:
-        soapdata = str(sw)
-        return SendResponse(soapdata, **kw)
-    except Exception as e:
-        return SendFault(FaultFromException(e, 0, sys.exc_info()[2]), **kw)
+        try:
+            soapdata = str(sw)
+            if timings is not None:
+                timings.mark('serialize')
+            return SendResponse(soapdata, **kw)
+        except Exception as e:
+            return SendFault(FaultFromException(e, 0, sys.exc_info()[2]), **kw)
 
 
 def AsServer(port=80, services=(), secure=None, certfile=None, keyfile=None):
@@ -332,7 +346,9 @@ class SOAPRequestHandler(BaseSOAPRequestHandler):
         '''The POST command.
         action -- SOAPAction(HTTP header) or wsa:Action(SOAP:Header)
         '''
-        soapAction = self.headers.getheader('SOAPAction')
+        timings = self.timings = PhaseTimings(
+            accept_request_id(self.headers.get('X-Request-Id')))
+        soapAction = self.headers.get('SOAPAction')
         post = self.path
         if not post:
             raise PostNotSpecified('HTTP POST not specified in request')
@@ -342,13 +358,15 @@ class SOAPRequestHandler(BaseSOAPRequestHandler):
         try:
             ct = self.headers['content-type']
             if ct.startswith('multipart/'):
-                cid = resolvers.MIMEResolver(ct, self.rfile)
+                cid = resolvers.MIMEResolver(ct, self.body_stream())
                 xml = cid.GetSOAPPart()
+                timings.mark('receive')
                 ps = ParsedSoap(xml, resolver=cid.Resolve)
             else:
-                length = int(self.headers['content-length'])
-                xml = self.rfile.read(length)
+                xml = self.read_body()
+                timings.mark('receive')
                 ps = ParsedSoap(xml)
+            timings.mark('parse')
         except ParseException as e:
             self.send_fault(FaultFromZSIException(e))
         except Exception as e:
@@ -357,19 +375,20 @@ class SOAPRequestHandler(BaseSOAPRequestHandler):
         else:
             # Keep track of calls
             thread_id = _thread.get_ident()
-            _contexts[thread_id] = SOAPContext(self.server, xml, ps,
-                                               self.connection,
-                                               self.headers, soapAction)
-
-            try:
-                _Dispatch(ps, self.server, self.send_xml, self.send_fault,
-                    post=post, action=soapAction)
-            except Exception as e:
-                self.send_fault(FaultFromException(e, 0, sys.exc_info()[2]))
-
-            # Clean up after the call
-            if thread_id in _contexts:
-                del _contexts[thread_id]
+            with ps:
+                _contexts[thread_id] = SOAPContext(self.server, xml, ps,
+                                                   self.connection,
+                                                   self.headers, soapAction,
+                                                   timings)
+                try:
+                    try:
+                        _Dispatch(ps, self.server, self.send_xml, self.send_fault,
+                            post=post, action=soapAction, timings=timings)
+                    except Exception as e:
+                        self.send_fault(FaultFromException(e, 0, sys.exc_info()[2]))
+                finally:
+                    # Clean up after the call
+                    _contexts.pop(thread_id, None)
 
     def do_GET(self):
         '''The GET command.
@@ -6,7 +6,7 @@
 from ZSI import _copyright, _children, _child_elements, \
     _floattypes, _stringtypes, _seqtypes, _find_attrNodeNS, \
     _find_arraytype, _find_href, _find_encstyle, \
-    _resolve_prefix, _find_xsi_attr, _find_type, \
+    _find_xsi_attr, _find_type, \
     _get_element_nsuri_name, _get_idstr, \
     _Node, EvaluateException, UNICODE_ENCODING, \
     _valid_encoding, ParseException
@@ -15,16 +15,19 @@ from ZSI.wstools.Namespaces import SCHEMA, SOAP
 from ZSI.wstools.Utility import SplitQName
 from ZSI.wstools.logging import getLogger as _GetLogger
 
+import math
 import re
 import types
 import time
 import copy
 
-from base64 import b64decode, b64encode
+from base64 import b64decode
 from urllib.parse import unquote as urldecode, quote as urlencode
-from binascii import unhexlify as hexdecode, hexlify as hexencode
+from binascii import unhexlify as hexdecode, \
+    a2b_base64, b2a_base64, a2b_hex, b2a_hex, Error as _BinasciiError
 
-from io import StringIO
+from io import BytesIO, StringIO
+from tempfile import SpooledTemporaryFile
 
 _is_xsd_or_soap_ns = lambda ns: ns in set((SCHEMA.XSD3, SOAP.ENC, SOAP.ENC12, SCHEMA.XSD1, SCHEMA.XSD2))
 _find_nil = lambda E: _find_xsi_attr(E, "null") or _find_xsi_attr(E, "nil")
@@ -215,7 +218,7 @@ class TypeCode:
         # Parse the QNAME.
         prefix, typeName = SplitQName(typeName)
         # Use '' for default namespace with ParsedSoap
-        uri = ps.GetElementNSdict(elt).get(prefix or '')
+        uri = ps.GetElementNSScope(elt).get(prefix or '')
         if uri is None:
             raise EvaluateException('Malformed type attribute (bad NS)',
                     ps.Backtrace(elt))
@@ -259,6 +262,12 @@ class TypeCode:
             ps -- the ParsedSoap object.
             mixed -- ignore element content, optional text node
         '''
+        return ''.join(self.simple_value_chunks(elt, ps, mixed))
+
+    def simple_value_chunks(self, elt, ps, mixed=False):
+        '''Like simple_value, but return the list of text node values
+        instead of joining them.
+        '''
         if not _valid_encoding(elt):
             raise EvaluateException('Invalid encoding', ps.Backtrace(elt))
         c = _children(elt)
@@ -272,9 +281,9 @@ class TypeCode:
 
         # It *seems* to be consensus that ignoring comments and
         # concatenating the text nodes is the right thing to do.
-        return ''.join([E.nodeValue for E in c
+        return [E.nodeValue for E in c
                 if E.nodeType
-                in [_Node.TEXT_NODE, _Node.CDATA_SECTION_NODE]])
+                in [_Node.TEXT_NODE, _Node.CDATA_SECTION_NODE]]
 
     def parse_attributes(self, elt, ps):
         '''find all attributes specified in the attribute_typecode_dict in
@@ -431,13 +440,11 @@ class SimpleType(TypeCode):
             if self.nilled(elt, ps):
                 return Nilled
             if len(_children(elt)) == 0:
-                v = self.empty_content
+                pyobj = self.text_to_data(self.empty_content, elt, ps)
             else:
-                v = self.simple_value(elt, ps)
+                pyobj = self.content_to_data(elt, ps)
         else:
-            v = self.simple_value(elt, ps)
-
-        pyobj = self.text_to_data(v, elt, ps)
+            pyobj = self.content_to_data(elt, ps)
 
         # parse all attributes contained in attribute_typecode_dict
         # (user-defined attributes), the values (if not None) will
@@ -449,6 +456,24 @@ class SimpleType(TypeCode):
 
         return pyobj
 
+    def content_to_data(self, elt, ps):
+        '''Convert the content of a non-empty element; subclasses that
+        can consume the text nodes one at a time override this.
+        '''
+        return self.text_to_data(self.simple_value(elt, ps), elt, ps)
+
+    def parse_text_list(self, texts, elts, ps):
+        '''Convert the text of several simple elements at once; used by
+        Array for items that have no attributes, href or element content.
+        Returns the list of values, or None when the items must go through
+        parse() one at a time (e.g. to report an error).
+        Parameters:
+            texts -- list of element text, as returned by simple_value
+            elts -- the corresponding DOM elements
+            ps -- the ParsedSoap object.
+        '''
+        return [self.text_to_data(t, e, ps) for t, e in zip(texts, elts)]
+
     def get_formatted_content(self, pyobj):
         raise NotImplementedError('method get_formatted_content is not implemented')
 
@@ -753,6 +778,14 @@ class String(SimpleType):
             return self.pyclass(text)
         return text
 
+    def parse_text_list(self, texts, elts, ps):
+        if self.pyclass is not None or \
+                type(self).text_to_data is not String.text_to_data:
+            return SimpleType.parse_text_list(self, texts, elts, ps)
+        if self.strip:
+            return [t.strip() for t in texts]
+        return list(texts)
+
     def get_formatted_content(self, pyobj):
         if isinstance(pyobj, bytes):
             return pyobj.decode(UNICODE_ENCODING, errors='replace')
@@ -818,7 +851,7 @@ class QName(String):
         '''convert text into typecode specific data.
         '''
         prefix, localName = SplitQName(text)
-        nsdict = ps.GetElementNSdict(elt)
+        nsdict = ps.GetElementNSScope(elt)
         prefix = prefix or ''
         try:
             namespaceURI = nsdict[prefix]
@@ -846,81 +879,227 @@ class Token(String):
     logger = _GetLogger('ZSI.TC.Token')
 
 
-class Base64String(String):
+class _BinaryString(String):
+    '''Base for the binary encoded string types.
+
+    With binary=True the content is decoded text node by text node into
+    bytes; with spool_threshold it goes into a SpooledTemporaryFile
+    (rewound, kept in memory up to spool_threshold bytes).  Serialization
+    accepts bytes-like and file-like objects and appends the encoded
+    content as a series of text nodes, chunk_size bytes at a time.
+    Class data:
+        binary -- default for the binary keyword argument
+        chunk_size -- bytes encoded per text node
+        quantum -- characters decoded as a unit
+        encodings -- tried in order to encode str values
+        prefix -- text written before the encoded content
+    '''
+    binary = False
+    chunk_size = 3 << 14
+    quantum = 1
+    encodings = ('latin-1', UNICODE_ENCODING)
+    prefix = ''
+
+    def __init__(self, pname=None, binary=None, spool_threshold=None, **kw):
+        String.__init__(self, pname, **kw)
+        if binary is not None:
+            self.binary = binary
+        self.spool_threshold = spool_threshold
+        if spool_threshold is not None:
+            self.binary = True
+
+    def decode(self, text):
+        '''text (a multiple of quantum characters) --> bytes
+        '''
+        raise NotImplementedError('method decode is not implemented')
+
+    def encode(self, data):
+        '''bytes-like --> str
+        '''
+        raise NotImplementedError('method encode is not implemented')
+
+    def aligned_chunks(self, chunks):
+        '''Generate the text of chunks without whitespace, in pieces of
+        a multiple of quantum characters (except possibly the last).
+        '''
+        carry, step = '', self.quantum << 16
+        for chunk in chunks:
+            for i in range(0, len(chunk), step):
+                text = carry + ''.join(chunk[i:i+step].split())
+                n = len(text) - len(text) % self.quantum
+                carry = text[n:]
+                yield text[:n]
+        if carry:
+            yield carry
+
+    def decode_chunks(self, chunks):
+        '''Decode a list of text chunks piece by piece into a BytesIO,
+        whose buffer becomes the returned bytes without a copy, or into
+        a SpooledTemporaryFile if spool_threshold is set.
+        '''
+        if self.spool_threshold is not None:
+            out = SpooledTemporaryFile(max_size=self.spool_threshold)
+        else:
+            out = BytesIO()
+        for text in self.aligned_chunks(chunks):
+            out.write(self.decode(text))
+        if self.spool_threshold is None:
+            return out.getvalue()
+        out.seek(0)
+        return out
+
+    def content_to_data(self, elt, ps):
+        if not self.binary:
+            return String.content_to_data(self, elt, ps)
+        chunks = self.simple_value_chunks(elt, ps)
+        try:
+            val = self.decode_chunks(chunks)
+        except (_BinasciiError, ValueError):
+            # Let text_to_data decode (or reject) the content as a whole.
+            return self.text_to_data(''.join(chunks), elt, ps)
+        if self.pyclass is not None:
+            return self.pyclass(val)
+        return val
+
+    def to_bytes(self, pyobj):
+        '''pyobj --> bytes-like or file-like object
+        '''
+        if isinstance(pyobj, str):
+            for encoding in self.encodings[:-1]:
+                try:
+                    return pyobj.encode(encoding)
+                except UnicodeEncodeError:
+                    pass
+            return pyobj.encode(self.encodings[-1])
+        if isinstance(pyobj, (bytes, bytearray, memoryview)) or \
+                hasattr(pyobj, 'read'):
+            return pyobj
+        return str(pyobj).encode(UNICODE_ENCODING)
+
+    def iter_formatted_content(self, pyobj):
+        '''Generate the encoded content of pyobj, chunk_size bytes at a time.
+        '''
+        data = self.to_bytes(pyobj)
+        if hasattr(data, 'read'):
+            blocks = self._read_blocks(data)
+        else:
+            view = memoryview(data).cast('B')
+            blocks = (view[i:i+self.chunk_size]
+                      for i in range(0, len(view), self.chunk_size))
+
+        empty = True
+        for block in blocks:
+            yield (self.prefix if empty else '') + self.encode(block)
+            empty = False
+        if empty:
+            yield self.prefix
+
+    def _read_blocks(self, f):
+        # Base64 chunks only concatenate cleanly on 3 byte boundaries.
+        carry = b''
+        while True:
+            block = f.read(self.chunk_size)
+            if not block:
+                break
+            block = carry + block
+            n = len(block) - len(block) % 3
+            carry = block[n:]
+            if n:
+                yield block[:n]
+        if carry:
+            yield carry
+
+    def get_formatted_content(self, pyobj):
+        return ''.join(self.iter_formatted_content(pyobj))
+
+    def serialize_text_node(self, elt, sw, pyobj):
+        '''Append the encoded content a chunk at a time.
+        '''
+        textNode = None
+        if pyobj is not None:
+            for text in self.iter_formatted_content(pyobj):
+                textNode = elt.createAppendTextNode(text)
+        return textNode
+
+
+class _Base64(_BinaryString):
+    quantum = 4
+
+    def decode(self, text):
+        return a2b_base64(text)
+
+    def encode(self, data):
+        return b2a_base64(data, newline=False).decode('ascii')
+
+
+class Base64String(_Base64):
     '''A Base64 encoded string.
     '''
     parselist = [(None, 'base64Binary'), (SOAP.ENC, 'base64'), (SOAP.ENC12, 'base64')]
     type = (SOAP.ENC, 'base64')
     logger = _GetLogger('ZSI.TC.Base64String')
+    prefix = '\n'
 
     def text_to_data(self, text, elt, ps):
         '''convert text into typecode specific data.
         '''
+        if self.binary:
+            val = self.decode_chunks([text])
+            if self.pyclass is not None:
+                return self.pyclass(val)
+            return val
         val = b64decode(text.replace(' ', '').replace('\n', '').replace('\r', ''))
         if self.pyclass is not None:
             return self.pyclass(val)
         return val.decode('latin-1')
 
-    def get_formatted_content(self, pyobj):
-        if isinstance(pyobj, str):
-            try:
-                pyobj = pyobj.encode('latin-1')
-            except UnicodeEncodeError:
-                pyobj = pyobj.encode(UNICODE_ENCODING)
-        elif not isinstance(pyobj, bytes):
-            pyobj = str(pyobj).encode(UNICODE_ENCODING)
-        pyobj = '\n' + b64encode(pyobj).decode('ascii')
-        return String.get_formatted_content(self, pyobj)
-
 
-class Base64Binary(String):
+class Base64Binary(_Base64):
     parselist = [(None, 'base64Binary')]
     type = (SCHEMA.XSD3, 'base64Binary')
     logger = _GetLogger('ZSI.TC.Base64Binary')
+    binary = True
+    encodings = (UNICODE_ENCODING,)
 
     def text_to_data(self, text, elt, ps):
         '''convert text into typecode specific data.
         '''
-        val = b64decode(text)
+        if self.spool_threshold is not None:
+            val = self.decode_chunks([text])
+        else:
+            val = b64decode(text)
         if self.pyclass is not None:
             return self.pyclass(val)
         return val
 
-    def get_formatted_content(self, pyobj):
-        if isinstance(pyobj, str):
-            pyobj = pyobj.encode(UNICODE_ENCODING)
-        elif not isinstance(pyobj, bytes):
-            pyobj = str(pyobj).encode(UNICODE_ENCODING)
-        pyobj = b64encode(pyobj).strip().decode('ascii')
-        return pyobj
-
 
-class HexBinaryString(String):
+class HexBinaryString(_BinaryString):
     '''Hex-encoded binary (yuk).
     '''
     parselist = [(None, 'hexBinary')]
     type = (SCHEMA.XSD3, 'hexBinary')
     logger = _GetLogger('ZSI.TC.HexBinaryString')
+    quantum = 2
+
+    def decode(self, text):
+        return a2b_hex(text)
+
+    def encode(self, data):
+        return b2a_hex(data).upper().decode('ascii')
 
     def text_to_data(self, text, elt, ps):
         '''convert text into typecode specific data.
         '''
+        if self.binary:
+            val = self.decode_chunks([text])
+            if self.pyclass is not None:
+                return self.pyclass(val)
+            return val
         val = hexdecode(text)
         if self.pyclass is not None:
             return self.pyclass(val)
         return val.decode('latin-1')
 
-    def get_formatted_content(self, pyobj):
-        if isinstance(pyobj, str):
-            try:
-                pyobj = pyobj.encode('latin-1')
-            except UnicodeEncodeError:
-                pyobj = pyobj.encode(UNICODE_ENCODING)
-        elif not isinstance(pyobj, bytes):
-            pyobj = str(pyobj).encode(UNICODE_ENCODING)
-        pyobj = hexencode(pyobj).upper().decode('ascii')
-        return String.get_formatted_content(self, pyobj)
-
 
 class XMLString(String):
     '''A string that represents an XML document
@@ -1052,6 +1231,21 @@ class Integer(SimpleType):
                     ps.Backtrace(elt))
         return v
 
+    def parse_text_list(self, texts, elts, ps):
+        if self.pyclass is not None or \
+                type(self).text_to_data is not Integer.text_to_data:
+            values = SimpleType.parse_text_list(self, texts, elts, ps)
+        else:
+            try:
+                values = list(map(int, texts))
+            except ValueError:
+                return None
+        (rmin, rmax) = Integer.ranges.get(self.type[1], (_ignored, _ignored))
+        if values and ((rmin != _ignored and min(values) < rmin) or
+                       (rmax != _ignored and max(values) > rmax)):
+            return None
+        return values
+
     def get_formatted_content(self, pyobj):
         return self.format % pyobj
 
@@ -1207,6 +1401,30 @@ class Decimal(SimpleType):
             raise EvaluateException('Overflow', ps.Backtrace(elt))
         return fp
 
+    def parse_text_list(self, texts, elts, ps):
+        if self.pyclass is not None or \
+                type(self).text_to_data is not Decimal.text_to_data:
+            return None
+        (rtiny, rneg, rpos) = Decimal.ranges.get(self.__class__.type,
+                                                 (None, None, None))
+        (values, magic, zeropat) = ([], _magicnums.get, Decimal.zeropat)
+        try:
+            for v in texts:
+                m = magic(v)
+                if m:
+                    values.append(m)
+                    continue
+                fp = float(v)
+                if not math.isfinite(fp) or (fp == 0 and zeropat.search(v)):
+                    return None
+                if (rneg and fp < rneg) or (rtiny and 0 < fp < rtiny) or \
+                        (rpos and fp > rpos):
+                    return None
+                values.append(fp)
+        except ValueError:
+            return None
+        return values
+
     def get_formatted_content(self, pyobj):
         if pyobj == _magicnums['INF']:
             return 'INF'
@@ -1218,6 +1436,9 @@ class Decimal(SimpleType):
             return self.format % pyobj
 
 
+_boolean_values = {'true': True, 'false': False, '1': True, '0': False}
+
+
 class Boolean(SimpleType):
     '''A boolean.
     '''
@@ -1270,6 +1491,17 @@ class Boolean(SimpleType):
         v = self.simple_value(elt, ps).lower()
         return self.text_to_data(v, elt, ps)
 
+    def parse_text_list(self, texts, elts, ps):
+        if self.pyclass is not None or \
+                type(self).text_to_data is not Boolean.text_to_data:
+            return SimpleType.parse_text_list(self, [t.lower() for t in texts],
+                                              elts, ps)
+        values = _boolean_values
+        try:
+            return [values[t.lower()] for t in texts]
+        except KeyError:
+            return None
+
     def get_formatted_content(self, pyobj):
         if pyobj:
             return 'true'
@@ -1437,7 +1669,7 @@ class AnyType(TypeCode):
 
         #locate xsi:type
         prefix, typeName = SplitQName(_find_type(elt))
-        namespaceURI = _resolve_prefix(elt, prefix)
+        namespaceURI = ps.ResolvePrefix(elt, prefix)
         pyclass = GTD(namespaceURI, typeName)
         if not pyclass:
             if _is_xsd_or_soap_ns(namespaceURI):
@@ -1526,7 +1758,7 @@ class AnyElement(AnyType):
         # element declarations
         prefix, typeName = SplitQName(_find_type(elt))
         if not skip and typeName:
-            namespaceURI = _resolve_prefix(elt, prefix)
+            namespaceURI = ps.ResolvePrefix(elt, prefix)
             # First look thru user defined namespaces, if don't find
             # look for 'primitives'.
             pyclass = GTD(namespaceURI, typeName) or Any
@@ -1647,7 +1879,8 @@ class Union(SimpleType):
 
         for indx in range(len(self.memberTypeCodes)):
             typecode = self.memberTypeCodes[indx]
-            self.logger.debug("Trying member %s", str(typecode.type))
+            if self.logger.debugOn():
+                self.logger.debug("Trying member %s", str(typecode.type))
             try:
                 pyobj = typecode.text_to_data(text, elt, ps)
             except Exception as ex:
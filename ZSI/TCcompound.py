@@ -8,13 +8,16 @@ from ZSI import _copyright, _children, _child_elements, \
     _find_type, _get_idstr, EvaluateException
 
 from .TC import _get_xsitype, TypeCode, Any, AnyElement, AnyType, \
-     Nilled
+     Nilled, SimpleType, Integer, Decimal, Boolean
 
 from .schema import ElementDeclaration, TypeDefinition, \
     _get_substitute_element, _is_substitute_element
 
-from ZSI.wstools.Namespaces import SOAP
+from ZSI.wstools.Namespaces import SCHEMA, SOAP
+from ZSI.wstools.Utility import NamespaceError
 from ZSI.wstools.logging import getLogger as _GetLogger
+from xml.dom import Node as _Node
+import array
 import re
 import types
 import contextlib
@@ -26,6 +29,19 @@ _find_arrayposition = lambda E: E.getAttributeNS(SOAP.ENC, "position") or E.getA
 _offset_pat = re.compile(r'\[[0-9]+\]')
 _position_pat = _offset_pat
 
+# parse() implementations whose items Array may decode in one batch with
+# SimpleType.parse_text_list.
+_batch_parsers = (SimpleType.parse, Integer.parse, Decimal.parse,
+                  Boolean.parse)
+_text_nodes = (_Node.TEXT_NODE, _Node.CDATA_SECTION_NODE, _Node.COMMENT_NODE)
+
+# Array items Array.serialize may format in one pass.
+_batch_serial_types = (Integer, Decimal, Boolean)
+_numeric_types = (int, float, bool)
+
+# Marks the ofwhat positions ComplexType.parse found no element for.
+_UNSET = object()
+
 
 def _instantiate_hidden_typecode(factory):
     tc = None
@@ -162,6 +178,7 @@ class ComplexType(TypeCode):
                 'Struct ofwhat must be list or sequence, not ' + str(t))
         self.ofwhat = tuple(ofwhat)
         self._resolved_ofwhat_cache = None
+        self._parse_plan = None
         if TypeCode.typechecks:
             # XXX Not sure how to determine if new-style class..
             if self.pyclass is not None and \
@@ -179,6 +196,59 @@ class ComplexType(TypeCode):
             )
         return self._resolved_ofwhat_cache
 
+    def _get_parse_plan(self):
+        """Per-typecode lookups parse() needs for every element: the
+        resolved ofwhat, candidate positions by QName, which positions
+        repeat, and how to store the values on self.pyclass.
+        """
+        plan = self._parse_plan
+        if plan is not None and plan[0] is self.pyclass:
+            return plan
+        resolved_ofwhat = self._get_resolved_ofwhat()
+        ofwhat_by_name = {}
+        repeated = []
+        for idx, what in enumerate(resolved_ofwhat):
+            max_occurs = what.maxOccurs
+            rep = max_occurs == 'unbounded'
+            if not rep:
+                try:
+                    rep = int(max_occurs) > 1
+                except (TypeError, ValueError):
+                    rep = False
+            repeated.append(rep)
+            if not self.inorder and not isinstance(what, AnyElement):
+                key = (what.nspname, what.pname)
+                ofwhat_by_name.setdefault(key, []).append(idx)
+        anames = tuple(what.aname for what in resolved_ofwhat)
+
+        pyclass = self.pyclass
+        from_parsed = None
+        plain = True
+        if pyclass:
+            # _from_parsed is bound to the ofwhat of pyclass.typecode.
+            if getattr(pyclass, 'typecode', None) is self:
+                from_parsed = getattr(pyclass, '_from_parsed', None)
+            # Descriptors (or __slots__) must see every value stored.
+            plain = all(not hasattr(getattr(pyclass, aname, None), '__set__')
+                        for aname in anames if aname)
+        plan = (pyclass, resolved_ofwhat, ofwhat_by_name, tuple(repeated),
+                anames, from_parsed, plain)
+        self._parse_plan = plan
+        return plan
+
+    def _update_parsed(self, pyobj, values):
+        """Store the values ComplexType.parse collected, indexed like
+        the resolved ofwhat, on pyobj; positions left _UNSET are skipped.
+        """
+        plan = self._get_parse_plan()
+        items = [(aname, value) for aname, value in zip(plan[4], values)
+                 if value is not _UNSET]
+        if plan[6] and hasattr(pyobj, '__dict__'):
+            pyobj.__dict__.update(items)
+            return
+        for aname, value in items:
+            setattr(pyobj, aname, value)
+
     def parse(self, elt, ps):
         debug = self.logger.debugOn()
         debug and self.logger.debug('parse')
@@ -201,12 +271,21 @@ class ComplexType(TypeCode):
             if _children(elt):
                 raise EvaluateException('Struct has content and HREF',
                         ps.Backtrace(elt))
+            # Multi-ref: parse each target once so shared references
+            # keep their identity.
+            pyobj = ps.href_objects.get((href, self))
+            if pyobj is not None:
+                return pyobj
             elt = ps.FindLocalHREF(href, elt)
         c = _child_elements(elt)
         if self.nilled(elt, ps):
             return Nilled
 
-        # Create the object.
+        # Create the object; the children are stored on it in one step
+        # once all of them are parsed.
+        plan = self._get_parse_plan()
+        resolved_ofwhat, ofwhat_by_name, repeated = plan[1:4]
+        from_parsed = plan[5]
         if self.pyclass:
             # type definition must be informed of element tag (nspname,pname),
             # element declaration is initialized with a tag.
@@ -230,14 +309,7 @@ class ComplexType(TypeCode):
 
         # Clone list of kids (we null it out as we process)
         c, crange = c[:], list(range(len(c)))
-        resolved_ofwhat = self._get_resolved_ofwhat()
-        ofwhat_by_name = {}
-        if not self.inorder:
-            for idx, what in enumerate(resolved_ofwhat):
-                if isinstance(what, AnyElement):
-                    continue
-                key = (what.nspname, what.pname)
-                ofwhat_by_name.setdefault(key, []).append((idx, what))
+        values = [_UNSET] * len(resolved_ofwhat)
         # Loop over all items we're expecting
 
         if debug:
@@ -255,29 +327,21 @@ class ComplexType(TypeCode):
                     c_elt.namespaceURI,
                     c_elt.localName or c_elt.tagName.rsplit(':', 1)[-1],
                 )
-                for i, what in ofwhat_by_name.get(key, ()):
+                for i in ofwhat_by_name.get(key, ()):
+                    what = resolved_ofwhat[i]
                     if debug:
                         self.logger.debug("what: (%s,%s)", what.nspname, what.pname)
                         self.logger.debug("child node: (%s,%s)", c_elt.namespaceURI, c_elt.tagName)
                     value = what.parse(c_elt, ps)
                     matched = True
-                    max_occurs = what.maxOccurs
-                    repeated = max_occurs == 'unbounded'
-                    if not repeated:
-                        try:
-                            repeated = int(max_occurs) > 1
-                        except (TypeError, ValueError):
-                            repeated = False
-                    if repeated:
-                        attr = getattr(pyobj, what.aname, None)
-                        if attr is not None:
-                            attr.append(value)
+                    if repeated[i]:
+                        if values[i] is _UNSET:
+                            values[i] = [value]
                         else:
-                            setattr(pyobj, what.aname, [value])
-                        c[j] = None
+                            values[i].append(value)
                     else:
-                        setattr(pyobj, what.aname, value)
-                        c[j] = None
+                        values[i] = value
+                    c[j] = None
                     break
                 if matched:
                     continue
@@ -311,24 +375,14 @@ class ComplexType(TypeCode):
 
                 if match:
                     matched = True
-                    max_occurs = what.maxOccurs
-                    repeated = max_occurs == 'unbounded'
-                    if not repeated:
-                        try:
-                            repeated = int(max_occurs) > 1
-                        except (TypeError, ValueError):
-                            repeated = False
-                    if repeated:
-                        attr = getattr(pyobj, what.aname, None)
-                        if attr is not None:
-                            attr.append(value)
+                    c[j] = None
+                    if repeated[i]:
+                        if values[i] is _UNSET:
+                            values[i] = [value]
                         else:
-                            setattr(pyobj, what.aname, [value])
-                        c[j] = None
+                            values[i].append(value)
                         continue
-                    else:
-                        setattr(pyobj, what.aname, value)
-                    c[j] = None
+                    values[i] = value
                     break
 
                 if debug:
@@ -341,14 +395,21 @@ class ComplexType(TypeCode):
             if not matched and resolved_ofwhat:
                 last_what = resolved_ofwhat[-1]
                 if hasattr(last_what, 'default'):
-                    setattr(pyobj, last_what.aname, last_what.default)
-                elif last_what.minOccurs > 0 and not hasattr(pyobj, last_what.aname):
+                    values[-1] = last_what.default
+                elif last_what.minOccurs > 0 and values[-1] is _UNSET \
+                        and not hasattr(pyobj, last_what.aname):
                     raise EvaluateException('Element "' + last_what.aname + \
                         '" missing from complexType', ps.Backtrace(elt))
 
-        if isinstance(pyobj, ComplexType._DictHolder):
-            return pyobj.__dict__
+        if from_parsed is not None:
+            pyobj = from_parsed(values, pyobj)
+        else:
+            self._update_parsed(pyobj, values)
 
+        if isinstance(pyobj, ComplexType._DictHolder):
+            pyobj = pyobj.__dict__
+        if href:
+            ps.href_objects[(href, self)] = pyobj
         return pyobj
 
     def serialize(self, elt, sw, pyobj, inline=False, name=None, **kw):
@@ -543,6 +604,7 @@ class ComplexType(TypeCode):
             return
         self.ofwhat = tuple(ofwhat)
         self._resolved_ofwhat_cache = None
+        self._parse_plan = None
         self.lenofwhat = len(self.ofwhat)
 
 
@@ -593,13 +655,17 @@ class Array(TypeCode):
         atype -- arrayType, (namespace,ncname)
         mutable -- object could change between multiple serializations
         undeclared -- do not serialize/parse arrayType attribute.
+        asarray -- return arrays of integer, floating-point or boolean
+            items as an array.array ('array') or a NumPy array ('numpy',
+            array.array if NumPy isn't installed) instead of a list.
     '''
     logger = _GetLogger('ZSI.TCcompound.Array')
 
     def __init__(self, atype, ofwhat, pname=None, dimensions=1, fill=None,
     sparse=False, mutable=False, size=None, nooffset=0, undeclared=False,
-    childnames=None, **kw):
+    childnames=None, asarray=None, **kw):
         TypeCode.__init__(self, pname, **kw)
+        self.asarray = asarray
         self.dimensions = dimensions
         self.atype = atype
         if undeclared is False and self.atype[1].endswith(']') is False:
@@ -671,6 +737,9 @@ class Array(TypeCode):
             if _children(elt):
                 raise EvaluateException('Array has content and HREF',
                         ps.Backtrace(elt))
+            v = ps.href_objects.get((href, self))
+            if v is not None:
+                return v
             elt = ps.FindLocalHREF(href, elt)
         if self.nilled(elt, ps):
             return Nilled
@@ -685,7 +754,20 @@ class Array(TypeCode):
             while vlen < offset:
                 vlen += 1
                 v.append(self.fill)
-        for c in _child_elements(elt):
+        children = _child_elements(elt)
+        items = None
+        if not self.sparse:
+            items = self._parse_batch(children, ps)
+        if items is not None:
+            if offset:
+                v.extend(items)
+            else:
+                v = items
+            v = self._to_container(v)
+            if href:
+                ps.href_objects[(href, self)] = v
+            return v
+        for c in children:
             item = self.ofwhat.parse(c, ps)
             position = self.parse_position(c, ps) or offset
             if self.sparse:
@@ -696,8 +778,135 @@ class Array(TypeCode):
                     v.append(self.fill)
                 v.append(item)
             offset += 1
+        if not self.sparse:
+            v = self._to_container(v)
+        if href:
+            ps.href_objects[(href, self)] = v
         return v
 
+    def _parse_batch(self, children, ps):
+        '''Decode all items with one ofwhat.parse_text_list call when ofwhat
+        is a plain simple type and no item has attributes (href, nil,
+        position) other than an xsi:type naming the type of ofwhat, element
+        content or a SOAP-ENC type name.  Returns None if the items must
+        be parsed one at a time.
+        '''
+        what = self.ofwhat
+        if type(what).parse not in _batch_parsers or \
+                what.attribute_typecode_dict is not None:
+            return None
+        (nspname, pname) = (what.nspname, what.pname)
+        texts = []
+        for c in children:
+            if c.hasAttributes() and not self._typed_as_ofwhat(c, ps) or \
+                    c.namespaceURI in (SOAP.ENC, SOAP.ENC12) or \
+                    (nspname and c.namespaceURI != nspname) or \
+                    (pname and c.localName != pname):
+                return None
+            nodes = c.childNodes
+            if len(nodes) == 1 and nodes[0].nodeType == _Node.TEXT_NODE:
+                texts.append(nodes[0].data)
+                continue
+            if not nodes:
+                return None
+            for n in nodes:
+                if n.nodeType not in _text_nodes:
+                    return None
+            texts.append(''.join([n.data for n in nodes
+                                  if n.nodeType != _Node.COMMENT_NODE]))
+        return what.parse_text_list(texts, children, ps)
+
+    def _typed_as_ofwhat(self, elt, ps):
+        '''True if the only attribute of elt is an xsi:type naming the
+        type of ofwhat, which per-item parsing would accept as is.
+        '''
+        attributes = elt.attributes
+        if attributes.length != 1:
+            return False
+        attr = attributes.item(0)
+        if attr.namespaceURI not in SCHEMA.XSI_LIST or attr.localName != 'type':
+            return False
+        xsitype = self.ofwhat.type
+        if not xsitype or xsitype[0] is None:
+            return False
+        prefix, _, name = attr.value.rpartition(':')
+        return name == xsitype[1] and \
+            ps.GetElementNSScope(elt).get(prefix) == xsitype[0]
+
+    def _to_container(self, items):
+        '''Convert decoded items to the container asked for by asarray.
+        '''
+        if not self.asarray:
+            return items
+        if isinstance(self.ofwhat, Decimal):
+            (code, dtype) = ('d', 'f8')
+        elif isinstance(self.ofwhat, Boolean):
+            (code, dtype) = ('b', 'bool')
+        elif isinstance(self.ofwhat, Integer):
+            (code, dtype) = ('q', 'i8')
+        else:
+            return items
+        try:
+            if self.asarray == 'numpy':
+                try:
+                    import numpy
+                except ImportError:
+                    pass
+                else:
+                    return numpy.array(items, dtype=dtype)
+            return array.array(code, items)
+        except (OverflowError, TypeError, ValueError):
+            # e.g. fill values (None) or nilled items
+            return items
+
+    def _serialize_batch(self, el, pyobj, offset, name):
+        '''Serialize numeric items (array.array, memoryview, NumPy array or
+        a list/tuple of int, float, bool) in one pass: text is formatted
+        for all items first and the item elements are built directly in
+        the DOM, with names and prefixes looked up once.  Returns False
+        when ofwhat.serialize must be called per item.
+        '''
+        what = self.ofwhat
+        if type(what).serialize is not SimpleType.serialize or \
+                not isinstance(what, _batch_serial_types) or \
+                what.unique is not True:
+            return False
+        if hasattr(pyobj, 'tolist'):
+            items = pyobj[offset:].tolist()
+        elif type(pyobj) in _seqtypes:
+            items = pyobj[offset:]
+            for e in items:
+                if type(e) not in _numeric_types:
+                    return False
+        else:
+            return False
+
+        ns, n = what.get_name(name, None)
+        node = el._getNode()
+        try:
+            qname = n
+            if ns:
+                qname = '%s:%s' % (el._getPrefix(node=node, nsuri=ns), n)
+            xsi = None
+            if what.typed is True:
+                tns, tname = _get_xsitype(what)
+                if tns and tname:
+                    xsi = ('%s:type' % el._getPrefix(node=node,
+                                                      nsuri=SCHEMA.XSI3),
+                           '%s:%s' % (el._getPrefix(node=node, nsuri=tns),
+                                      tname))
+        except NamespaceError:
+            return False
+
+        doc = el._getOwnerDocument()
+        for text in list(map(what.get_formatted_content, items)):
+            e = doc.createElementNS(ns, qname)
+            if xsi:
+                e.setAttributeNS(SCHEMA.XSI3, xsi[0], xsi[1])
+            e.appendChild(doc.createTextNode(text))
+            node.appendChild(e)
+        return True
+
     def serialize(self, elt, sw, pyobj, name=None, childnames=None, **kw):
         debug = self.logger.debugOn()
         if debug:
@@ -755,6 +964,8 @@ class Array(TypeCode):
             d['name'] = 'element'
 
         if self.sparse is False:
+            if self._serialize_batch(el, pyobj, offset, d.get('name')):
+                return
             for e in pyobj[offset:]: self.ofwhat.serialize(el, sw, e, **d)
         else:
             position = 0
@@ -7,9 +7,10 @@ from ZSI import _copyright, _floattypes, _inttypes, _get_idstr, EvaluateExceptio
 from ZSI.TC import TypeCode, SimpleType
 from ZSI.wstools.Namespaces import SCHEMA
 import operator, re, time as _time
+from functools import lru_cache as _lru_cache
 from time import mktime as _mktime, localtime as _localtime, gmtime as _gmtime
 from datetime import tzinfo as _tzinfo, timedelta as _timedelta,\
-    datetime as _datetime, MINYEAR, MAXYEAR
+    datetime as _datetime, date as _date, time as _timeofday, MINYEAR, MAXYEAR
 from math import modf as _modf
 
 # Year, month or day may be None
@@ -80,7 +81,17 @@ class _fixedoffset(_tzinfo):
 
 def _tz_to_tzinfo(tz):
     if not tz:
-        return _localtimezone()
+        return _local_tzinfo(_time.timezone, _time.altzone, _time.daylight)
+    return _fixed_tzinfo(tz)
+
+@_lru_cache(maxsize=8)
+def _local_tzinfo(timezone, altzone, daylight):
+    # _localtimezone reads the time module when created; the arguments
+    # key the cache to the current TZ setting.
+    return _localtimezone()
+
+@_lru_cache(maxsize=64)
+def _fixed_tzinfo(tz):
     if tz == "Z": tz = "+00:00"
     h, m = list(map(int, tz.split(':')))
     if h < 0: m = -m
@@ -144,6 +155,162 @@ def _dict_to_tuple(d):
     return tuple(retval)
 
 
+# Parsed lexical values are cached; documents tend to repeat the same
+# dates.  Call _parse_gregorian.cache_clear() and
+# _parse_duration.cache_clear() to drop them.
+_LEXICAL_CACHE_SIZE = 1024
+
+def _isdigits(text):
+    return text.isascii() and text.isdigit()
+
+def _scan_lexical(text, has_date, has_time):
+    '''Scan the canonical [-]YYYY-MM-DD, hh:mm:ss[.f+] and
+    YYYY-MM-DDThh:mm:ss[.f+] forms, with an optional Z or [-+]hh:mm zone.
+    Returns (time tuple, tz), or None for any other lexical form so the
+    caller can fall back to the class lex_pattern.
+    '''
+    neg = text[:1] == '-'
+    i, end, tz = int(neg), len(text), None
+    if text[-1:] == 'Z':
+        tz, end = 'Z', end - 1
+    elif end - i > 6 and text[end-6] in '+-' and text[end-3] == ':':
+        tz, end = text[end-6:], end - 6
+        if not _isdigits(tz[1:3] + tz[4:]):
+            return None
+
+    retval = _niltime[:]
+    if has_date:
+        if text[i+4:i+5] != '-' or text[i+7:i+8] != '-':
+            return None
+        Y, M, D = text[i:i+4], text[i+5:i+7], text[i+8:i+10]
+        if not _isdigits(Y + M + D) or len(D) != 2:
+            return None
+        retval[0:3] = int(Y), int(M), int(D)
+        i += 10
+        if has_time:
+            if text[i:i+1] != 'T':
+                return None
+            i += 1
+    if has_time:
+        if text[i+2:i+3] != ':' or text[i+5:i+6] != ':':
+            return None
+        h, m, sec = text[i:i+2], text[i+3:i+5], text[i+6:end]
+        if not _isdigits(h + m) or not _isdigits(sec[:2]):
+            return None
+        if len(sec) > 2 and (sec[2] != '.' or not _isdigits(sec[3:])):
+            return None
+        retval[3:5] = int(h), int(m)
+        msec, sec = _modf(float(sec))
+        retval[6], retval[5] = int(round(msec*1000)), int(sec)
+        i = end
+    if i != end:
+        return None
+
+    if neg:
+        retval[0:5] = [(x is not None or x) and operator.__neg__(x) for x in retval[0:5]]
+    return tuple(retval), tz
+
+@_lru_cache(maxsize=_LEXICAL_CACHE_SIZE)
+def _parse_gregorian(cls, text, localzone):
+    '''Parse text as cls; localzone is only part of the cache key, since
+    fix_timezone results depend on the local timezone.  Returns None if
+    text does not match.
+    '''
+    scanned = None
+    if cls._scan is not None and cls._scan[0] is cls.lex_pattern:
+        scanned = _scan_lexical(text, *cls._scan[1:])
+    if scanned is None:
+        m = cls.lex_pattern.match(text)
+        if not m:
+            return None
+        d = m.groupdict()
+        scanned = _dict_to_tuple(d), d.get('tz')
+
+    retval, tz = scanned
+    if cls.fix_timezone:
+        retval = _fix_timezone(retval, tz_from = tz, tz_to = None)
+    return _fix_none_fields(retval)
+
+def _scan_duration(text):
+    '''Scan durations with integer fields, e.g. P1Y2M3DT4H5M6S; returns
+    None for anything else (fractional seconds, errors).
+    '''
+    neg = text[:1] == '-'
+    body = text[1:] if neg else text
+    if body[:1] != 'P':
+        return None
+    date, t, time = body[1:].partition('T')
+    if t and not time:
+        return None
+
+    retval = _niltime[:]
+    for part, units, base in ((date, 'YMD', 0), (time, 'HMS', 3)):
+        pos = 0
+        for k, unit in enumerate(units):
+            j = part.find(unit, pos)
+            if j < 0:
+                continue
+            if not _isdigits(part[pos:j]):
+                return None
+            retval[base + k] = int(part[pos:j])
+            pos = j + 1
+        if pos != len(part):
+            return None
+
+    if neg:
+        retval[0:5] = [(x is not None or x) and operator.__neg__(x) for x in retval[0:5]]
+    return tuple(retval)
+
+@_lru_cache(maxsize=_LEXICAL_CACHE_SIZE)
+def _parse_duration(text):
+    retval = _scan_duration(text)
+    if retval is None:
+        m = Duration.lex_pattern.match(text)
+        if m is None:
+            return None
+        d = m.groupdict()
+        if d['T'] and (d['h'] is None and d['m'] is None and d['s'] is None):
+            raise EvaluateException('Duration has T without time')
+        retval = _dict_to_tuple(d)
+    return retval
+
+@_lru_cache(maxsize=64)
+def _positional_format(format):
+    '''Split a %(Y)04d style format into a positional format and the
+    time tuple indices it reads.
+    '''
+    keys = re.findall(r'%\((\w+)\)', format)
+    index = {'Y': 0, 'M': 1, 'D': 2, 'h': 3, 'm': 4, 's': 5, 'ms': 6}
+    return re.sub(r'%\(\w+\)', '%', format), tuple(index[k] for k in keys)
+
+def _to_pyclass(pyclass, tv):
+    '''Build pyclass from a time tuple; datetime, date and time subclasses
+    get their fields, anything else gets the tuple.
+    '''
+    if isinstance(pyclass, type):
+        if issubclass(pyclass, _datetime):
+            return pyclass(*tv[:6], microsecond=min(tv[6]*1000, 999999))
+        if issubclass(pyclass, _date):
+            return pyclass(*tv[:3])
+        if issubclass(pyclass, _timeofday):
+            return pyclass(*tv[3:6], microsecond=min(tv[6]*1000, 999999))
+    return pyclass(tv)
+
+def _from_native(pyobj):
+    '''datetime, date or time -> time tuple; aware values are converted to
+    local time first, as naive values are taken to be local.
+    '''
+    if isinstance(pyobj, _datetime):
+        if pyobj.tzinfo is not None:
+            pyobj = pyobj.astimezone(_localtimezone())
+        return (pyobj.year, pyobj.month, pyobj.day, pyobj.hour,
+                pyobj.minute, pyobj.second, pyobj.microsecond // 1000, 0, 0)
+    if isinstance(pyobj, _date):
+        return (pyobj.year, pyobj.month, pyobj.day, 0, 0, 0, 0, 0, 0)
+    return (None, None, None, pyobj.hour, pyobj.minute, pyobj.second,
+            pyobj.microsecond // 1000, 0, 0)
+
+
 class Duration(SimpleType):
     '''Time duration.
     '''
@@ -160,16 +327,12 @@ class Duration(SimpleType):
         '''
         if text is None:
             return None
-        m = Duration.lex_pattern.match(text)
-        if m is None:
-            raise EvaluateException('Illegal duration', ps.Backtrace(elt))
-        d = m.groupdict()
-        if d['T'] and (d['h'] is None and d['m'] is None and d['s'] is None):
-            raise EvaluateException('Duration has T without time')
         try:
-            retval = _dict_to_tuple(d)
+            retval = _parse_duration(text)
         except ValueError as e:
             raise EvaluateException(str(e))
+        if retval is None:
+            raise EvaluateException('Illegal duration', ps.Backtrace(elt))
 
         if self.pyclass is not None:
             return self.pyclass(retval)
@@ -179,9 +342,8 @@ class Duration(SimpleType):
         if type(pyobj) in _floattypes or type(pyobj) in _inttypes:
             pyobj = _gmtime(pyobj)
 
-        d = {}
         pyobj = tuple(pyobj)
-        if 1 in [x < 0 for x in pyobj[0:6]]:
+        if any(x < 0 for x in pyobj[0:6]):
             pyobj = list(map(abs, pyobj))
             neg = '-'
         else:
@@ -194,10 +356,14 @@ class Duration(SimpleType):
 
 
 class Gregorian(SimpleType):
-    '''Gregorian times.
+    '''Gregorian times.  The canonical lexical forms are scanned without
+    the regular expression (see _scan), and parsed values are cached.
+    A datetime, date or time pyclass gets a native object.
     '''
     lex_pattern = tag = format = None
     fix_timezone = False
+    # (lex_pattern, has_date, has_time) for _scan_lexical, or None.
+    _scan = None
 
     def text_to_data(self, text, elt, ps):
         '''convert text into typecode specific data.
@@ -205,52 +371,40 @@ class Gregorian(SimpleType):
         if text is None:
             return None
 
-        m = self.lex_pattern.match(text)
-        if not m:
-            raise EvaluateException('Bad Gregorian: %s' %text, ps.Backtrace(elt))
-        try:
-            retval = _dict_to_tuple(m.groupdict())
-        except ValueError as e:
-            #raise EvaluateException(str(e))
-            raise
-
+        localzone = None
         if self.fix_timezone:
-            retval = _fix_timezone(retval, tz_from = m.groupdict().get('tz'), tz_to = None)
-
-        retval = _fix_none_fields(retval)
+            localzone = (_time.timezone, _time.altzone, _time.tzname)
+        retval = _parse_gregorian(self.__class__, text, localzone)
+        if retval is None:
+            raise EvaluateException('Bad Gregorian: %s' %text, ps.Backtrace(elt))
 
         if self.pyclass is not None:
-            return self.pyclass(retval)
+            return _to_pyclass(self.pyclass, retval)
         return retval
 
     def get_formatted_content(self, pyobj):
         if type(pyobj) in _floattypes or type(pyobj) in _inttypes:
             pyobj = _gmtime(pyobj)
+        elif isinstance(pyobj, (_date, _timeofday)):
+            pyobj = _from_native(pyobj)
 
         if self.fix_timezone:
             pyobj = _fix_timezone(pyobj, tz_from = None, tz_to = "Z")
 
-        d = {}
         pyobj = tuple(pyobj)
-        if 1 in [x < 0 for x in pyobj[0:6]]:
+        if any(x < 0 for x in pyobj[0:6]):
             pyobj = list(map(abs, pyobj))
-            d['neg'] = '-'
-        else:
-            d['neg'] = ''
-
-        d = {}
-        for k,i in [ ('Y', 0), ('M', 1), ('D', 2), ('h', 3), ('m', 4), ('s', 5) ]:
-            d[k] = pyobj[i]
 
         ms = pyobj[6]
         if not ms or not hasattr(self, 'format_ms'):
-            return self.format % d
+            format, index = _positional_format(self.format)
+            return format % tuple([pyobj[i] for i in index])
 
         if  ms > 999:
             raise ValueError('milliseconds must be a integer between 0 and 999')
 
-        d['ms'] = ms
-        return self.format_ms % d
+        format, index = _positional_format(self.format_ms)
+        return format % tuple([pyobj[i] for i in index])
 
 
 class gDateTime(Gregorian):
@@ -265,6 +419,7 @@ class gDateTime(Gregorian):
     format_ms = format[:-1] + '.%(ms)03dZ'
     type = (SCHEMA.XSD3, 'dateTime')
     fix_timezone = True
+    _scan = (lex_pattern, True, True)
 
 class gDate(Gregorian):
     '''A date.
@@ -275,6 +430,7 @@ class gDate(Gregorian):
                         r'(?P<tz>Z|([-+]\d\d:\d\d))?' '$')
     tag, format = 'date', '%(Y)04d-%(M)02d-%(D)02d'
     type = (SCHEMA.XSD3, 'date')
+    _scan = (lex_pattern, True, False)
 
 class gYearMonth(Gregorian):
     '''A date.
@@ -338,5 +494,6 @@ class gTime(Gregorian):
     format_ms = format[:-1] + '.%(ms)03dZ'
     type = (SCHEMA.XSD3, 'time')
     fix_timezone = True
+    _scan = (lex_pattern, False, True)
 
 if __name__ == '__main__': print(_copyright)
@@ -270,12 +270,10 @@ def _resolve_prefix(celt, prefix):
     Parameters:
       celt -- element node
       prefix -- xmlns:prefix, or empty str or None
-    '''
 
-    cache = _resolve_prefix.cache
-    key = (id(celt), prefix or '')
-    if key in cache:
-        return cache[key]
+    Typecodes resolve through ParsedSoap.ResolvePrefix, which uses the
+    per-document namespace scopes; this walks up the tree each call.
+    '''
 
     while _is_element(celt):
         if prefix:
@@ -291,12 +289,7 @@ def _resolve_prefix(celt, prefix):
         else:
             raise EvaluateException('cant resolve default namespace')
 
-    if len(cache) > _resolve_prefix.MAXLEN:
-        cache.clear()
-    cache[key] = namespaceURI
     return namespaceURI
-_resolve_prefix.cache = {}
-_resolve_prefix.MAXLEN = 2048
 
 
 def _valid_encoding(elt):
@@ -0,0 +1,41 @@
+"""Stream helpers shared by the client and the server adapters."""
+
+from __future__ import annotations
+
+import io
+from typing import Any, Iterable
+
+
+class ConcatReader(io.RawIOBase):
+    """Read a sequence of byte strings and files as one stream."""
+
+    def __init__(self, parts: Iterable[Any], encoding: str) -> None:
+        self._parts = iter(parts)
+        self._current = None
+        self._pending = memoryview(b"")
+        self._encoding = encoding
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        while not self._pending:
+            if self._current is None:
+                part = next(self._parts, None)
+                if part is None:
+                    return 0
+                if isinstance(part, (bytes, bytearray)):
+                    self._pending = memoryview(part)
+                    continue
+                self._current = part
+            data = self._current.read(len(buffer))
+            if not data:
+                self._current = None
+                continue
+            if isinstance(data, str):
+                data = data.encode(self._encoding)
+            self._pending = memoryview(data)
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
@@ -3,14 +3,116 @@
 # See Copyright for copyright notice!
 ###########################################################################
 
-import time, urllib.parse, socket
-from ZSI import _seqtypes, EvaluateException, WSActionException
+import time, urllib.parse, socket, threading
+from uuid import uuid4
+from ZSI import _copyright, _seqtypes, EvaluateException, WSActionException
 from .TC import AnyElement, AnyType, TypeCode
 from .schema import GED, GTD, _has_type_definition
 from ZSI.TCcompound import ComplexType
 from ZSI.wstools.Namespaces import WSA_LIST
 
 
+_HEADERS = ("MessageID", "Action", "To", "From", "RelatesTo")
+_codecs = {}
+
+class WSACodec(object):
+    '''Typecodes of the WS-Addressing headers of one WSA version, looked
+    up once and shared by every Address using that namespace.
+    '''
+    def __init__(self, WSA):
+        self.namespaceURI = WSA.ADDRESS
+        self.anonymousURI = WSA.ANONYMOUS
+        self.endPointReferenceType = GTD(WSA.ADDRESS, 'EndpointReferenceType')
+        self._typecodes = {}
+        self._parse_typecodes = None
+
+    def typecode(self, name):
+        '''Return the GED typecode of header name.'''
+        typecode = self._typecodes.get(name)
+        if typecode is None:
+            typecode = GED(self.namespaceURI, name)
+            if typecode is None:
+                raise WSActionException('Missing namespace, import "%s"' %self.namespaceURI)
+            self._typecodes[name] = typecode
+        return typecode
+
+    def newMessageID(self):
+        return "urn:uuid:%s" %uuid4()
+
+    def header(self, name, value):
+        '''Return the pyobj of a header holding a simple value.'''
+        return self.typecode(name).pyclass(value)
+
+    def endpoint(self, name, address):
+        '''Return the pyobj of an endpoint header (e.g. From) at address.'''
+        pyobj = self.typecode(name).pyclass()
+        pyobj._Address = address
+        return pyobj
+
+    def parse(self, ps):
+        '''Return a dictionary (by name) of the WS-Addressing header
+        values of ps.
+        '''
+        if self._parse_typecodes is None:
+            self._parse_typecodes = [self.typecode(n) for n in _HEADERS]
+        pyobjs = ps.ParseHeaderElements(self._parse_typecodes)
+        namespaceURI = self.namespaceURI
+        return dict([(n, pyobjs[(namespaceURI, n)]) for n in _HEADERS])
+
+
+def GetWSACodec(wsAddressURI=None):
+    '''Return the WSACodec for wsAddressURI, or for the first WSA
+    version with registered typecodes.
+    '''
+    codec = _codecs.get(wsAddressURI)
+    if codec is not None:
+        return codec
+
+    toplist = [wsa for wsa in WSA_LIST if wsa.ADDRESS==wsAddressURI]
+    epr = 'EndpointReferenceType'
+    for WSA in toplist+list(WSA_LIST):
+        if (wsAddressURI is not None and wsAddressURI != WSA.ADDRESS) or \
+            _has_type_definition(WSA.ADDRESS, epr) is True:
+            break
+    else:
+        raise EvaluateException('enabling wsAddressing requires the inclusion of that namespace')
+
+    codec = _codecs[wsAddressURI] = _codecs.get(WSA.ADDRESS) or WSACodec(WSA)
+    return codec
+
+
+_HOST_TTL = 300.0
+_host_addresses = {}
+_host_lock = threading.Lock()
+
+def _gethostbyname(host):
+    '''socket.gethostbyname with answers kept for _HOST_TTL seconds;
+    None if host does not resolve.
+    '''
+    now = time.monotonic()
+    entry = _host_addresses.get(host)
+    if entry is not None and entry[1] > now:
+        return entry[0]
+    try:
+        address = socket.gethostbyname(host)
+    except OSError:
+        address = None
+    with _host_lock:
+        if len(_host_addresses) > 1024:
+            _host_addresses.clear()
+        _host_addresses[host] = (address, now + _HOST_TTL)
+    return address
+
+def _sameHost(host, expected):
+    '''True if host names the expected host, or expected is this host.'''
+    host, expected = host.lower(), expected.lower()
+    if host == expected:
+        return True
+    expectedAddress = _gethostbyname(expected)
+    return expectedAddress is not None and \
+        expectedAddress in ('127.0.0.1', _gethostbyname(host))
+
+
 class Address(object):
     '''WS-Address
 
@@ -32,18 +134,10 @@ class Address(object):
     def setUp(self):
         '''Look for WS-Address
         '''
-        toplist = [wsa for wsa in WSA_LIST if wsa.ADDRESS==self.wsAddressURI]
-        epr = 'EndpointReferenceType'
-        for WSA in toplist+WSA_LIST:
-            if (self.wsAddressURI is not None and self.wsAddressURI != WSA.ADDRESS) or \
-                _has_type_definition(WSA.ADDRESS, epr) is True:
-                break
-        else:
-            raise EvaluateException('enabling wsAddressing requires the inclusion of that namespace')
-
-        self.wsAddressURI = WSA.ADDRESS
-        self.anonymousURI = WSA.ANONYMOUS
-        self._replyTo = WSA.ANONYMOUS
+        codec = self.codec = GetWSACodec(self.wsAddressURI)
+        self.wsAddressURI = codec.namespaceURI
+        self.anonymousURI = codec.anonymousURI
+        self._replyTo = codec.anonymousURI
 
     def _checkAction(self, action, value):
         '''WS-Address Action
@@ -58,21 +152,19 @@ class Address(object):
             raise WSActionException('wrong WSAddress Action(%s), expecting %s'%(value,action))
 
     def _checkFrom(self, pyobj):
-        '''WS-Address From,
-        XXX currently not checking the hostname, not forwarding messages.
+        '''WS-Address From, the same URL as To up to equivalent host names
+        (resolved at most every _HOST_TTL seconds), not forwarding messages.
         pyobj  -- From server returned.
         '''
         if pyobj is None: return
         value = pyobj._Address
         if value != self._addressTo:
             scheme,netloc,path,query,fragment = urllib.parse.urlsplit(value)
-            hostport = netloc.split(':')
             schemeF,netlocF,pathF,queryF,fragmentF = urllib.parse.urlsplit(self._addressTo)
             if scheme==schemeF and path==pathF and query==queryF and fragment==fragmentF:
                 netloc = netloc.split(':') + ['80']
                 netlocF = netlocF.split(':') + ['80']
-                if netloc[1]==netlocF[1] and (socket.gethostbyname(netlocF[0]) in
-                    ('127.0.0.1', socket.gethostbyname(netloc[0]))):
+                if netloc[1]==netlocF[1] and _sameHost(netloc[0], netlocF[0]):
                     return
 
             raise WSActionException('wrong WS-Address From(%s), expecting %s'%(value,self._addressTo))
@@ -109,14 +201,9 @@ class Address(object):
         typecodes = []
         try:
             for nsuri,elements in list(kw.items()):
+                codec = GetWSACodec(nsuri)
                 for el in elements:
-                    typecode = GED(nsuri, el)
-                    if typecode is None:
-                        raise WSActionException('Missing namespace, import "%s"' %nsuri)
-
-                    typecodes.append(typecode)
-            else:
-                pass
+                    typecodes.append(codec.typecode(el))
         except EvaluateException as ex:
             raise EvaluateException('To use ws-addressing register typecodes for namespace(%s)' %self.wsAddressURI)
         return typecodes
@@ -126,21 +213,12 @@ class Address(object):
         ps -- ParsedSoap
         action -- ws-action for response
         '''
-        namespaceURI = self.wsAddressURI
-        d = {namespaceURI:("MessageID","Action","To","From","RelatesTo")}
-        typecodes = self._getWSAddressTypeCodes(**d)
-        pyobjs = ps.ParseHeaderElements(typecodes)
-
-        got_action = pyobjs.get((namespaceURI,"Action"))
-        self._checkAction(action, got_action)
-
-        From = pyobjs.get((namespaceURI,"From"))
-        self._checkFrom(From)
-
-        RelatesTo = pyobjs.get((namespaceURI,"RelatesTo"))
-        self._checkRelatesTo(RelatesTo)
+        headers = self.codec.parse(ps)
+        self._checkAction(action, headers["Action"])
+        self._checkFrom(headers["From"])
+        self._checkRelatesTo(headers["RelatesTo"])
 
-        To = pyobjs.get((namespaceURI,"To"))
+        To = headers["To"]
         if To: self._checkReplyTo(To)
 
     def setRequest(self, endPointReference, action):
@@ -148,38 +226,23 @@ class Address(object):
         '''
         self._action = action
         self.header_pyobjs = None
-        pyobjs = []
-        namespaceURI = self.wsAddressURI
-        addressTo = self._addressTo
-        messageID = self._messageID = "uuid:%s" %time.time()
+        codec = self.codec
+        messageID = self._messageID = codec.newMessageID()
 
         # Set Message Information Headers
-        # MessageID
-        typecode = GED(namespaceURI, "MessageID")
-        pyobjs.append(typecode.pyclass(messageID))
-
-        # Action
-        typecode = GED(namespaceURI, "Action")
-        pyobjs.append(typecode.pyclass(action))
-
-        # To
-        typecode = GED(namespaceURI, "To")
-        pyobjs.append(typecode.pyclass(addressTo))
-
-        # From
-        typecode = GED(namespaceURI, "From")
-        mihFrom = typecode.pyclass()
-        mihFrom._Address = self.anonymousURI
-        pyobjs.append(mihFrom)
+        pyobjs = [codec.header("MessageID", messageID),
+                  codec.header("Action", action),
+                  codec.header("To", self._addressTo),
+                  codec.endpoint("From", self.anonymousURI)]
 
         if endPointReference:
             if hasattr(endPointReference, 'typecode') is False:
                 raise EvaluateException('endPointReference must have a typecode attribute')
 
             if isinstance(endPointReference.typecode, \
-                GTD(namespaceURI ,'EndpointReferenceType')) is False:
+                codec.endPointReferenceType) is False:
                 raise EvaluateException('endPointReference must be of type %s' \
-                    %GTD(namespaceURI ,'EndpointReferenceType'))
+                    %codec.endPointReferenceType)
 
             ReferenceProperties = getattr(endPointReference, '_ReferenceProperties', None)
             if ReferenceProperties is None: # In recent WS-A attribute name changed
@@ -198,24 +261,14 @@ class Address(object):
         address -- Address instance, representing a WS-Address
         '''
         self.From = localURL
-        self.header_pyobjs = None
-        pyobjs = []
-        namespaceURI = self.wsAddressURI
-
-        for nsuri,name,value in (\
-             (namespaceURI, "Action", self._action),
-             (namespaceURI, "MessageID","uuid:%s" %time.time()),
-             (namespaceURI, "RelatesTo", address.getMessageID()),
-             (namespaceURI, "To", self.anonymousURI),):
-
-            typecode = GED(nsuri, name)
-            pyobjs.append(typecode.pyclass(value))
-
-        typecode = GED(nsuri, "From")
-        pyobj = typecode.pyclass()
-        pyobj._Address = self.From
-        pyobjs.append(pyobj)
-        self.header_pyobjs = tuple(pyobjs)
+        codec = self.codec
+        self.header_pyobjs = (
+            codec.header("Action", self._action),
+            codec.header("MessageID", codec.newMessageID()),
+            codec.header("RelatesTo", address.getMessageID()),
+            codec.header("To", self.anonymousURI),
+            codec.endpoint("From", self.From),
+        )
 
 
     def serialize(self, sw, **kw):
@@ -233,16 +286,12 @@ class Address(object):
         '''
         ps -- ParsedSoap instance
         '''
-        namespaceURI = self.wsAddressURI
-        elements = ("MessageID","Action","To","From","RelatesTo")
-        d = {namespaceURI:elements}
-        typecodes = self._getWSAddressTypeCodes(**d)
-        pyobjs = ps.ParseHeaderElements(typecodes)
-        self._messageID = pyobjs[(namespaceURI,elements[0])]
-        self._action = pyobjs[(namespaceURI,elements[1])]
-        self._addressTo = pyobjs[(namespaceURI,elements[2])]
-        self._from = pyobjs[(namespaceURI,elements[3])]
-        self._relatesTo = pyobjs[(namespaceURI,elements[4])]
+        headers = self.codec.parse(ps)
+        self._messageID = headers["MessageID"]
+        self._action = headers["Action"]
+        self._addressTo = headers["To"]
+        self._from = headers["From"]
+        self._relatesTo = headers["RelatesTo"]
 
 
 
@@ -0,0 +1,302 @@
+"""ASGI application for hosting ZSI services in asyncio servers.
+
+Services are routed as ServiceContainer routes them: a ServiceInterface
+(e.g. a wsdl2py generated ServiceSOAPBinding) is mounted at its POST path,
+and its operation is chosen by Body root or SOAPAction.  The @soapmethod
+callbacks of ``resource`` (see ZSI.wsgi) serve all other paths::
+
+    app = SOAPApplication(services=[EchoService("/echo")], resource=MyResource())
+    # uvicorn module:app
+
+The request body is fed to the XML parser as the ``http.request``
+messages arrive.  The reply goes out in chunks with ``more_body``.  Plain
+functions run on a bounded thread pool, so a slow handler does not block
+the event loop.  ``async def`` operations and soap methods are awaited on
+the loop itself.
+
+Parsing and serializing are CPU-bound too.  Once a request reaches
+``offload_size`` bytes, the rest of its parsing, the typecode parse and
+the serialization and encoding of its reply also run on the thread pool,
+so a large envelope does not stall other coroutines.  Smaller messages
+stay on the loop, where a thread hop would cost more than the work; note
+that a large reply to a small request is therefore still serialized on
+the loop (set ``offload_size`` to 0 to offload every message).
+
+gzip and deflate request bodies are decoded as they arrive, and replies
+are compressed when the client's Accept-Encoding allows it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import inspect
+import io
+import sys
+from typing import Any, Callable
+
+from ZSI import ParseException, _get_element_nsuri_name, compression, resolvers
+from ZSI.ServiceContainer import NoSuchService, NotAuthorized, _GetOperation, \
+    _SerializeResponse
+from ZSI.fault import Fault, FaultFromException, FaultFromZSIException
+from ZSI.parse import IncrementalReader, ParsedSoap
+from ZSI.wsgi import soapmethods
+from ZSI.wstools.logging import getLogger as _GetLogger
+from ZSI.writer import SoapWriter
+
+_log = _GetLogger("ZSI.asgi")
+
+
+class _Disconnected(Exception):
+    pass
+
+
+class SOAPApplication:
+    """ASGI application dispatching SOAP requests to services.
+
+    services -- ServiceInterface instances, mounted at their getPost() path
+    resource -- object whose @soapmethod callbacks serve any other path
+    max_workers -- threads running synchronous operations
+    nsdict -- namespace declarations added to replies of services
+
+    Class attributes:
+        encoding -- charset of replies
+        chunk_size -- bytes per reply chunk
+        compress_min_size -- smallest reply compressed for clients that
+            accept it (None to never compress)
+        compress_level -- zlib compression level
+        max_decoded_size -- largest decoded size of a compressed request
+        offload_size -- request size (decoded bytes) from which parsing
+            and serialization run on the worker threads (None: never)
+    """
+
+    encoding = "UTF-8"
+    chunk_size = 64 * 1024
+    compress_min_size = compression.DEFAULT_MIN_SIZE
+    compress_level = compression.DEFAULT_LEVEL
+    max_decoded_size = 64 * 1024 * 1024
+    offload_size = 256 * 1024
+
+    def __init__(
+        self,
+        services: Any = (),
+        resource: Any = None,
+        max_workers: int = 8,
+        nsdict: dict | None = None,
+    ) -> None:
+        self._services = {}
+        for service in services:
+            self.mount(service)
+        self.resource = resource
+        self._methods = soapmethods(resource) if resource is not None else {}
+        self.max_workers = max_workers
+        self.nsdict = nsdict or {}
+        self._executor = None
+
+    def mount(self, service: Any, post: str | None = None) -> None:
+        """Serve service at post (its getPost() path by default)."""
+        path = post if post is not None else service.getPost()
+        self._services["/" + path.lstrip("/")] = service
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix="zsi-asgi")
+        return self._executor
+
+    def close(self) -> None:
+        """Shut down the worker threads."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http":
+            raise ValueError("unsupported ASGI scope type %r" % scope["type"])
+        if scope["method"] != "POST":
+            await send({"type": "http.response.start", "status": 405, "headers": [
+                (b"allow", b"POST"), (b"content-type", b"text/plain")]})
+            await send({"type": "http.response.body", "body": b"SOAP requests must use POST\n"})
+            return
+
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1")
+                   for k, v in scope.get("headers", ())}
+        try:
+            ps, offload = await self._receive(receive, headers)
+        except _Disconnected:
+            return
+        except ParseException as ex:
+            return await self.send_fault(send, FaultFromZSIException(ex))
+        except Exception as ex:
+            return await self.send_fault(send, FaultFromException(ex, True, sys.exc_info()[2]))
+
+        with ps:
+            try:
+                sw = await self.dispatch(ps, scope, headers, offload)
+            except NotAuthorized:
+                return await self.send_fault(send, Fault(Fault.Server, "Not authorized"), 401)
+            except Exception as ex:
+                return await self.send_fault(send, FaultFromException(ex, False, sys.exc_info()[2]))
+        await self.send_reply(send, sw, accept_encoding=headers.get("accept-encoding"),
+                              offload=offload)
+
+    async def _lifespan(self, receive: Callable, send: Callable) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def receive_request(self, receive: Callable, headers: dict) -> ParsedSoap:
+        """Parse the request body, feeding each http.request message to
+        the XML parser as it arrives.
+        """
+        return (await self._receive(receive, headers))[0]
+
+    def _offloads(self, size: int) -> bool:
+        return self.offload_size is not None and size >= self.offload_size
+
+    async def _run(self, offload: bool, fn: Callable, *args: Any) -> Any:
+        """Return fn(*args), computed on the worker threads if offload."""
+        if not offload:
+            return fn(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args))
+
+    async def _receive(self, receive: Callable, headers: dict) -> tuple[ParsedSoap, bool]:
+        """receive_request(), also telling whether the request is large
+        enough for its processing to be offloaded.
+        """
+        ct = headers.get("content-type", "")
+        multipart = ct.startswith("multipart/")
+        reader = io.BytesIO() if multipart else IncrementalReader()
+        decoder = compression.Decoder(headers.get("content-encoding"), self.max_decoded_size)
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise _Disconnected()
+            more = message.get("more_body", False)
+            offload = self._offloads(size)
+            body = await self._run(offload, decoder.decode, message.get("body", b""))
+            if not more:
+                body += await self._run(offload, decoder.flush)
+            size += len(body)
+            if multipart:
+                reader.write(body)
+            else:
+                await self._run(offload, reader.feed, body)
+            if not more:
+                break
+        offload = self._offloads(size)
+        if multipart:
+            reader.seek(0)
+            return await self._run(offload, self._parse_multipart, ct, reader), offload
+        return await self._run(offload, lambda: ParsedSoap(reader.close())), offload
+
+    @staticmethod
+    def _parse_multipart(ct: str, fp: Any) -> ParsedSoap:
+        cid = resolvers.MIMEResolver(ct, fp)
+        return ParsedSoap(cid.GetSOAPPart(), resolver=cid.Resolve)
+
+    async def call(self, fn: Callable, *args: Any) -> Any:
+        """Await fn(*args) if it is a coroutine function, otherwise run it
+        on the worker threads.
+        """
+        if inspect.iscoroutinefunction(fn):
+            return await fn(*args)
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self.executor, functools.partial(fn, *args))
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    async def dispatch(self, ps: ParsedSoap, scope: dict, headers: dict,
+                       offload: bool = False) -> SoapWriter | None:
+        """Call the operation for ps and return a SoapWriter holding its
+        reply, or None when the operation has no reply.  With offload the
+        reply is serialized on the worker threads.
+        """
+        path = scope.get("path") or "/"
+        service = self._services.get(path)
+        if service is None:
+            return await self._dispatch_soapmethod(ps, path, offload)
+
+        host, port = scope.get("server") or ("localhost", 80)
+        localURL = "http://%s:%d%s" % (host, port or 80, path)
+        action = headers.get("soapaction", "").strip('"') or None
+        method, args, action, address = _GetOperation(ps, service, path, action, localURL)
+        request, result = await self.call(method, *args)
+        service.verify(ps)
+        if result is None:
+            return None
+        sw = SoapWriter(nsdict=self.nsdict)
+        await self._run(offload, _SerializeResponse, sw, ps, service, result, action,
+                        address, localURL)
+        return sw
+
+    async def _dispatch_soapmethod(self, ps: ParsedSoap, path: str,
+                                   offload: bool = False) -> SoapWriter:
+        root = _get_element_nsuri_name(ps.body_root)
+        method = self._methods.get(root)
+        if method is None:
+            raise NoSuchService("no service at POST(%s) for root %s" % (path, root))
+        request = await self._run(offload, ps.Parse, method.requesttypecode)
+        response = method.responsetypecode.pyclass()
+        request, response = await self.call(method, request, response)
+        sw = SoapWriter()
+        await self._run(offload, sw.serialize, response, method.responsetypecode)
+        return sw
+
+    async def send_reply(self, send: Callable, sw: SoapWriter | None, status: int = 200,
+                         accept_encoding: str | None = None, offload: bool = False) -> None:
+        """Send the reply in sw in chunks of about chunk_size bytes,
+        compressed if accept_encoding allows it.  With offload the reply
+        is encoded and compressed on the worker threads.
+        """
+        chunks, coding = await self._run(offload, self._encode_reply, sw, accept_encoding)
+        headers = [(b"content-type", ('text/xml; charset="%s"' % self.encoding).encode("ascii"))]
+        size = sum(map(len, chunks))
+        if coding is not None:
+            headers += [(b"content-encoding", coding.encode("ascii")),
+                        (b"vary", b"Accept-Encoding")]
+        headers.append((b"content-length", str(size).encode("ascii")))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        last = len(chunks) - 1
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < last})
+        if not chunks:
+            await send({"type": "http.response.body", "body": b""})
+
+    def _encode_reply(self, sw: SoapWriter | None,
+                      accept_encoding: str | None) -> tuple[list, str | None]:
+        """Encoded (and maybe compressed) chunks of the reply in sw, and
+        the content coding used.
+        """
+        chunks = []
+        if sw is not None:
+            with sw:
+                chunks = sw.iterencode(self.encoding, self.chunk_size)
+        coding = None
+        if self.compress_min_size is not None and \
+                sum(map(len, chunks)) >= self.compress_min_size:
+            coding = compression.negotiate(accept_encoding)
+        if coding is not None:
+            chunks = [c for c in compression.itercompress(chunks, coding, self.compress_level) if c]
+        return chunks, coding
+
+    async def send_fault(self, send: Callable, f: Fault, status: int = 500) -> None:
+        _log.debug("sending fault", event="asgi.fault", code=f.code)
+        data = f.AsSOAP().encode(self.encoding)
+        await send({"type": "http.response.start", "status": status, "headers": [
+            (b"content-type", ('text/xml; charset="%s"' % self.encoding).encode("ascii")),
+            (b"content-length", str(len(data)).encode("ascii")),
+        ]})
+        await send({"type": "http.response.body", "body": data})
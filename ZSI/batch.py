@@ -0,0 +1,168 @@
+"""Run one SOAP operation over many requests with bounded concurrency.
+
+Each worker thread gets its own clone of a template binding, so calls never
+share per-request state (``Binding.h``, ``Binding.ps``, ...).  Worker
+bindings keep their HTTP connection open between calls.  Results stream
+back in request order while later requests are still in flight.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator, NamedTuple
+
+from ZSI import FaultException
+from ZSI.wstools.logging import getLogger as _GetLogger
+
+_log = _GetLogger("ZSI.batch")
+
+
+class BatchResult(NamedTuple):
+    """Outcome of one request in a batch."""
+
+    index: int
+    request: Any
+    response: Any = None
+    error: BaseException | None = None
+    attempts: int = 1
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class BatchExecutor:
+    """Map an operation over requests using a pool of per-worker bindings.
+
+    binding -- template binding; each worker thread uses ``binding.clone()``
+    concurrency -- number of worker threads
+    retries -- extra attempts per item after a transport error
+    retry_on -- exception types treated as transport errors
+    retry_faults -- also retry items that returned a SOAP fault
+    backoff -- seconds to sleep before the first retry, doubled each time
+    window -- maximum number of requests in flight (default 2*concurrency)
+    """
+
+    def __init__(
+        self,
+        binding: Any,
+        concurrency: int = 4,
+        retries: int = 0,
+        retry_on: tuple = (OSError, http.client.HTTPException),
+        retry_faults: bool = False,
+        backoff: float = 0.0,
+        window: int | None = None,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.binding = binding
+        self.concurrency = concurrency
+        self.retries = retries
+        self.retry_on = retry_on
+        self.retry_faults = retry_faults
+        self.backoff = backoff
+        self.window = window or 2 * concurrency
+        self._local = threading.local()
+        self._bindings: list = []
+        self._bindings_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="zsi-batch"
+        )
+
+    def __enter__(self) -> "BatchExecutor":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Wait for the workers, then close their kept-alive connections."""
+        self._pool.shutdown(wait=True)
+        with self._bindings_lock:
+            bindings, self._bindings = self._bindings, []
+        for binding in bindings:
+            if binding.h is not None:
+                binding.h.close()
+
+    def _worker_binding(self) -> Any:
+        binding = getattr(self._local, "binding", None)
+        if binding is None:
+            binding = self._local.binding = self.binding.clone()
+            binding.keepalive = True
+            with self._bindings_lock:
+                self._bindings.append(binding)
+        return binding
+
+    def _discard_binding(self) -> None:
+        """Drop this worker's binding, closing its kept-alive connection."""
+        binding = getattr(self._local, "binding", None)
+        self._local.binding = None
+        if binding is None:
+            return
+        with self._bindings_lock:
+            if binding in self._bindings:
+                self._bindings.remove(binding)
+        if binding.h is not None:
+            binding.h.close()
+
+    def _call(self, opname: Any, request: Any, kw: dict) -> Any:
+        binding = self._worker_binding()
+        if callable(opname):
+            return opname(binding, request)
+        return binding.RPC(None, opname, request, **kw)
+
+    def _run(self, index: int, opname: Any, request: Any, kw: dict) -> BatchResult:
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                response = self._call(opname, request, kw)
+            except FaultException as ex:
+                if not self.retry_faults or attempts > self.retries:
+                    return BatchResult(index, request, None, ex, attempts)
+                error = ex
+            except self.retry_on as ex:
+                # The connection is in an unknown state; start over.
+                self._discard_binding()
+                if attempts > self.retries:
+                    return BatchResult(index, request, None, ex, attempts)
+                error = ex
+            except Exception as ex:
+                self._discard_binding()
+                return BatchResult(index, request, None, ex, attempts)
+            else:
+                return BatchResult(index, request, response, None, attempts)
+
+            _log.debug(
+                "retry",
+                event="batch.retry",
+                index=index,
+                attempt=attempts,
+                error=error.__class__.__name__,
+            )
+            if self.backoff:
+                time.sleep(self.backoff * (2 ** (attempts - 1)))
+
+    def map(
+        self,
+        opname: str | tuple | Callable[[Any, Any], Any],
+        requests: Iterable[Any],
+        **kw: Any,
+    ) -> Iterator[BatchResult]:
+        """Yield a BatchResult per request, in request order.
+
+        opname -- operation name passed to ``binding.RPC``, or a callable
+            ``f(binding, request)`` (e.g. to call a generated port method)
+        kw -- passed to ``binding.RPC`` (replytype, soapaction, ...)
+        """
+        pending: deque = deque()
+        for index, request in enumerate(requests):
+            pending.append(self._pool.submit(self._run, index, opname, request, kw))
+            if len(pending) >= self.window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -10,19 +10,64 @@ from ZSI import _copyright, _seqtypes, ParsedSoap, SoapWriter, TC, \
     _find_arraytype, _find_type, _get_idstr, \
     _get_postvalue_from_absoluteURI, FaultException, WSActionException, \
     UNICODE_ENCODING
+from ZSI import compression
 from ZSI.auth import AUTH
 from ZSI.TC import String
 from ZSI.TCcompound import Struct
 import base64
+import codecs
+import collections
+import copy
 import http.client
+import io
 import http.cookies
+import select
+import threading
 import time
 import urllib.parse
+from ZSI._io import ConcatReader
 from ZSI.address import Address
+from ZSI.parse import IncrementalReader
+from ZSI.diagnostics import PhaseTimings
+from ZSI.digest_auth import DigestAuthSession
+from ZSI.telemetry import span
 from ZSI.wstools.logging import getLogger as _GetLogger
 _b64_encode = base64.encodebytes
 
 
+def _await_continue(h, timeout):
+    '''Wait up to timeout seconds for the server to answer a request
+    sent with "Expect: 100-continue" on connection h.  Returns None when
+    the body should be sent (100 Continue, or no answer in time), else
+    the server's final response.
+    '''
+
+    if not select.select([h.sock], [], [], timeout)[0]:
+        return None
+    fp = h.sock.makefile('rb')
+    line = fp.readline(65537)
+    if line.split(None, 2)[1:2] == [b'100']:
+        while fp.readline(65537) not in (b'\r\n', b'\n', b''):
+            pass
+        return None
+    response = h.response_class(_Replay(line, fp), method='POST')
+    response.begin()
+    return response
+
+
+class _Replay:
+    '''Socket stand-in for a response whose status line was already
+    read from fp.
+    '''
+
+    def __init__(self, line, fp):
+        (self.line, self.fp) = (line, fp)
+
+    def makefile(self, mode, *args, **kw):
+        return io.BufferedReader(ConcatReader([self.line, self.fp],
+                                 'latin-1'))
+
+
 class _AuthHeader:
 
     """<BasicAuth xmlns="ZSI_SCHEMA_URI">
@@ -127,6 +172,27 @@ class _NamedParamCaller:
             )
 
 
+class CallResponse(collections.namedtuple('CallResponse',
+        'status reason headers ps reply timings')):
+    '''Result of _Binding.call(): HTTP status and reason,
+    reply headers, the ParsedSoap, the parsed reply (or None) and the phase
+    timings (a read-only ZSI.diagnostics.PhaseTimings mapping, in seconds).
+    Use it in a with block (or call close()) to release the reply DOM.
+    '''
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        '''Release the reply DOM.
+        '''
+        self.ps.close()
+
+
 class _Binding(object):
 
     '''Object that represents a binding (connection) to a SOAP server.
@@ -137,6 +203,14 @@ class _Binding(object):
     defaultHttpTransport = http.client.HTTPConnection
     defaultHttpsTransport = http.client.HTTPSConnection
     logger = _GetLogger('ZSI.client.Binding')
+    release_dom = False
+    expect_continue_size = None
+    continue_timeout = 1.0
+    accept_encoding = 'gzip, deflate'
+    compress_min_size = None
+    compress_level = compression.DEFAULT_LEVEL
+    max_decoded_size = None
+    stream_block_size = 64 * 1024
 
     def __init__(
         self,
@@ -168,10 +242,46 @@ class _Binding(object):
             it's not used.
             sig_handler -- XML Signature handler, must sign and verify.
             endPointReference -- optional Endpoint Reference.
+            keepalive -- reuse the HTTP connection for the next request
+            to the same host once the previous reply has been read.
+            stream -- parse SOAP replies while they are being received:
+            each block of stream_block_size bytes read from the socket
+            is fed to the XML parser, and the reply text is not kept
+            (self.data stays None; a trace gets a copy as it arrives).
+            Only for the default reader (no readerclass).
+
+        After each Send, timings is a ZSI.diagnostics.PhaseTimings with the
+        serialize, connect, send, wait, receive, parse (DOM) and
+        typecode_parse durations of that request, filled in as the
+        request progresses.
+
+        With AUTH.httpdigest the digest challenge is kept in
+        digest_session (shared with clones), and later requests are sent
+        with an Authorization header straight away; the challenge is
+        only fetched again when the server answers 401 (e.g. stale=true).
+        Set expect_continue_size to send bodies of that many bytes or
+        more with "Expect: 100-continue", so a rejected body is not
+        transmitted.  It is None (off) by default: HTTP/1.0 servers,
+        like the dispatch handlers, never answer 100 Continue and each
+        such request would wait continue_timeout seconds.
+
+        Compressed replies are asked for with an Accept-Encoding header
+        of accept_encoding (None to turn it off) and are decoded as they
+        are read.  Request bodies of compress_min_size bytes or more are
+        sent gzip-compressed at compress_level; as not every server
+        accepts that, compress_min_size is None (off) by default.
+
+        The request DOM is released as soon as it is written out.  The
+        reply DOM (self.ps) is left to the garbage collector, as DOM nodes
+        taken from a reply (e.g. parsed with TC.XML) may still be in use.
+        Call ReleaseReply, or use call() in a with block, to release it
+        explicitly; set release_dom to True to have each Send release
+        the previous reply.
         '''
 
         self.data = None
         self.ps = None
+        self.timings = None
         self.user_headers = []
         self.nsdict = nsdict or {}
         self.transport = transport
@@ -186,8 +296,13 @@ class _Binding(object):
         self.address = None
         self.endPointReference = kw.get('endPointReference', None)
         self.cookies = http.cookies.SimpleCookie()
+        self._cookie_lock = threading.Lock()
         self.http_callbacks = {}
         self.soap_version = kw.get('soap_version', '1.1')
+        self.keepalive = kw.get('keepalive', False)
+        self.stream = kw.get('stream', False)
+        (self.h, self._h_key, self._h_idle) = (None, None, False)
+        self._early_response = None
         self.transport_options = {
             'verify': kw.get('verify', None),
             'proxies': kw.get('proxies', None),
@@ -214,6 +329,9 @@ class _Binding(object):
 
         (self.auth_style, self.auth_user, self.auth_pass) = (style,
                 user, password)
+        self.digest_session = None
+        if style == AUTH.httpdigest:
+            self.digest_session = DigestAuthSession(user, password)
         return self
 
     def SetURL(self, url):
@@ -243,11 +361,60 @@ class _Binding(object):
         self.user_headers.append((header, value))
         return self
 
-    def __addcookies(self):
-        '''Add cookies from self.cookies to request in self.h
+    def clone(self):
+        '''Return a binding with the same configuration and no request
+        state, e.g. for use by another thread.
+        '''
+
+        # Binding.__getattr__ answers for any name, so copy.copy() can't
+        # be used safely here.
+        other = self.__class__.__new__(self.__class__)
+        other.__dict__.update(self.__dict__)
+        (other.data, other.ps, other.address) = (None, None, None)
+        other.timings = None
+        (other.h, other._h_key, other._h_idle) = (None, None, False)
+        other._early_response = None
+        other.user_headers = list(self.user_headers)
+        other.transdict = dict(self.transdict)
+        other.cookies = copy.deepcopy(self.cookies)
+        other._cookie_lock = threading.Lock()
+        other.http_callbacks = {}
+        return other
+
+    def ReleaseReply(self):
+        '''Release the DOM of the last reply now, rather than on the
+        next Send.
+        '''
+        if self.ps is not None:
+            self.ps.close()
+
+    def map(
+        self,
+        opname,
+        requests,
+        concurrency=4,
+        retries=0,
+        **kw
+        ):
+        '''Call opname once per request using concurrency worker bindings
+        (see ZSI.batch.BatchExecutor); yields BatchResult objects in
+        request order.  Remaining keyword arguments go to RPC().
+        '''
+
+        from ZSI.batch import BatchExecutor
+        with BatchExecutor(self, concurrency=concurrency,
+                           retries=retries) as executor:
+            for result in executor.map(opname, requests, **kw):
+                yield result
+
+    def _cookie_headers(self):
+        '''Return the Cookie header values for self.cookies.
         '''
 
-        for (cname, morsel) in list(self.cookies.items()):
+        values = []
+        with self._cookie_lock:
+            items = list(self.cookies.items())
+        for (cname, morsel) in items:
             attrs = []
             value = morsel.get('version', '')
             if value != '' and value != '0':
@@ -259,7 +426,17 @@ class _Binding(object):
             value = morsel.get('domain')
             if value:
                 attrs.append('$Domain=%s' % value)
-            self.h.putheader('Cookie', '; '.join(attrs))
+            values.append('; '.join(attrs))
+        return values
+
+    def _load_cookies(self, response):
+        '''Store the Set-Cookie headers of response in self.cookies.
+        '''
+
+        values = response.msg.get_all('set-cookie') or ()
+        with self._cookie_lock:
+            for value in values:
+                self.cookies.load(value)
 
     def RPC(
         self,
@@ -315,6 +492,43 @@ class _Binding(object):
         '''
 
         url = url or self.url
+        timings = self.timings = PhaseTimings()
+        (sw, self.address) = self._serialize_request(url, opname, obj,
+                nsdict, wsaction, endPointReference, soapheaders, **kw)
+        (transport, netloc) = self._get_transport(url)
+
+        # Send the request.
+
+        soapdata = str(sw)
+        sw.release()
+        timings.mark('serialize')
+        key = (transport, netloc)
+        with span("zsi.transport.write", phase="transport_write"):
+            if not (self.keepalive and self._h_idle and self._h_key == key):
+                self.h = transport(netloc, None, **self.transdict)
+                self.h.connect()
+                self._h_key = key
+                timings.mark('connect')
+            self._h_idle = False
+            self.boundary = sw.getMIMEBoundary()
+            self.startCID = sw.getStartCID()
+            self.SendSOAPData(soapdata, url, soapaction, **kw)
+
+    def _serialize_request(
+        self,
+        url,
+        opname,
+        obj,
+        nsdict={},
+        wsaction=None,
+        endPointReference=None,
+        soapheaders=(),
+        **kw
+        ):
+        '''Serialize a request, see Send() for the arguments.  Returns
+        (SoapWriter, Address or None); the binding is not modified.
+        '''
+
         endPointReference = endPointReference or self.endPointReference
 
         # Serialize the object.
@@ -362,15 +576,16 @@ class _Binding(object):
         #
         # Serialize WS-Address
 
+        address = None
         if self.wsAddressURI is not None:
             if self.soapaction and wsaction.strip('\'"') \
                 != self.soapaction:
                 raise WSActionException('soapAction(%s) and WS-Action(%s) must match'
                          % (self.soapaction, wsaction))
 
-            self.address = Address(url, self.wsAddressURI)
-            self.address.setRequest(endPointReference, wsaction)
-            self.address.serialize(sw)
+            address = Address(url, self.wsAddressURI)
+            address.setRequest(endPointReference, wsaction)
+            address.serialize(sw)
 
         #
         # WS-Security Signature Handler
@@ -378,6 +593,12 @@ class _Binding(object):
         if self.sig_handler is not None:
             self.sig_handler.sign(sw)
 
+        return (sw, address)
+
+    def _get_transport(self, url):
+        '''Return (transport class, netloc) for url.
+        '''
+
         (
             scheme,
             netloc,
@@ -396,17 +617,9 @@ class _Binding(object):
                 raise RuntimeError('must specify transport or url startswith https/http'
                                    )
 
-        # Send the request.
-
         if issubclass(transport, http.client.HTTPConnection) is False:
             raise TypeError('transport must be a HTTPConnection')
-
-        soapdata = str(sw)
-        self.h = transport(netloc, None, **self.transdict)
-        self.h.connect()
-        self.boundary = sw.getMIMEBoundary()
-        self.startCID = sw.getStartCID()
-        self.SendSOAPData(soapdata, url, soapaction, **kw)
+        return (transport, netloc)
 
     def SendSOAPData(
         self,
@@ -426,12 +639,97 @@ class _Binding(object):
 
         url = url or self.url
         request_uri = _get_postvalue_from_absoluteURI(url)
-        self.h.putrequest('POST', request_uri)
-        self.h.putheader('Content-Length', '%d' % len(soapdata))
-        soap_action = soapaction or self.soapaction
+        body = soapdata
+        if isinstance(body, str):
+            body = body.encode(UNICODE_ENCODING)
+        if self.auth_style == AUTH.httpdigest and 'Authorization' \
+            not in headers:
+
+            def digest_auth_cb(response):
+                self.SendSOAPDataHTTPDigestAuth(
+                    response,
+                    soapdata,
+                    url,
+                    request_uri,
+                    soapaction,
+                    **kw
+                    )
+                self.http_callbacks[401] = None
+
+            self.http_callbacks[401] = digest_auth_cb
+            authorization = self.digest_session.authorization('POST',
+                    request_uri)
+            if authorization is not None:
+                headers = dict(headers, Authorization=authorization)
+
+        self._early_response = self._write_request(self.h, body,
+                request_uri, soapaction or self.soapaction, self.boundary,
+                getattr(self, 'startCID', None), headers)
+        self._mark_timing('send')
+
+        # Clear prior receive state.
+
+        if self.ps is not None and self.release_dom:
+            self.ps.close()
+        (self.data, self.ps) = (None, None)
+
+    def _mark_timing(self, phase):
+        if self.timings is not None:
+            self.timings.mark(phase)
+
+    def _write_request(
+        self,
+        h,
+        body,
+        request_uri,
+        soap_action,
+        boundary,
+        startCID,
+        headers,
+        ):
+        '''Send a POST of body on connection h.  Returns the server's
+        final response if it answered "Expect: 100-continue" without
+        asking for the body (which is then not sent), else None.
+        '''
+
+        if self.compress_min_size is not None \
+            and len(body) >= self.compress_min_size:
+            body = compression.compress(body, 'gzip', self.compress_level)
+            headers = dict(headers, **{'Content-Encoding': 'gzip'})
+        expect = self.expect_continue_size is not None \
+            and len(body) >= self.expect_continue_size
+        if expect:
+            headers = dict(headers, Expect='100-continue')
+        self._put_request(h, body, request_uri, soap_action, boundary,
+                          startCID, headers)
+        h.endheaders()
+        if expect:
+            response = _await_continue(h, self.continue_timeout)
+            if response is not None:
+                return response
+        h.send(body)
+        return None
+
+    def _put_request(
+        self,
+        h,
+        soapdata,
+        request_uri,
+        soap_action,
+        boundary,
+        startCID,
+        headers,
+        ):
+        '''Start a POST on connection h and put all request headers
+        except the final endheaders().  soapdata is the encoded body.
+        '''
+
+        h.putrequest('POST', request_uri,
+                     skip_accept_encoding=bool(self.accept_encoding))
+        h.putheader('Content-Length', '%d' % len(soapdata))
         soap_version = str(self.soap_version or '1.1')
         is_soap12 = soap_version.startswith('1.2')
-        if len(self.boundary) == 0:
+        if len(boundary) == 0:
 
             # no attachment
 
@@ -439,56 +737,39 @@ class _Binding(object):
                 ctype = 'application/soap+xml; charset="%s"' % UNICODE_ENCODING
                 if soap_action:
                     ctype += '; action="%s"' % soap_action
-                self.h.putheader('Content-Type', ctype)
+                h.putheader('Content-Type', ctype)
             else:
-                self.h.putheader('Content-Type', 'text/xml; charset="%s"'
-                                 % UNICODE_ENCODING)
+                h.putheader('Content-Type', 'text/xml; charset="%s"'
+                            % UNICODE_ENCODING)
         else:
 
             # we have attachment
 
             # contentType = 'multipart/related; '
 
-            self.h.putheader('Content-Type',
-                             'multipart/related; boundary="'
-                             + self.boundary + '"; start="'
-                             + self.startCID + '"; type="text/xml"')
-        self.__addcookies()
+            h.putheader('Content-Type',
+                        'multipart/related; boundary="'
+                        + boundary + '"; start="'
+                        + startCID + '"; type="text/xml"')
+        for value in self._cookie_headers():
+            h.putheader('Cookie', value)
+        if self.accept_encoding:
+            h.putheader('Accept-Encoding', self.accept_encoding)
 
         for (header, value) in list(headers.items()):
-            self.h.putheader(header, value)
+            h.putheader(header, value)
 
         if not is_soap12:
             SOAPActionValue = '"%s"' % soap_action
-            self.h.putheader('SOAPAction', SOAPActionValue)
+            h.putheader('SOAPAction', SOAPActionValue)
         if self.auth_style & AUTH.httpbasic:
-            val = _b64_encode(self.auth_user + ':'
-                              + self.auth_pass).replace("\012", '')
-            self.h.putheader('Authorization', 'Basic ' + val)
-        elif self.auth_style == AUTH.httpdigest and 'Authorization' \
-            not in headers and 'Expect' not in headers:
-
-            def digest_auth_cb(response):
-                self.SendSOAPDataHTTPDigestAuth(
-                    response,
-                    soapdata,
-                    url,
-                    request_uri,
-                    soapaction,
-                    **kw
-                    )
-                self.http_callbacks[401] = None
-
-            self.http_callbacks[401] = digest_auth_cb
+            val = _b64_encode(('%s:%s' % (self.auth_user, self.auth_pass)
+                               ).encode(UNICODE_ENCODING))
+            h.putheader('Authorization', 'Basic '
+                        + val.decode('ascii').replace("\012", ''))
 
         for (header, value) in self.user_headers:
-            self.h.putheader(header, value)
-        self.h.endheaders()
-        self.h.send(soapdata)
-
-        # Clear prior receive state.
-
-        (self.data, self.ps) = (None, None)
+            h.putheader(header, value)
 
     def SendSOAPDataHTTPDigestAuth(
         self,
@@ -513,39 +794,55 @@ class _Binding(object):
             raise RuntimeError('Auth style(%d) does not support requested digest authorization.'
                                 % self.auth_style)
 
-        from ZSI.digest_auth import fetch_challenge, generate_response, \
-            build_authorization_arg, dict_fetch
-
-        chaldict = fetch_challenge(response.getheader('www-authenticate'
-                                   ))
-        if dict_fetch(chaldict, 'challenge', '').lower() == 'digest' \
-            and dict_fetch(chaldict, 'nonce', None) \
-            and dict_fetch(chaldict, 'realm', None) \
-            and dict_fetch(chaldict, 'qop', None):
-            authdict = generate_response(chaldict, request_uri,
-                    self.auth_user, self.auth_pass, method='POST')
-            headers = \
-                {'Authorization': build_authorization_arg(authdict),
-                 'Expect': '100-continue'}
-            self.SendSOAPData(soapdata, url, soapaction, headers, **kw)
-            return
-
-        raise RuntimeError('Client expecting digest authorization challenge.'
-                           )
+        headers = {'Authorization': self._digest_authorization(response,
+                   request_uri)}
+        self.SendSOAPData(soapdata, url, soapaction, headers, **kw)
+
+    def _digest_authorization(self, response, request_uri):
+        '''Take the digest challenge in a 401 response into
+        digest_session; returns the Authorization header value answering it.
+        '''
+
+        self.digest_session.challenge(response.getheader('www-authenticate'))
+        return self.digest_session.authorization('POST', request_uri)
 
     def ReceiveRaw(self, **kw):
         '''Read a server reply, unconverted to any format and return it.
         '''
 
-        if self.data:
+        if self.data or self.ps is not None:
             return self.data
+        return self._receive_raw(self._get_response())
+
+    def _receive_raw(self, response):
+        with span("zsi.transport.wait", phase="transport_wait"):
+            self.data = self._read_reply(response)
+            self._mark_timing('receive')
+        if self.trace:
+            print(self.data, file=self.trace)
+        self._h_idle = True
+        return self.data
+
+    def _get_response(self):
+        '''Wait for the final response to the request sent, answering a
+        digest challenge on the way.  The body of the response returned
+        is left unread.
+        '''
+
         trace = self.trace
         while 1:
-            response = self.h.getresponse()
-
-            (self.reply_code, self.reply_msg, self.reply_headers,
-             self.data) = (response.status, response.reason,
-                           response.msg, response.read())
+            with span("zsi.transport.wait", phase="transport_wait"):
+                (response, self._early_response) = (self._early_response,
+                        None)
+                if response is None:
+                    response = self.h.getresponse()
+                else:
+                    # The body was never sent, so the connection can't
+                    # be reused; close() lets the next request reconnect.
+                    self.h.close()
+                self._mark_timing('wait')
+            (self.reply_code, self.reply_msg, self.reply_headers) = \
+                (response.status, response.reason, response.msg)
             if trace:
                 print('_' * 33, time.ctime(time.time()), \
                     'RESPONSE:', file=trace)
@@ -553,18 +850,11 @@ class _Binding(object):
                     print(str(i), file=trace)
                 print('-------', file=trace)
                 print(str(self.reply_headers), file=trace)
-                print(self.data, file=trace)
-            saved = None
-            for d in response.msg.getallmatchingheaders('set-cookie'):
-                if d[0] in [' ', '\t']:
-                    saved += d.strip()
-                else:
-                    if saved:
-                        self.cookies.load(saved)
-                    saved = d.strip()
-            if saved:
-                self.cookies.load(saved)
+            self._load_cookies(response)
             if response.status == 401:
+                self.data = self._read_reply(response)
+                if trace:
+                    print(self.data, file=trace)
                 if not callable(self.http_callbacks.get(response.status,
                                 None)):
                     raise RuntimeError('HTTP Digest Authorization Failed'
@@ -572,21 +862,71 @@ class _Binding(object):
                 self.http_callbacks[response.status](response)
                 continue
             if response.status != 100:
-                break
+                if self.digest_session is not None:
+                    self.digest_session.info(
+                        response.getheader('authentication-info'))
+                return response
 
             # The httplib doesn't understand the HTTP continuation header.
             # Horrible internals hack to patch things up.
 
             self.h._HTTPConnection__state = http.client._CS_REQ_SENT
             self.h._HTTPConnection__response = None
-        return self.data
+
+    def _read_reply(self, response):
+        '''Read the body of response, decoding its Content-Encoding block
+        by block.
+        '''
+
+        encoding = response.getheader('content-encoding')
+        if not encoding:
+            return response.read()
+        return b''.join(compression.iterdecode_stream(response, encoding,
+                        self.max_decoded_size))
+
+    def _streams(self, response, readerclass):
+        '''True if the body of response should be parsed as it is read.
+        '''
+
+        return self.stream and readerclass is None \
+            and response.status != 401 \
+            and response.msg.get_content_type() in ('text/xml',
+                'application/soap+xml')
+
+    def _stream_reply(self, response):
+        '''Feed the body of response to the XML parser block by block,
+        as it arrives, and return the Document.  The trace, if any, gets
+        a copy of each block.
+        '''
+
+        reader = IncrementalReader()
+        tee = None
+        if self.trace:
+            tee = codecs.getincrementaldecoder(UNICODE_ENCODING)('replace')
+        size = 0
+        try:
+            for chunk in compression.iterdecode_stream(response,
+                    response.getheader('content-encoding'),
+                    self.max_decoded_size, self.stream_block_size):
+                size += len(chunk)
+                if tee is not None:
+                    self.trace.write(tee.decode(chunk))
+                reader.feed(chunk)
+        except Exception:
+            response.close()
+            raise
+        if tee is not None:
+            print(tee.decode(b'', True), file=self.trace)
+        if size == 0:
+            raise TypeError('Received empty response')
+        return reader.close()
 
     def IsSOAP(self):
         if self.ps:
             return 1
         self.ReceiveRaw()
-        mimetype = self.reply_headers.type
-        return mimetype == 'text/xml'
+        mimetype = self.reply_headers.get_content_type()
+        return mimetype in ('text/xml', 'application/soap+xml')
 
     def ReceiveSOAP(self, readerclass=None, **kw):
         '''Get back a SOAP message.
@@ -594,15 +934,31 @@ class _Binding(object):
 
         if self.ps:
             return self.ps
+        readerclass = readerclass or self.readerclass
+        if self.stream and self.data is None and readerclass is None:
+            response = self._get_response()
+            if not self._streams(response, readerclass):
+                self._receive_raw(response)
+            else:
+                with span("zsi.transport.wait", phase="transport_wait"):
+                    dom = self._stream_reply(response)
+                    self._mark_timing('receive')
+                self._h_idle = True
+                return self._parsed(ParsedSoap(dom,
+                                    encodingStyle=kw.get('encodingStyle')))
+
         if not self.IsSOAP():
             raise TypeError('Response is "%s", not "text/xml"'
-                            % self.reply_headers.type)
+                            % self.reply_headers.get_content_type())
         if len(self.data) == 0:
             raise TypeError('Received empty response')
 
-        self.ps = ParsedSoap(self.data, readerclass=readerclass
-                             or self.readerclass,
-                             encodingStyle=kw.get('encodingStyle'))
+        return self._parsed(ParsedSoap(self.data, readerclass=readerclass,
+                            encodingStyle=kw.get('encodingStyle')))
+
+    def _parsed(self, ps):
+        self.ps = ps
+        self._mark_timing('parse')
 
         if self.sig_handler is not None:
             self.sig_handler.verify(self.ps)
@@ -647,8 +1003,124 @@ class _Binding(object):
         reply = self.ps.Parse(tc)
         if self.address is not None:
             self.address.checkResponse(self.ps, kw.get('wsaction'))
+        self._mark_timing('typecode_parse')
         return reply
 
+    def call(
+        self,
+        opname,
+        request,
+        responsetypecode=None,
+        url=None,
+        soapaction=None,
+        **kw
+        ):
+        '''Send a request and return a CallResponse.  Unlike Send() and
+        Receive() nothing is stored on the binding (except cookies), so
+        one binding may be shared by several threads as long as its
+        configuration isn't changed while calls are in flight.
+
+        arguments:
+            opname -- struct wrapper, see Send()
+            request -- python instance
+            responsetypecode -- typecode (or class with a typecode) used
+                to parse the reply; if None, CallResponse.reply is None.
+
+        key word arguments are those of Send() and Receive().  A SOAP fault
+        raises FaultException.
+        '''
+
+        url = url or self.url
+        timings = PhaseTimings()
+        (sw, address) = self._serialize_request(url, opname, request,
+                **kw)
+        soapdata = str(sw)
+        sw.release()
+        body = soapdata.encode(UNICODE_ENCODING)
+        timings.mark('serialize')
+
+        (transport, netloc) = self._get_transport(url)
+        request_uri = _get_postvalue_from_absoluteURI(url)
+        soap_action = soapaction or self.soapaction
+        headers = {}
+        challenged = False
+        session = self.digest_session
+        if session is not None:
+            authorization = session.authorization('POST', request_uri)
+            if authorization is not None:
+                headers['Authorization'] = authorization
+        h = transport(netloc, None, **self.transdict)
+        try:
+            while 1:
+                with span("zsi.transport.write", phase="transport_write"):
+                    h.connect()
+                    timings.mark('connect')
+                    response = self._write_request(h, body, request_uri,
+                            soap_action, sw.getMIMEBoundary(),
+                            sw.getStartCID(), headers)
+                    timings.mark('send')
+                with span("zsi.transport.wait", phase="transport_wait"):
+                    if response is None:
+                        response = h.getresponse()
+                    timings.mark('wait')
+                self._load_cookies(response)
+                if response.status == 401 and not challenged \
+                    and session is not None:
+                    self._read_reply(response)
+                    headers['Authorization'] = \
+                        self._digest_authorization(response, request_uri)
+                    challenged = True
+                    h.close()
+                    continue
+                if session is not None:
+                    session.info(response.getheader('authentication-info'))
+                break
+
+            if self.trace:
+                print('_' * 33, time.ctime(time.time()), 'CALL:', file=self.trace)
+                print(soapdata, file=self.trace)
+                print('-------', file=self.trace)
+                print(response.status, response.reason, file=self.trace)
+            readerclass = kw.get('readerclass') or self.readerclass
+            streaming = self._streams(response, readerclass)
+            with span("zsi.transport.wait", phase="transport_wait"):
+                if streaming:
+                    data = self._stream_reply(response)
+                else:
+                    data = self._read_reply(response)
+                    if self.trace:
+                        print(data, file=self.trace)
+                timings.mark('receive')
+        finally:
+            h.close()
+
+        if response.status == 401:
+            raise RuntimeError('HTTP Digest Authorization Failed')
+        if response.msg.get_content_type() not in ('text/xml',
+                'application/soap+xml'):
+            raise TypeError('Response is "%s", not "text/xml"'
+                            % response.msg.get_content_type())
+        if not streaming and len(data) == 0:
+            raise TypeError('Received empty response')
+
+        ps = ParsedSoap(data, readerclass=readerclass,
+                        encodingStyle=kw.get('encodingStyle'))
+        timings.mark('parse')
+        if self.sig_handler is not None:
+            self.sig_handler.verify(ps)
+        if ps.IsAFault():
+            raise FaultException(FaultFromFaultMessage(ps))
+
+        reply = None
+        if responsetypecode is not None:
+            reply = ps.Parse(getattr(responsetypecode, 'typecode',
+                             responsetypecode))
+        if address is not None:
+            address.checkResponse(ps, kw.get('wsaction'))
+        timings.mark('typecode_parse')
+        return CallResponse(response.status, response.reason,
+                            response.msg, ps, reply, timings)
+
     def __repr__(self):
         return '<%s instance %s>' % (self.__class__.__name__,
                 _get_idstr(self))
@@ -754,6 +1226,7 @@ class Binding(_Binding):
 
         if self.address is not None:
             self.address.checkResponse(ps, kw.get('wsaction'))
+        self._mark_timing('typecode_parse')
 
         return reply
 
@@ -0,0 +1,231 @@
+"""HTTP content codings (gzip, deflate) for SOAP messages.
+
+SOAP envelopes are verbose XML and usually compress 10-20x, which matters
+more than CPU time on slow links.  The client and the servers use these
+helpers to negotiate compression with ``Accept-Encoding`` and to
+encode or decode bodies according to ``Content-Encoding``::
+
+    coding = negotiate(headers.get("Accept-Encoding"))
+    if coding and len(body) >= DEFAULT_MIN_SIZE:
+        body = compress(body, coding)
+
+Decoding works in blocks, so a compressed reply can be fed to the
+parser as it arrives.  A limit on the decoded size guards against
+compression bombs.
+"""
+
+from __future__ import annotations
+
+import io
+import zlib
+from typing import Any, Iterable, Iterator
+
+ENCODINGS = ("gzip", "deflate")
+DEFAULT_LEVEL = 6
+DEFAULT_MIN_SIZE = 1024
+BLOCK_SIZE = 64 * 1024
+
+
+class DecodingError(ValueError):
+    """A body could not be decoded, or decoded to more than allowed."""
+
+
+def _coding(encoding: str | None) -> str | None:
+    """Normalised content coding, None for identity."""
+    coding = (encoding or "").strip().lower()
+    if coding in ("", "identity"):
+        return None
+    if coding == "x-gzip":
+        return "gzip"
+    if coding not in ENCODINGS:
+        raise DecodingError("unsupported Content-Encoding %r" % encoding)
+    return coding
+
+
+def negotiate(accept_encoding: str | None, offered: Iterable[str] = ENCODINGS) -> str | None:
+    """Return the coding of offered the client prefers according to an
+    Accept-Encoding header value (ties go to the order of offered), or
+    None if identity should be used.
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params[:2].lower() == "q=":
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name == "x-gzip":
+            name = "gzip"
+        weights[name] = q
+    best, best_q = None, 0.0
+    for coding in offered:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def _compressobj(coding: str, level: int) -> Any:
+    return zlib.compressobj(level, zlib.DEFLATED, 31 if coding == "gzip" else 15)
+
+
+def compress(data: bytes, encoding: str, level: int = DEFAULT_LEVEL) -> bytes:
+    """Return data encoded with the content coding encoding."""
+    coding = _coding(encoding)
+    if coding is None:
+        return data
+    c = _compressobj(coding, level)
+    return c.compress(data) + c.flush()
+
+
+def itercompress(chunks: Iterable[bytes], encoding: str,
+                 level: int = DEFAULT_LEVEL) -> Iterator[bytes]:
+    """Encode an iterable of blocks, yielding encoded blocks."""
+    coding = _coding(encoding)
+    if coding is None:
+        yield from chunks
+        return
+    c = _compressobj(coding, level)
+    for chunk in chunks:
+        out = c.compress(chunk)
+        if out:
+            yield out
+    yield c.flush()
+
+
+class Decoder:
+    """Incremental decoder of one body: feed the encoded blocks to
+    decode() as they arrive, then call flush() at the end.
+
+    encoding -- Content-Encoding of the body (identity passes through)
+    max_size -- DecodingError once more than this many bytes are decoded
+    """
+
+    def __init__(self, encoding: str | None, max_size: int | None = None) -> None:
+        self.coding = _coding(encoding)
+        self.max_size = max_size
+        self.size = 0
+        self._d = None
+        self._head = None
+        if self.coding == "gzip":
+            self._d = zlib.decompressobj(31)
+        elif self.coding == "deflate":
+            # deflate is meant to be zlib-wrapped, but some servers send
+            # a raw stream; which one it is shows in the first 2 bytes.
+            self._head = b""
+        self._first = True
+
+    def decode(self, data: bytes) -> bytes:
+        if self._head is not None:
+            self._head += bytes(data)
+            if len(self._head) < 2:
+                return b""
+            data, self._head = self._head, None
+            cmf, flg = data[0], data[1]
+            zlib_header = cmf & 0x0F == 8 and (cmf << 8 | flg) % 31 == 0
+            self._d = zlib.decompressobj(15 if zlib_header else -15)
+            # A raw stream may start like a zlib header by chance.
+            self._first = zlib_header
+        if self._d is None:
+            return self._count(bytes(data))
+        first, self._first = self._first, False
+        block, out = data, []
+        try:
+            # Inflate in bounded blocks so max_size is enforced before a
+            # small body can expand into a huge one.
+            while True:
+                out.append(self._count(self._d.decompress(block, BLOCK_SIZE)))
+                block = self._d.unconsumed_tail
+                if not block:
+                    return b"".join(out)
+        except zlib.error as ex:
+            if not (first and self.coding == "deflate"):
+                raise DecodingError("invalid %s body: %s" % (self.coding, ex))
+            self._d = zlib.decompressobj(-15)
+            self.size = 0
+            return self.decode(data)
+
+    def flush(self) -> bytes:
+        if self._head is not None:
+            raise DecodingError("truncated %s body" % self.coding)
+        if self._d is None:
+            return b""
+        out = self._count(self._d.flush())
+        if not self._d.eof:
+            raise DecodingError("truncated %s body" % self.coding)
+        return out
+
+    def _count(self, out: bytes) -> bytes:
+        self.size += len(out)
+        if self.max_size is not None and self.size > self.max_size:
+            raise DecodingError("decoded body exceeds %d bytes" % self.max_size)
+        return out
+
+
+def iterdecode(chunks: Iterable[bytes], encoding: str | None,
+               max_size: int | None = None) -> Iterator[bytes]:
+    """Decode an iterable of encoded blocks, yielding decoded blocks."""
+    decoder = Decoder(encoding, max_size)
+    if decoder.coding is None and max_size is None:
+        yield from chunks
+        return
+    for chunk in chunks:
+        out = decoder.decode(chunk)
+        if out:
+            yield out
+    out = decoder.flush()
+    if out:
+        yield out
+
+
+def decode(data: bytes, encoding: str | None, max_size: int | None = None) -> bytes:
+    """Return data decoded from the content coding encoding."""
+    if _coding(encoding) is None:
+        return data
+    return b"".join(iterdecode((data,), encoding, max_size))
+
+
+def _blocks(fp: Any, size: int) -> Iterator[bytes]:
+    read = getattr(fp, "read1", None) or fp.read
+    while True:
+        data = read(size)
+        if not data:
+            return
+        yield data
+
+
+def iterdecode_stream(fp: Any, encoding: str | None, max_size: int | None = None,
+                      block_size: int = BLOCK_SIZE) -> Iterator[bytes]:
+    """Read fp (e.g. an http.client.HTTPResponse) to the end in blocks,
+    yielding its decoded content.
+    """
+    return iterdecode(_blocks(fp, block_size), encoding, max_size)
+
+
+class DecodingReader(io.RawIOBase):
+    """Binary stream of the decoded content of fp."""
+
+    def __init__(self, fp: Any, encoding: str | None, max_size: int | None = None,
+                 block_size: int = BLOCK_SIZE) -> None:
+        self._chunks = iterdecode_stream(fp, encoding, max_size, block_size)
+        self._pending = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._pending = memoryview(chunk)
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
@@ -2,12 +2,17 @@
 
 from __future__ import annotations
 
+from collections.abc import Mapping
+from time import perf_counter
+import string
 import traceback
 import uuid
-from typing import Any, Callable, TypeVar
+from typing import Any, Callable, Iterator, TypeVar
 
 T = TypeVar("T")
 
+_REQUEST_ID_CHARS = frozenset(string.ascii_letters + string.digits + "-_.")
+
 
 def append_context_to_exception(ex: Exception, context: str) -> None:
     """Append contextual details to an existing exception without changing type."""
@@ -56,6 +61,74 @@ def make_request_id() -> str:
     return uuid.uuid4().hex[:12]
 
 
+def accept_request_id(value: str | None) -> str | None:
+    """Return a caller-supplied request id if it is safe to echo back.
+
+    Only short ids made of letters, digits, ``-``, ``_`` and ``.`` are kept;
+    anything else yields None so that a fresh id is generated instead.
+    """
+    if value and len(value) <= 64 and _REQUEST_ID_CHARS.issuperset(value):
+        return value
+    return None
+
+
+class PhaseTimings(Mapping):
+    """Durations (seconds) of the phases of one request, in order.
+
+    ``mark(phase)`` charges the time since the previous mark (or since
+    creation) to ``phase``; marking the same phase again adds to it.  The
+    object reads as a ``{phase: seconds}`` mapping.
+    """
+
+    __slots__ = ("request_id", "started", "_last", "_phases")
+
+    def __init__(self, request_id: str | None = None) -> None:
+        self.request_id = request_id or make_request_id()
+        self.started = self._last = perf_counter()
+        self._phases: dict[str, float] = {}
+
+    def mark(self, phase: str) -> float:
+        now = perf_counter()
+        self._phases[phase] = self._phases.get(phase, 0.0) + (now - self._last)
+        self._last = now
+        return now
+
+    def restart(self) -> None:
+        """Start the next interval now, dropping the time since the last mark."""
+        self._last = perf_counter()
+
+    def __getitem__(self, phase: str) -> float:
+        return self._phases[phase]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._phases)
+
+    def __len__(self) -> int:
+        return len(self._phases)
+
+    @property
+    def total(self) -> float:
+        return sum(self._phases.values())
+
+    def as_dict(self) -> dict:
+        """Return request_id plus the phase durations in milliseconds."""
+        return {
+            "request_id": self.request_id,
+            "phases_ms": {k: round(v * 1000.0, 3) for k, v in self._phases.items()},
+        }
+
+    def server_timing_header(self) -> str:
+        """Return the phases as a Server-Timing header value."""
+        return ", ".join(
+            "%s;dur=%.3f" % (phase, seconds * 1000.0)
+            for phase, seconds in self._phases.items()
+        )
+
+    def __repr__(self) -> str:
+        phases = " ".join("%s=%.3fms" % (k, v * 1000.0) for k, v in self._phases.items())
+        return f"<PhaseTimings {self.request_id} {phases}>"
+
+
 def summarize_exception(ex: Exception, tb: Any = None, max_frames: int = 2) -> str:
     """Build a compact, single-line exception summary for diagnostics."""
     try:
@@ -5,6 +5,7 @@
 import http.client
 import random
 import re
+import threading
 import time
 try:
     from hashlib import md5
@@ -14,6 +15,8 @@ except ImportError:
 random.seed(int(time.time()*10))
 
 def H(val):
+  if isinstance(val, str):
+    val = val.encode('utf-8')
   return md5(val).hexdigest()
 
 def KD(secret,data):
@@ -33,11 +36,12 @@ def dict_fetch(d,k,defval=None):
     return d[k]
   return defval
 
-def generate_response(chaldict,uri,username,passwd,method='GET',cnonce=None):
+def generate_response(chaldict,uri,username,passwd,method='GET',cnonce=None,nc=1):
   """
   Generate an authorization response dictionary. chaldict should contain the digest
   challenge in dict form. Use fetch_challenge to create a chaldict from a HTTPResponse
-  object like this: fetch_challenge(res.getheaders()).
+  object like this: fetch_challenge(res.getheaders()).  nc is the number of
+  requests sent with this nonce, including this one.
 
   returns dict (the authdict)
 
@@ -52,7 +56,7 @@ def generate_response(chaldict,uri,username,passwd,method='GET',cnonce=None):
   algorithm = dict_fetch(chaldict,'algorithm','MD5')
   realm = dict_fetch(chaldict,'realm','MD5')
   opaque = dict_fetch(chaldict,'opaque')
-  nc = "00000001"
+  nc = "%08x" % nc
   if not cnonce:
     cnonce = H(str(random.randint(0,10000000)))[:16]
 
@@ -73,6 +77,8 @@ def generate_response(chaldict,uri,username,passwd,method='GET',cnonce=None):
   authdict['qop'] = '"%s"' % qop
   authdict['nc'] = nc
   authdict['cnonce'] = '"%s"' % cnonce
+  if opaque:
+    authdict['opaque'] = '"%s"' % opaque
 
   return authdict
 
@@ -93,14 +99,16 @@ def fetch_challenge(http_header):
   d = dict(challenge=m.groups()[0])
   m = fetch_challenge.auth_param_re.search(http_header)
   while m is not None:
-      k,v = http_header[m.start():m.end()].split('=')
-      d[k.lower()] = v[1:-1]
+      k,v = http_header[m.start():m.end()].split('=', 1)
+      if v.startswith('"'):
+          v = v[1:-1]
+      d[k.lower()] = v
       m = fetch_challenge.auth_param_re.search(http_header, m.end())
 
   return d
 
 fetch_challenge.wwwauth_header_re = re.compile(r'\s*([bB]asic|[dD]igest)\s+(?:[\w]+="[^"]+",?\s*)?')
-fetch_challenge.auth_param_re = re.compile(r'[\w]+="[^"]+"')
+fetch_challenge.auth_param_re = re.compile(r'[\w]+=(?:"[^"]+"|[\w.+/=-]+)')
 
 
 def build_authorization_arg(authdict):
@@ -112,4 +120,75 @@ def build_authorization_arg(authdict):
     vallist += ['%s=%s' % (k,authdict[k])]
   return 'Digest '+', '.join(vallist)
 
+
+class DigestAuthSession:
+  """
+  Digest authorization state shared by the requests to one server: the
+  last challenge (realm, nonce, opaque, ...) and the nonce count.  Once a
+  challenge has been seen, authorization() answers it for every further
+  request without waiting for another 401; challenge() takes the next one
+  when the server rejects the nonce (stale=true) or the credentials.
+
+  Thread safe, so bindings cloned for other threads may share a session.
+  """
+
+  def __init__(self, username, passwd):
+    self.username = username
+    self.passwd = passwd
+    self.chaldict = None
+    self.nc = 0
+    self._lock = threading.Lock()
+
+  def challenge(self, http_header):
+    """
+    Take the challenge in a WWW-Authenticate header value.  Returns True
+    if the server only declared the nonce stale, i.e. the credentials were
+    accepted.
+    """
+    chaldict = fetch_challenge(http_header or '')
+    if dict_fetch(chaldict,'challenge','').lower() != 'digest' \
+      or not dict_fetch(chaldict,'nonce') \
+      or not dict_fetch(chaldict,'realm') \
+      or not dict_fetch(chaldict,'qop'):
+      raise RuntimeError('Client expecting digest authorization challenge.')
+    qops = [q.strip() for q in chaldict['qop'].split(',')]
+    if 'auth' in qops:
+      chaldict['qop'] = 'auth'
+    with self._lock:
+      self.chaldict, self.nc = chaldict, 0
+    return dict_fetch(chaldict,'stale','').lower() == 'true'
+
+  def authorization(self, method, uri):
+    """
+    Return the Authorization header value for a request, or None if no
+    challenge has been seen yet.
+    """
+    with self._lock:
+      chaldict = self.chaldict
+      if chaldict is None:
+        return None
+      self.nc += 1
+      nc = self.nc
+    authdict = generate_response(chaldict,uri,self.username,self.passwd,
+                                 method=method,nc=nc)
+    return build_authorization_arg(authdict)
+
+  def info(self, http_header):
+    """
+    Take the nextnonce of an Authentication-Info header value, if any.
+    """
+    if not http_header:
+      return
+    m = re.search(r'nextnonce="([^"]+)"', http_header)
+    if m is not None:
+      with self._lock:
+        if self.chaldict is not None:
+          self.chaldict = dict(self.chaldict, nonce=m.group(1))
+          self.nc = 0
+
+  def reset(self):
+    with self._lock:
+      self.chaldict, self.nc = None, 0
+
+
 if __name__ == '__main__': print(_copyright)
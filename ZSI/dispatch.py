@@ -3,12 +3,15 @@
 '''Simple CGI dispatching.
 '''
 
-import types, os, sys
+import io, types, os, sys
 from http.server import BaseHTTPRequestHandler, HTTPServer
 from ZSI import *
 from ZSI import _child_elements, _copyright, _seqtypes, _find_arraytype, _find_type, resolvers
+from ZSI import compression
 from ZSI.auth import _auth_tc, AUTH, ClientBinding
-from ZSI.diagnostics import make_request_id, summarize_exception
+from ZSI.diagnostics import PhaseTimings, accept_request_id, make_request_id, \
+    summarize_exception
+from ZSI.telemetry import traced
 from ZSI.wstools.logging import getLogger as _GetLogger
 
 
@@ -23,8 +26,10 @@ def GetClientBinding():
     return _client_binding
 
 gettypecode = lambda mod,e: getattr(mod, str(e.localName)).typecode
+@traced("zsi.dispatch", phase="dispatch")
 def _Dispatch(ps, modules, SendResponse, SendFault, nsdict={}, typesmodule=None,
-              gettypecode=gettypecode, rpc=False, docstyle=False, **kw):
+              gettypecode=gettypecode, rpc=False, docstyle=False,
+              request_id=None, timings=None, **kw):
     '''Find a handler for the SOAP request in ps; search modules.
     Call SendResponse or SendFault to send the reply back, appropriately.
 
@@ -42,9 +47,12 @@ def _Dispatch(ps, modules, SendResponse, SendFault, nsdict={}, typesmodule=None,
            or a list try to serialize it as a Struct but if this is not possible put it in an Array.
            Parsing done via a typecode from typesmodule, or Any.
 
+    request_id -- identifier quoted in logs and fault details.
+    timings -- a ZSI.diagnostics.PhaseTimings; the dispatch (handler) and
+        serialize phases are marked on it.
     '''
     global _client_binding
-    request_id = kw.get("request_id") or make_request_id()
+    request_id = request_id or make_request_id()
     try:
         what = str(ps.body_root.localName)
 
@@ -159,9 +167,14 @@ def _Dispatch(ps, modules, SendResponse, SendFault, nsdict={}, typesmodule=None,
             #tc = getattr(result, 'typecode', TC.Any(pname=what+'Response'))
             tc = TC.Any(pname=what+'Response')
 
-        sw = SoapWriter(nsdict=nsdict)
-        sw.serialize(result, tc)
-        return SendResponse(str(sw), **kw)
+        if timings is not None:
+            timings.mark('dispatch')
+        with SoapWriter(nsdict=nsdict) as sw:
+            sw.serialize(result, tc)
+            text = str(sw)
+        if timings is not None:
+            timings.mark('serialize')
+        return SendResponse(text, **kw)
     except Fault as e:
         return SendFault(e, **kw)
     except Exception as e:
@@ -212,17 +225,44 @@ def _CGISendFault(f, **kw):
 
 class SOAPRequestHandler(BaseHTTPRequestHandler):
     '''SOAP handler.
+
+    Each request's phase durations (receive, parse, dispatch, serialize,
+    send) are kept in self.timings; set server_timing to report them to
+    the client in a Server-Timing header.
+
+    Requests with a gzip or deflate Content-Encoding are decoded, up to
+    max_decoded_size bytes.  Replies of compress_min_size bytes or more
+    are compressed at compress_level when the client's Accept-Encoding
+    allows it; set compress_min_size to None to never compress.
     '''
     server_version = 'ZSI/1.1 ' + BaseHTTPRequestHandler.server_version
+    server_timing = False
+    timings = None
+    compress_min_size = compression.DEFAULT_MIN_SIZE
+    compress_level = compression.DEFAULT_LEVEL
+    max_decoded_size = 64 * 1024 * 1024
 
     def send_xml(self, text, code=200):
         '''Send some XML.
         '''
+        if isinstance(text, str):
+            text = text.encode(UNICODE_ENCODING)
+        coding = None
+        if self.compress_min_size is not None and len(text) >= self.compress_min_size:
+            coding = compression.negotiate(self.headers.get('Accept-Encoding'))
         self.send_response(code)
 
         if text:
             self.send_header('Content-type', 'text/xml; charset="%s"' %UNICODE_ENCODING)
+            if coding:
+                text = compression.compress(text, coding, self.compress_level)
+                self.send_header('Content-Encoding', coding)
+                self.send_header('Vary', 'Accept-Encoding')
             self.send_header('Content-Length', str(len(text)))
+        if self.timings is not None:
+            self.send_header('X-Request-Id', self.timings.request_id)
+            if self.server_timing:
+                self.send_header('Server-Timing', self.timings.server_timing_header())
 
         self.end_headers()
 
@@ -230,39 +270,60 @@ class SOAPRequestHandler(BaseHTTPRequestHandler):
             self.wfile.write(text)
 
         self.wfile.flush()
+        if self.timings is not None:
+            self.timings.mark('send')
 
     def send_fault(self, f, code=500):
         '''Send a fault.
         '''
         self.send_xml(f.AsSOAP(), code)
 
+    def read_body(self):
+        '''Read the request body, decoded according to its Content-Encoding.
+        '''
+        length = int(self.headers['content-length'])
+        return compression.decode(self.rfile.read(length),
+            self.headers.get('content-encoding'), self.max_decoded_size)
+
+    def body_stream(self):
+        '''The request body as a file, decoded according to its
+        Content-Encoding.
+        '''
+        if not self.headers.get('content-encoding'):
+            return self.rfile
+        return io.BytesIO(self.read_body())
+
     def do_POST(self):
         '''The POST command.
         '''
+        timings = self.timings = PhaseTimings(
+            accept_request_id(self.headers.get('X-Request-Id')))
+        rid = timings.request_id
         try:
             ct = self.headers['content-type']
             if ct.startswith('multipart/'):
-                cid = resolvers.MIMEResolver(ct, self.rfile)
+                cid = resolvers.MIMEResolver(ct, self.body_stream())
                 xml = cid.GetSOAPPart()
+                timings.mark('receive')
                 ps = ParsedSoap(xml, resolver=cid.Resolve)
             else:
-                length = int(self.headers['content-length'])
-                ps = ParsedSoap(self.rfile.read(length))
+                xml = self.read_body()
+                timings.mark('receive')
+                ps = ParsedSoap(xml)
+            timings.mark('parse')
         except ParseException as e:
-            rid = make_request_id()
             self.send_fault(FaultFromZSIException(e, request_id=rid))
             return
         except Exception as e:
             # Faulted while processing; assume it's in the header.
-            rid = make_request_id()
             self.send_fault(FaultFromException(e, 1, sys.exc_info()[2], request_id=rid))
             return
 
-        rid = make_request_id()
-        _Dispatch(ps, self.server.modules, self.send_xml, self.send_fault,
-                  docstyle=self.server.docstyle, nsdict=self.server.nsdict,
-                  typesmodule=self.server.typesmodule, rpc=self.server.rpc,
-                  request_id=rid)
+        with ps:
+            _Dispatch(ps, self.server.modules, self.send_xml, self.send_fault,
+                      docstyle=self.server.docstyle, nsdict=self.server.nsdict,
+                      typesmodule=self.server.typesmodule, rpc=self.server.rpc,
+                      request_id=rid, timings=timings)
 
 def AsServer(port=80, modules=None, docstyle=False, nsdict={}, typesmodule=None,
              rpc=False, addr=''):
@@ -298,9 +359,9 @@ def AsCGI(nsdict={}, typesmodule=None, rpc=False, modules=None):
 
 def AsHandler(request=None, modules=None, **kw):
     '''Dispatch from within ModPython.'''
-    ps = ParsedSoap(request)
     kw['request'] = request
-    _Dispatch(ps, modules, _ModPythonSendXML, _ModPythonSendFault, **kw)
+    with ParsedSoap(request) as ps:
+        _Dispatch(ps, modules, _ModPythonSendXML, _ModPythonSendFault, **kw)
 
 def AsJonPy(request=None, modules=None, **kw):
     '''Dispatch within a jonpy CGI/FastCGI script.
@@ -322,8 +383,9 @@ def AsJonPy(request=None, modules=None, **kw):
     except ParseException as e:
         _JonPySendFault(FaultFromZSIException(e, request_id=make_request_id()), **kw)
         return
-    _Dispatch(ps, modules, _JonPySendXML, _JonPySendFault,
-              request_id=make_request_id(), **kw)
+    with ps:
+        _Dispatch(ps, modules, _JonPySendXML, _JonPySendFault,
+                  request_id=make_request_id(), **kw)
 
 
 if __name__ == '__main__': print(_copyright)
@@ -11,6 +11,8 @@ from ZSI.TC import QName, URI, String, AnyElement, UNBOUNDED
 from ZSI.wstools.Namespaces import SOAP, ZSI_SCHEMA_URI
 from ZSI.TC import ElementDeclaration
 
+import threading
+import time
 import traceback
 
 from ZSI.diagnostics import make_request_id, summarize_exception
@@ -96,6 +98,29 @@ class ZSIFaultDetail:
 ZSIFaultDetail.typecode = ZSIFaultDetailTypeCode()
 
 
+class ZSIParseFaultDetailTypeCode(ElementDeclaration, Struct):
+    '''<ZSI:ParseFaultDetail>
+           <ZSI:string>%s</ZSI:string>
+           <ZSI:trace>%s</ZSI:trace>
+       </ZSI:ParseFaultDetail>
+    '''
+    schema = ZSI_SCHEMA_URI
+    literal = 'ParseFaultDetail'
+
+    def __init__(self, **kw):
+        Struct.__init__(self, ZSIParseFaultDetail,
+            [String(pname=(ZSI_SCHEMA_URI, 'string')),
+             String(pname=(ZSI_SCHEMA_URI, 'trace'), minOccurs=0)],
+            pname=(ZSI_SCHEMA_URI, 'ParseFaultDetail'), **kw
+        )
+
+
+class ZSIParseFaultDetail(ZSIFaultDetail):
+    def __repr__(self):
+        return "<%s.ZSIParseFaultDetail %s>" % (__name__, _get_idstr(self))
+ZSIParseFaultDetail.typecode = ZSIParseFaultDetailTypeCode()
+
+
 class URIFaultDetailTypeCode(ElementDeclaration, Struct):
     '''
     <ZSI:URIFaultDetail>
@@ -176,11 +201,11 @@ class Fault(ZSIException):
         # SOAP spec doesn't say how to encode header fault data.
         return ZSIHeaderDetail(self.headerdetail)
 
-    def serialize(self, sw):
-        '''Serialize the object.'''
-        detail = None
+    def _detail_items(self):
+        '''Return the items of the fault's detail element, including
+        the request_id/context_summary record, or None for no detail.
+        '''
         if self.detail is not None:
-            detail = Detail()
             detail_items = list(self.detail)
             if self.request_id:
                 detail_items.append(
@@ -191,20 +216,32 @@ class Fault(ZSIException):
                 )
             elif self.context_summary:
                 detail_items.append(ZSIFaultDetail(string="context", trace=self.context_summary))
-            detail.any = tuple(detail_items)
-        elif self.request_id or self.context_summary:
-            detail = Detail()
-            detail.any = (
+            return detail_items
+        if self.request_id or self.context_summary:
+            return [
                 ZSIFaultDetail(
                     string=f"request_id={self.request_id or '-'}",
                     trace=self.context_summary,
                 ),
-            )
+            ]
+        return None
+
+    def serialize(self, sw):
+        '''Serialize the object.'''
+        detail = None
+        detail_items = self._detail_items()
+        if detail_items is not None:
+            detail = Detail()
+            detail.any = tuple(detail_items)
 
         pyobj = FaultType(self.code, self.string, self.actor, detail)
         sw.serialize(pyobj, typed=False)
 
     def AsSOAP(self, **kw):
+        if not kw:
+            text = _RenderFault(self)
+            if text is not None:
+                return text
 
         header = self.DataForSOAPHeader()
         sw = SoapWriter(**kw)
@@ -233,6 +270,111 @@ class Fault(ZSIException):
     AsSoap = AsSOAP
 
 
+# Fast path: faults whose details are all ZSI detail records are written
+# by filling a template taken from SoapWriter's own output, instead of
+# building and canonicalizing a DOM for every fault.
+
+def _escape(text):
+    return str(text).replace('&', '&amp;').replace('<', '&lt;') \
+        .replace('>', '&gt;').replace('\r', '&#xD;')
+
+_DETAIL_FIELDS = {
+    ZSIFaultDetail: ('FaultDetail', ('string', 'trace')),
+    ZSIParseFaultDetail: ('ParseFaultDetail', ('string', 'trace')),
+    URIFaultDetail: ('URIFaultDetail', ('URI', 'localname')),
+    ActorFaultDetail: ('ActorFaultDetail', ('URI',)),
+}
+_envelope_start = None
+
+def _RenderDetail(item):
+    spec = _DETAIL_FIELDS.get(type(item))
+    if spec is None:
+        return None
+    name, fields = spec
+    out = ['<ZSI:%s>' % name]
+    for field in fields:
+        value = getattr(item, field)
+        if value is None:
+            if field != 'trace':
+                return None
+            continue
+        if not isinstance(value, str):
+            return None
+        out.append('<ZSI:%s>%s</ZSI:%s>' % (field, _escape(value), field))
+    out.append('</ZSI:%s>' % name)
+    return ''.join(out)
+
+def _RenderFault(fault):
+    '''Return the SOAP text of fault from the template, or None if it
+    carries something only SoapWriter can serialize.
+    '''
+    global _envelope_start
+    if fault.actor is not None or not isinstance(fault.code, str) \
+            or not isinstance(fault.string, str):
+        return None
+    detail = fault._detail_items() or []
+    body = [_RenderDetail(item) for item in detail]
+    header = [_RenderDetail(item) for item in fault.headerdetail or ()]
+    if None in body or None in header:
+        return None
+
+    if _envelope_start is None:
+        _envelope_start = str(SoapWriter()).split('<SOAP-ENV:Header>', 1)[0]
+    out = [_envelope_start, '<SOAP-ENV:Header>']
+    if header:
+        out += ['<ZSI:detail>'] + header + ['</ZSI:detail>']
+    out.append('</SOAP-ENV:Header><SOAP-ENV:Body><SOAP-ENV:Fault><faultcode>%s'
+               '</faultcode><faultstring>%s</faultstring>'
+               % (_escape(fault.code), _escape(fault.string)))
+    if detail:
+        out += ['<detail>'] + body + ['</detail>']
+    out.append('</SOAP-ENV:Fault></SOAP-ENV:Body></SOAP-ENV:Envelope>')
+    return ''.join(out)
+
+
+class _TracebackLimiter:
+    '''Token bucket deciding whether a fault may include its traceback.
+    '''
+
+    def __init__(self, rate=100, burst=None):
+        self.configure(rate, burst)
+
+    def configure(self, rate, burst=None):
+        self.rate = rate
+        self.burst = float(burst if burst is not None else (rate or 0))
+        self.tokens, self.stamp = self.burst, time.monotonic()
+        self.suppressed = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        if self.rate is None:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            self.suppressed += 1
+            return False
+
+_traceback_limiter = _TracebackLimiter()
+
+def SetTracebackRate(rate, burst=None):
+    '''Limit how many faults per second render the traceback of their
+    exception (default 100); rate None renders all of them, 0 none.
+    Faults over the limit still carry the exception message.
+    '''
+    _traceback_limiter.configure(rate, burst)
+
+def GetTracebackRate():
+    '''Return (rate, burst, number of tracebacks suppressed so far).
+    '''
+    limiter = _traceback_limiter
+    return limiter.rate, limiter.burst, limiter.suppressed
+
+
 def FaultFromNotUnderstood(uri, localname, actor=None):
     detail, headerdetail = None, URIFaultDetail(uri, localname)
     return Fault(Fault.MU, 'SOAP mustUnderstand not understood',
@@ -253,11 +395,7 @@ def FaultFromZSIException(ex, actor=None, request_id=None, context_summary=None)
     mytrace = getattr(ex, 'trace', '')
     if context_summary:
         mytrace = (mytrace + "\n" if mytrace else "") + context_summary
-    elt = '''<ZSI:ParseFaultDetail>
-<ZSI:string>%s</ZSI:string>
-<ZSI:trace>%s</ZSI:trace>
-</ZSI:ParseFaultDetail>
-''' % (mystr, mytrace)
+    elt = ZSIParseFaultDetail(string=mystr, trace=mytrace or None)
     if getattr(ex, 'inheader', 0):
         detail, headerdetail = None, elt
     else:
@@ -283,6 +421,8 @@ def FaultFromException(ex, inheader, tb=None, actor=None, request_id=None, conte
     '''
     request_id = request_id or make_request_id()
     tracetext = None
+    if tb and not _traceback_limiter.allow():
+        tb = None
     if tb:
         try:
             lines = '\n'.join(['%s:%d:%s' % (name, line, func)
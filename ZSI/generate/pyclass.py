@@ -151,6 +151,10 @@ class pyclass_type(type):
 
             # classdict['new_Nill'] = staticmethod(GetNil)
 
+            if '_from_parsed' not in classdict:
+                classdict['_from_parsed'] = \
+                    classmethod(cls.__create_from_parsed(typecode))
+
             if typecode.mixed:
                 (get, set) = \
                     cls.__create_text_functions_from_what(typecode)
@@ -394,3 +398,19 @@ class pyclass_type(type):
 
     __create_text_functions_from_what = \
         staticmethod(__create_text_functions_from_what)
+
+    def __create_from_parsed(typecode):
+
+        def _from_parsed(cls, values, pyobj=None):
+            '''returns pyobj, or a new instance, holding the element values
+            typecode.parse collected, indexed like the resolved ofwhat.
+            '''
+
+            if pyobj is None:
+                pyobj = cls()
+            typecode._update_parsed(pyobj, values)
+            return pyobj
+
+        return _from_parsed
+
+    __create_from_parsed = staticmethod(__create_from_parsed)
@@ -12,6 +12,7 @@ from ZSI import _copyright, _children, _attrs, _child_elements, \
     _valid_encoding, _Node, _find_attr
 from ZSI.TC import AnyElement
 import types
+from types import MappingProxyType
 
 from ZSI.diagnostics import element_context
 from ZSI.telemetry import span
@@ -25,6 +26,25 @@ _find_root = lambda E: E.getAttributeNS(SOAP.ENC, 'root') or E.getAttributeNS(SO
 _find_id = lambda E: _find_attr(E, 'id')
 
 
+def _declare_namespaces(elt, scope):
+    '''Return the scope for elt: the parent scope itself unless elt
+    declares namespaces, otherwise a new read-only scope.
+    '''
+
+    decls = None
+    for a in _attrs(elt):
+        if a.namespaceURI == XMLNS.BASE:
+            if decls is None:
+                decls = dict(scope)
+            if a.localName == 'xmlns':
+                decls[''] = a.nodeValue
+            else:
+                decls[a.localName] = a.nodeValue
+    if decls is None:
+        return scope
+    return MappingProxyType(decls)
+
+
 def _format_with_element_context(message, elt):
     return '%s [element=%r]' % (message, element_context(elt))
 
@@ -36,6 +56,64 @@ class DefaultReader:
     fromString = staticmethod(expatbuilder.parseString)
     fromStream = staticmethod(expatbuilder.parse)
 
+    @staticmethod
+    def releaseNode(node):
+        node.unlink()
+
+
+class IncrementalReader:
+
+    '''Build the DOM of a message fed in pieces, as it arrives, instead
+    of joining the pieces into one string first.
+        feed(data) -- parse the next chunk (bytes, or str)
+        close() -- finish parsing and return the Document, which can be
+            given to ParsedSoap in place of the message text
+    '''
+
+    def __init__(self):
+        self._builder = expatbuilder.ExpatBuilderNS()
+        self._parser = self._builder.getParser()
+
+    def feed(self, data):
+        if data:
+            self._parser.Parse(data, False)
+
+    def close(self):
+        try:
+            self._parser.Parse(b'', True)
+        except expatbuilder.ParseEscape:
+            pass
+        dom = self._builder.document
+        self._builder.reset()
+        self._parser = None
+        return dom
+
+
+class _HeaderIndex:
+
+    '''Header blocks indexed in a single pass.
+        Instance data:
+            entries -- list of (element, actor, mustUnderstand) in document order
+            by_qname -- dictionary (by (namespace, localname)) of elements
+            must_understand -- list of (uri, localname) with mustUnderstand set
+            actors -- list of actor URI's, excluding "next"
+    '''
+
+    __slots__ = ('entries', 'by_qname', 'must_understand', 'actors')
+
+    def __init__(self, elements):
+        (self.entries, self.by_qname) = ([], {})
+        (self.must_understand, self.actors) = ([], [])
+        for E in elements:
+            actor, mu = _find_actor(E), _find_mu(E)
+            self.entries.append((E, actor, mu))
+            key = (E.namespaceURI, E.localName or SplitQName(E.tagName)[1])
+            self.by_qname.setdefault(key, []).append(E)
+            if mu == '1':
+                self.must_understand.append((E.namespaceURI, E.localName))
+            if actor not in (None, SOAP.ACTOR_NEXT):
+                self.actors.append(actor)
+
 
 class ParsedSoap:
 
@@ -44,14 +122,24 @@ class ParsedSoap:
         Instance data:
             reader -- the DOM reader
             dom -- the DOM object
-            ns_cache -- dictionary (by id(node)) of namespace dictionaries
-            id_cache -- dictionary (by XML ID attr) of elements
+            ns_scopes -- dictionary (by element) of read-only namespace
+                scopes, built in one pass over the document on first use
+            id_cache -- dictionary (by XML ID attr) of elements, filled in
+                one pass over the Body the first time an HREF is resolved
+            href_objects -- dictionary (by (href, typecode)) of the python
+                objects parsed for multi-ref elements
             envelope -- the node holding the SOAP Envelope
             header -- the node holding the SOAP Header (or None)
             body -- the node holding the SOAP Body
             body_root -- the serialization root in the SOAP Body
             data_elements -- list of non-root elements in the SOAP Body
             trailer_elements -- list of elements following the SOAP body
+            trusted -- validation of Header and Body subtrees is deferred
+                until they are accessed
+
+        The DOM is released by close() (or on leaving a with block), not
+        when the instance is garbage collected; reset() releases it and
+        parses a new message into the same instance, keeping the reader.
     '''
 
     defaultReaderClass = DefaultReader
@@ -64,41 +152,98 @@ class ParsedSoap:
         trailers=False,
         resolver=None,
         envelope=True,
+        trusted=False,
+        prefetch=False,
         **kw
         ):
         '''Initialize.
+        input is the message as a string, bytes, a stream, or a DOM
+        Document already built by the reader (see IncrementalReader).
         Keyword arguments:
             trailers -- allow trailer elments (default is zero)
             resolver -- function (bound method) to resolve URI's
             readerclass -- factory class to create a reader
             keepdom -- do not release the DOM
             envelope -- look for a SOAP envelope.
+            trusted -- input comes from a trusted peer; only check the
+                Header and Body subtrees for illegal children and
+                processing instructions when they are first accessed.
+            prefetch -- before parsing, have the resolver fetch all
+                external HREFs concurrently (resolvers with a Prefetch
+                method, e.g. NetworkResolver.Resolve); a number sets the
+                worker threads.
         '''
 
         self.readerclass = readerclass
+        self.prefetch = prefetch
         self.keepdom = keepdom
+        self.trusted = trusted
+        (self._header_index, self._unchecked) = (None, {})
         if not self.readerclass:
             self.readerclass = self.defaultReaderClass
+        self.reader = self.readerclass()
+        (self.dom, self.id_cache, self.href_objects) = (None, {}, {})
+        self._load(input, trailers, resolver, envelope)
+        self._prefetch()
 
-        try:
-            self.reader = self.readerclass()
-            if type(input) in _stringtypes:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        '''Release the DOM now, unless keepdom was given; elements taken
+        from this message (e.g. parsed with TC.XML) are no longer usable.
+        '''
+        dom = self.dom
+        if dom is None:
+            return
+        self.dom = None
+        self.ns_scopes = self._header_index = None
+        self.id_cache.clear()
+        self.href_objects.clear()
+        self._unchecked.clear()
+        release = getattr(self.reader, 'releaseNode', None)
+        if release is not None and not self.keepdom:
+            release(dom)
+
+    def reset(self, input, trailers=False, resolver=None, envelope=True):
+        '''Release the current message and parse input in its place,
+        reusing this instance, its reader and its caches.
+        '''
+        self.close()
+        self._header_index = None
+        self.__dict__.pop('trailer_elements', None)
+        self._load(input, trailers, resolver, envelope)
+        self._prefetch()
+        return self
+
+    def _prefetch(self):
+        if not self.prefetch or self.resolver is None:
+            return
+        owner = getattr(self.resolver, '__self__', self.resolver)
+        prefetch = getattr(owner, 'Prefetch', None)
+        if prefetch is None:
+            return
+        if self.prefetch is True:
+            prefetch(self)
+        else:
+            prefetch(self, max_workers=self.prefetch)
+
+    def _load(self, input, trailers, resolver, envelope):
+        with span("zsi.parse.document", phase="parse"):
+            if type(input) in _stringtypes or isinstance(input, bytes):
                 self.dom = self.reader.fromString(input)
+            elif getattr(input, 'nodeType', None) == _Node.DOCUMENT_NODE:
+                self.dom = input
             else:
                 self.dom = self.reader.fromStream(input)
-        except Exception:
 
-            # Is this in the header?  Your guess is as good as mine.
-            # raise ParseException("Can't parse document (" + \
-            #    str(e.__class__) + "): " + str(e), 0)
+        self.ns_scopes = None
 
-            raise
-
-        self.ns_cache = {id(self.dom): {'xml': XMLNS.XML,
-                         'xmlns': XMLNS.BASE, '': ''}}
-
-        (self.trailers, self.resolver, self.id_cache) = (trailers,
-                resolver, {})
+        (self.trailers, self.resolver) = (trailers, resolver)
+        (self._ids_indexed, self._header_ids) = (False, None)
 
         # Exactly one child element
 
@@ -140,8 +285,10 @@ class ParsedSoap:
 
         elt = c[0]
         if elt.localName == 'Header' and elt.namespaceURI in (SOAP.ENV, SOAP.ENV12):
-            self._check_for_legal_children('Header', elt)
-            self._check_for_pi_nodes(_children(elt), 1)
+            if self.trusted:
+                self._unchecked['Header'] = elt
+            else:
+                self._check_header(elt)
             self.header = c.pop(0)
             self.header_elements = _child_elements(self.header)
         else:
@@ -159,7 +306,10 @@ class ParsedSoap:
             else:
                 raise ParseException('Document has "%r element, not Body' % ((elt.namespaceURI, elt.localName),), 0, elt, self.dom)
         self._check_for_legal_children('Body', elt, 0)
-        self._check_for_pi_nodes(_children(elt), 0)
+        if self.trusted:
+            self._unchecked['Body'] = elt
+        else:
+            self._check_for_pi_nodes(_children(elt), 0)
         self.body = elt
         if not _valid_encoding(self.body):
             raise ParseException('Body has invalid encoding', 0)
@@ -218,14 +368,6 @@ class ParsedSoap:
         rootid = id(self.body_root)
         self.data_elements = [E for E in _child_elements(self.body)
                               if id(E) != rootid]
-        self._check_for_pi_nodes(self.data_elements, 0)
-
-    def __del__(self):
-        try:
-            if not self.keepdom:
-                self.reader.releaseNode(self.dom)
-        except:
-            pass
 
     def _check_for_legal_children(
         self,
@@ -252,6 +394,32 @@ class ParsedSoap:
                         + n.nodeName + '" in ' + name, inheader, elt,
                         self.dom)
 
+    def _check_header(self, elt):
+        self._check_for_legal_children('Header', elt)
+        self._check_for_pi_nodes(_children(elt), 1)
+
+    def _check_deferred(self, name):
+        '''Run the validation skipped for a trusted peer on the named
+        subtree ("Header" or "Body"), once.
+        '''
+
+        elt = self._unchecked.pop(name, None)
+        if elt is None:
+            return
+        if name == 'Header':
+            self._check_header(elt)
+        else:
+            self._check_for_pi_nodes(_children(elt), 0)
+
+    def _get_header_index(self):
+        '''Return the header index, building it on first use.
+        '''
+
+        if self._header_index is None:
+            self._check_deferred('Header')
+            self._header_index = _HeaderIndex(self.header_elements)
+        return self._header_index
+
     def _check_for_pi_nodes(self, list, inheader):
         '''Raise an exception if any of the list descendants are PI nodes.
         '''
@@ -289,31 +457,58 @@ class ParsedSoap:
             raise EvaluateException('Absolute HREF ("%s") not implemented'
                                      % href, self.Backtrace(elt))
         frag = href[1:]
+        self._check_deferred('Body')
+        if headers:
+            self._check_deferred('Header')
 
-        # Already found?
-
+        if not self._ids_indexed:
+            self.id_cache = self._index_ids(self.data_elements
+                                            + [self.body_root])
+            self._ids_indexed = True
         e = self.id_cache.get(frag)
-        if e:
+        if e is not None:
             return e
+        if headers:
+            if self._header_ids is None:
+                self._header_ids = self._index_ids(self.header_elements)
+            e = self._header_ids.get(frag)
+            if e is not None:
+                return e
+        raise EvaluateException(_format_with_element_context(
+                                '''Can't find node for HREF "%s"''' % href, elt),
+                                self.Backtrace(elt))
 
-        # Do a breadth-first search, in the data first.  Most likely
-        # to find multi-ref targets shallow in the data area.
+    def ExternalHREFs(self):
+        '''Return the distinct non-local HREFs in the message, in
+        document order.
+        '''
 
-        nodes = self.data_elements[:] + [self.body_root]
-        if headers:
-            nodes.extend(self.header_elements)
+        (hrefs, seen) = ([], set())
+        nodes = _child_elements(self.dom) if self.dom is not None else []
+        while nodes:
+            e = nodes.pop()
+            href = _find_attr(e, 'href')
+            if href and href[0] != '#' and href not in seen:
+                seen.add(href)
+                hrefs.append(href)
+            nodes.extend(reversed(_child_elements(e)))
+        return hrefs
+
+    def _index_ids(self, nodes):
+        '''Return a dictionary (by XML ID attr) of all elements under nodes.
+        When an id is repeated the first element found wins.
+        '''
+
+        ids = {}
+        nodes = [n for n in nodes if n is not None]
         while nodes:
             e = nodes.pop()
             if e.nodeType == _Node.ELEMENT_NODE:
                 nodeid = _find_id(e)
-                if nodeid:
-                    self.id_cache[nodeid] = e
-                    if nodeid == frag:
-                        return e
+                if nodeid and nodeid not in ids:
+                    ids[nodeid] = e
             nodes.extend(_children(e))
-        raise EvaluateException(_format_with_element_context(
-                                '''Can't find node for HREF "%s"''' % href, elt),
-                                self.Backtrace(elt))
+        return ids
 
     def ResolveHREF(
         self,
@@ -348,27 +543,78 @@ class ParsedSoap:
             actorlist = [None, SOAP.ACTOR_NEXT]
         else:
             actorlist = list(actorlist) + [None, SOAP.ACTOR_NEXT]
-        return [E for E in self.header_elements if _find_actor(E)
-                in actorlist]
+        return [E for (E, actor, mu) in self._get_header_index().entries
+                if actor in actorlist]
+
+    def _build_ns_scopes(self):
+        '''Walk the document once, giving every element the namespace
+        scope in effect for it.  Elements that declare no namespaces
+        share their parent's scope object.
+        '''
+
+        root = MappingProxyType({'xml': XMLNS.XML, 'xmlns': XMLNS.BASE,
+                                 '': ''})
+        scopes = {self.dom: root}
+        stack = [(self.dom, root)]
+        while stack:
+            node, scope = stack.pop()
+            for E in node.childNodes:
+                if E.nodeType != _Node.ELEMENT_NODE:
+                    continue
+                s = _declare_namespaces(E, scope)
+                scopes[E] = s
+                if E.firstChild is not None:
+                    stack.append((E, s))
+        self.ns_scopes = scopes
+        return scopes
+
+    def GetElementNSScope(self, elt):
+        '''Get the read-only mapping of prefix to namespace URI in scope
+        for the indicated element; the default namespace is keyed by ''.
+        '''
+
+        scopes = self.ns_scopes
+        if scopes is None:
+            if self.dom is None:
+                raise EvaluateException('ParsedSoap is closed; cannot resolve '
+                                        'namespaces of its elements')
+            scopes = self._build_ns_scopes()
+        scope = scopes.get(elt)
+        if scope is not None:
+            return scope
+
+        # Not part of this document (e.g. created or imported later);
+        # resolve from the nearest indexed ancestor without caching.
+        chain = []
+        while elt is not None and scopes.get(elt) is None:
+            chain.append(elt)
+            elt = elt.parentNode
+        scope = scopes[elt] if elt is not None else scopes[self.dom]
+        for E in reversed(chain):
+            if E.nodeType == _Node.ELEMENT_NODE:
+                scope = _declare_namespaces(E, scope)
+        return scope
 
     def GetElementNSdict(self, elt):
         '''Get a dictionary of all the namespace attributes for the indicated
-        element.  The dictionaries are cached, and we recurse up the tree
-        as necessary.
+        element.  The caller owns the returned copy.
         '''
 
-        d = self.ns_cache.get(id(elt))
-        if not d:
-            if elt != self.dom:
-                d = self.GetElementNSdict(elt.parentNode)
-            for a in _attrs(elt):
-                if a.namespaceURI == XMLNS.BASE:
-                    if a.localName == 'xmlns':
-                        d[''] = a.nodeValue
-                    else:
-                        d[a.localName] = a.nodeValue
-            self.ns_cache[id(elt)] = d
-        return d.copy()
+        return dict(self.GetElementNSScope(elt))
+
+    def ResolvePrefix(self, elt, prefix):
+        '''Resolve prefix to a namespaceURI in the scope of elt.  If None or
+        empty str, resolve the default namespace.
+        '''
+
+        namespaceURI = self.GetElementNSScope(elt).get(prefix or '')
+        if not namespaceURI:
+            if prefix:
+                raise EvaluateException('cant resolve xmlns:%s' % prefix,
+                                        self.Backtrace(elt))
+            raise EvaluateException('cant resolve default namespace',
+                                    self.Backtrace(elt))
+        return namespaceURI
 
     def GetDomAndReader(self):
         '''Returns a tuple containing the dom and reader objects. (dom, reader)
@@ -395,12 +641,14 @@ class ParsedSoap:
 
         if how is None or self.body_root is None:
             return None
+        self._check_deferred('Body')
         if type(how) == type:
             how = how.typecode
         tc_name = getattr(how, "pname", how.__class__.__name__)
         tc_ns = getattr(how, "nspname", None)
         with span(
             "zsi.parse.body",
+            phase="typecode_parse",
             typecode_name=str(tc_name),
             typecode_namespace=str(tc_ns) if tc_ns else None,
         ):
@@ -411,20 +659,14 @@ class ParsedSoap:
         header that have mustUnderstand set.
         '''
 
-        return [(E.namespaceURI, E.localName) for E in
-                self.header_elements if _find_mu(E) == '1']
+        return list(self._get_header_index().must_understand)
 
     def WhatActorsArePresent(self):
         '''Return a list of URI's of all the actor attributes found in
         the header.  The special actor "next" is ignored.
         '''
 
-        results = []
-        for E in self.header_elements:
-            a = _find_actor(E)
-            if a not in [None, SOAP.ACTOR_NEXT]:
-                results.append(a)
-        return results
+        return list(self._get_header_index().actors)
 
     def ParseHeaderElements(self, ofwhat):
         '''Returns a dictionary of pyobjs.
@@ -433,10 +675,7 @@ class ParsedSoap:
 
         with span("zsi.parse.headers", header_count=len(self.header_elements)):
             d = {}
-            grouped = {}
-            for c_elt in self.header_elements:
-                key = (c_elt.namespaceURI, c_elt.localName or SplitQName(c_elt.tagName)[1])
-                grouped.setdefault(key, []).append(c_elt)
+            grouped = self._get_header_index().by_qname
             for what in ofwhat:
                 if isinstance(what, AnyElement):
                     raise EvaluateException('not supporting <any> as child of SOAP-ENC:Header'
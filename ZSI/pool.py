@@ -0,0 +1,134 @@
+"""Per-thread pools of reusable SoapWriter and ParsedSoap objects.
+
+A server handling thousands of requests a second allocates a SoapWriter
+(ElementProxy, memo and callback lists) and a ParsedSoap (reader and
+cache dicts) for every request.  The pools keep a few of each per worker
+thread.  ``acquire()`` hands out a ``reset()`` instance when one is free,
+and ``release()`` frees its DOM right away and keeps it for the next
+request::
+
+    with parsers.lease(xml) as ps, writers.lease() as sw:
+        sw.serialize(handler(ps.Parse(tc)), tc)
+        reply = str(sw)
+
+Objects are never shared between threads, so they need no locking.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+import threading
+from typing import Any, Iterator
+
+from ZSI.parse import ParsedSoap
+from ZSI.writer import SoapWriter
+
+# SoapWriter state that reset() may change, with the constructor defaults.
+_WRITER_DEFAULTS = {"envelope": True, "encodingStyle": None, "header": True,
+                    "nsdict": {}}
+
+
+class _ThreadLocalPool:
+    def __init__(self, maxsize: int) -> None:
+        if maxsize < 0:
+            raise ValueError("maxsize must not be negative")
+        self.maxsize = maxsize
+        self._local = threading.local()
+
+    def _free(self) -> list:
+        free = getattr(self._local, "free", None)
+        if free is None:
+            free = self._local.free = []
+        return free
+
+    def _keep(self, obj: Any) -> None:
+        free = self._free()
+        if len(free) < self.maxsize and obj not in free:
+            free.append(obj)
+
+    def __len__(self) -> int:
+        """Number of idle objects pooled for the calling thread."""
+        return len(self._free())
+
+
+class WriterPool(_ThreadLocalPool):
+    """Pool of SoapWriter instances built with the given keyword arguments.
+
+    maxsize -- idle writers kept per thread
+    kw -- SoapWriter arguments (nsdict, envelope, header, outputclass, ...)
+    """
+
+    def __init__(self, maxsize: int = 4, **kw: Any) -> None:
+        super().__init__(maxsize)
+        self.kw = kw
+
+    def acquire(self, **kw: Any) -> SoapWriter:
+        """Return a writer; kw overrides envelope, encodingStyle, header
+        and nsdict for this message only.
+        """
+        free = self._free()
+        if not free:
+            return SoapWriter(**dict(self.kw, **kw))
+        state = {name: kw.get(name, self.kw.get(name, _WRITER_DEFAULTS[name]))
+                 for name in _WRITER_DEFAULTS}
+        return free.pop().reset(**state)
+
+    def release(self, sw: SoapWriter) -> None:
+        """Free the writer's DOM and keep it for reuse by this thread."""
+        sw.release()
+        self._keep(sw)
+
+    @contextmanager
+    def lease(self, **kw: Any) -> Iterator[SoapWriter]:
+        sw = self.acquire(**kw)
+        try:
+            yield sw
+        finally:
+            self.release(sw)
+
+
+class ParserPool(_ThreadLocalPool):
+    """Pool of ParsedSoap instances built with the given keyword arguments.
+
+    maxsize -- idle parsers kept per thread
+    kw -- ParsedSoap arguments fixed for the pool (readerclass, trusted,
+        keepdom)
+    """
+
+    def __init__(self, maxsize: int = 4, **kw: Any) -> None:
+        super().__init__(maxsize)
+        self.kw = kw
+
+    def acquire(
+        self,
+        input: Any,
+        trailers: bool = False,
+        resolver: Any = None,
+        envelope: bool = True,
+    ) -> ParsedSoap:
+        """Parse input into a pooled ParsedSoap (or a new one)."""
+        free = self._free()
+        if not free:
+            return ParsedSoap(input, trailers=trailers, resolver=resolver,
+                              envelope=envelope, **self.kw)
+        ps = free.pop()
+        try:
+            return ps.reset(input, trailers, resolver, envelope)
+        except Exception:
+            # Keep the instance; reset() left it holding a partial parse.
+            ps.close()
+            self._keep(ps)
+            raise
+
+    def release(self, ps: ParsedSoap) -> None:
+        """Release the parser's DOM and keep it for reuse by this thread."""
+        ps.close()
+        self._keep(ps)
+
+    @contextmanager
+    def lease(self, input: Any, **kw: Any) -> Iterator[ParsedSoap]:
+        ps = self.acquire(input, **kw)
+        try:
+            yield ps
+        finally:
+            self.release(ps)
@@ -0,0 +1,295 @@
+"""Opt-in profiler that charges parse/serialize time to typecodes.
+
+cProfile attributes a slow message to the generic ``parse``/``serialize``
+frames.  ``TypecodeProfiler`` instead wraps ``parse`` and ``serialize`` of
+every TypeCode class, keyed by ``(class name, nspname, pname)``, and
+records per key:
+
+- calls
+- inclusive and exclusive (minus nested typecodes) time
+- net allocated memory blocks (``sys.getallocatedblocks`` deltas),
+  inclusive and exclusive
+
+Use it as a context manager (or ``enable()``/``disable()``).  The results
+come out as a sorted text report (``report()``) or as collapsed stacks
+(``write_collapsed()``).  Collapsed stacks use exclusive microseconds per
+typecode path and work with flamegraph.pl, speedscope, etc.  A
+``sample_rate`` below 1.0 profiles only that fraction of outermost
+parse/serialize calls, together with everything nested in them.
+
+Classes that override ``parse``/``serialize`` and are defined after
+``enable()`` are not wrapped; classes inheriting the methods are.
+
+Command line, in the manner of ``python -m cProfile``::
+
+    python -m ZSI.profiling [-o out.collapsed] [-s exclusive] script.py [args]
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import sys
+import threading
+from functools import wraps
+from time import perf_counter
+from typing import Any, Iterator, NamedTuple
+
+from ZSI.TC import TypeCode
+from ZSI.wstools.logging import getLogger as _GetLogger
+
+_log = _GetLogger("ZSI.profiling")
+
+METHODS = ("parse", "serialize")
+SORT_KEYS = ("exclusive", "inclusive", "calls", "allocs", "allocs_exclusive")
+
+
+class TypecodeStats(NamedTuple):
+    """Aggregated cost of one typecode key."""
+
+    key: tuple
+    calls: int
+    inclusive: float
+    exclusive: float
+    allocs: int
+    allocs_exclusive: int
+
+    @property
+    def label(self) -> str:
+        return _label(self.key)
+
+
+def _label(key: tuple) -> str:
+    cls, nspname, pname = key
+    if pname is None:
+        return cls
+    if nspname:
+        return "%s(%s:%s)" % (cls, nspname, pname)
+    return "%s(%s)" % (cls, pname)
+
+
+def _subclasses(cls: type) -> Iterator[type]:
+    seen, todo = set(), [cls]
+    while todo:
+        klass = todo.pop()
+        if klass in seen:
+            continue
+        seen.add(klass)
+        yield klass
+        todo.extend(klass.__subclasses__())
+
+
+class _Frame:
+    __slots__ = ("tc", "key", "path", "start", "blocks", "child_time", "child_blocks")
+
+
+class TypecodeProfiler:
+    """Aggregate parse/serialize cost per typecode.
+
+    sample_rate -- fraction (0.0-1.0) of outermost calls to profile
+    methods -- typecode methods to wrap
+    """
+
+    _active: "TypecodeProfiler | None" = None
+    _lock = threading.Lock()
+
+    def __init__(self, sample_rate: float = 1.0, methods: tuple = METHODS) -> None:
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0.0 and 1.0")
+        self.sample_rate = sample_rate
+        self.methods = tuple(methods)
+        self._originals: dict = {}
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        """Drop the collected statistics."""
+        with self._stats_lock:
+            # key -> [calls, inclusive, exclusive, allocs, allocs_exclusive]
+            self._stats: dict = {}
+            # path of keys -> [exclusive seconds, calls]
+            self._stacks: dict = {}
+
+    # Instrumentation.
+
+    def enable(self) -> None:
+        """Wrap the typecode methods; only one profiler can be enabled."""
+        with TypecodeProfiler._lock:
+            if TypecodeProfiler._active is not None:
+                raise RuntimeError("a TypecodeProfiler is already enabled")
+            TypecodeProfiler._active = self
+            for klass in _subclasses(TypeCode):
+                for name in self.methods:
+                    func = klass.__dict__.get(name)
+                    if func is None or not callable(func):
+                        continue
+                    self._originals[(klass, name)] = func
+                    setattr(klass, name, self._wrap(func))
+        _log.debug("enabled", event="profiling.enable", wrapped=len(self._originals))
+
+    def disable(self) -> None:
+        """Restore the original typecode methods."""
+        with TypecodeProfiler._lock:
+            for (klass, name), func in self._originals.items():
+                setattr(klass, name, func)
+            self._originals.clear()
+            if TypecodeProfiler._active is self:
+                TypecodeProfiler._active = None
+
+    def __enter__(self) -> "TypecodeProfiler":
+        self.enable()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.disable()
+
+    def _wrap(self, func: Any) -> Any:
+        profiler = self
+
+        @wraps(func)
+        def wrapper(tc: Any, *args: Any, **kw: Any) -> Any:
+            local = profiler._local
+            stack = getattr(local, "stack", None)
+            if stack is None:
+                stack = local.stack = []
+                local.skipping = 0
+            if local.skipping:
+                return func(tc, *args, **kw)
+            if stack:
+                parent = stack[-1]
+                # A subclass calling up to its base class: same invocation.
+                if parent.tc is tc:
+                    return func(tc, *args, **kw)
+                path = parent.path
+            else:
+                if profiler.sample_rate < 1.0 and random.random() >= profiler.sample_rate:
+                    local.skipping += 1
+                    try:
+                        return func(tc, *args, **kw)
+                    finally:
+                        local.skipping -= 1
+                path = ()
+
+            frame = _Frame()
+            frame.tc = tc
+            frame.key = key = (tc.__class__.__name__, getattr(tc, "nspname", None),
+                               getattr(tc, "pname", None))
+            frame.path = path + (key,)
+            frame.child_time = 0.0
+            frame.child_blocks = 0
+            stack.append(frame)
+            frame.blocks = sys.getallocatedblocks()
+            frame.start = perf_counter()
+            try:
+                return func(tc, *args, **kw)
+            finally:
+                elapsed = perf_counter() - frame.start
+                blocks = sys.getallocatedblocks() - frame.blocks
+                stack.pop()
+                if stack:
+                    stack[-1].child_time += elapsed
+                    stack[-1].child_blocks += blocks
+                profiler._record(frame, elapsed, blocks)
+
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def _record(self, frame: _Frame, elapsed: float, blocks: int) -> None:
+        exclusive = elapsed - frame.child_time
+        # Recursive types: only the outermost frame adds inclusive cost.
+        recursive = frame.key in frame.path[:-1]
+        with self._stats_lock:
+            stats = self._stats.get(frame.key)
+            if stats is None:
+                stats = self._stats[frame.key] = [0, 0.0, 0.0, 0, 0]
+            stats[0] += 1
+            if not recursive:
+                stats[1] += elapsed
+                stats[3] += blocks
+            stats[2] += exclusive
+            stats[4] += blocks - frame.child_blocks
+            stack = self._stacks.get(frame.path)
+            if stack is None:
+                stack = self._stacks[frame.path] = [0.0, 0]
+            stack[0] += exclusive
+            stack[1] += 1
+
+    # Results.
+
+    def stats(self, sort: str = "exclusive") -> list:
+        """Return a TypecodeStats per key, most expensive first."""
+        if sort not in SORT_KEYS:
+            raise ValueError("sort must be one of %s" % ", ".join(SORT_KEYS))
+        with self._stats_lock:
+            items = [TypecodeStats(key, *values) for key, values in self._stats.items()]
+        items.sort(key=lambda s: getattr(s, sort), reverse=True)
+        return items
+
+    def report(self, sort: str = "exclusive", limit: int | None = None) -> str:
+        """Return a text table of stats(sort), limited to limit rows."""
+        rows = self.stats(sort)
+        if limit is not None:
+            rows = rows[:limit]
+        lines = ["%8s %12s %12s %10s %10s  %s" % (
+            "calls", "incl ms", "excl ms", "blocks", "excl blk", "typecode")]
+        for s in rows:
+            lines.append("%8d %12.3f %12.3f %10d %10d  %s" % (
+                s.calls, s.inclusive * 1000.0, s.exclusive * 1000.0,
+                s.allocs, s.allocs_exclusive, s.label))
+        return "\n".join(lines) + "\n"
+
+    def collapsed(self) -> Iterator[str]:
+        """Yield collapsed-stack lines: ``a;b;c <exclusive microseconds>``."""
+        with self._stats_lock:
+            stacks = [(";".join(_label(key).replace(";", ",") for key in path),
+                       exclusive)
+                      for path, (exclusive, _calls) in self._stacks.items()]
+        stacks.sort()
+        for frames, exclusive in stacks:
+            yield "%s %d" % (frames, round(exclusive * 1e6))
+
+    def write_collapsed(self, file: Any) -> None:
+        """Write collapsed() lines to a path or a text file object."""
+        if hasattr(file, "write"):
+            for line in self.collapsed():
+                file.write(line + "\n")
+            return
+        with open(file, "w", encoding="utf-8") as f:
+            self.write_collapsed(f)
+
+
+def main(argv: list | None = None) -> int:
+    import argparse
+    import runpy
+
+    parser = argparse.ArgumentParser(
+        prog="python -m ZSI.profiling",
+        description="Run a script with the typecode profiler enabled.",
+    )
+    parser.add_argument("-o", "--outfile", help="write collapsed stacks here")
+    parser.add_argument("-s", "--sort", default="exclusive", choices=SORT_KEYS)
+    parser.add_argument("-n", "--top", type=int, default=30, help="report rows")
+    parser.add_argument("--sample-rate", type=float, default=1.0)
+    parser.add_argument("script")
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    options = parser.parse_args(argv)
+
+    sys.argv = [options.script] + options.args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(options.script)))
+    profiler = TypecodeProfiler(sample_rate=options.sample_rate)
+    try:
+        with profiler:
+            runpy.run_path(options.script, run_name="__main__")
+    except SystemExit as ex:
+        if ex.code not in (None, 0):
+            raise
+    finally:
+        sys.stdout.write(profiler.report(options.sort, options.top))
+        if options.outfile:
+            profiler.write_collapsed(options.outfile)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,10 +2,15 @@
 # $Header$
 """SOAP messaging parsing helpers."""
 
-import io
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from email import policy
 from email.parser import Parser
-import hashlib
+from email.utils import parsedate_to_datetime
+import io
+import re
+import threading
+import time
 import urllib.request
 
 from ZSI import _copyright, _child_elements, EvaluateException, TC
@@ -14,8 +19,189 @@ from ZSI.wstools.logging import getLogger as _GetLogger
 
 
 _log = _GetLogger("ZSI.resolvers")
-_CACHE_URL_TO_KEY = {}
-_CACHE_CONTENT = {}
+_MAX_AGE = re.compile(r"(?:^|,)\s*max-age\s*=\s*\"?(\d+)", re.I)
+_NO_STORE = re.compile(r"(?:^|,)\s*(?:no-store|no-cache)", re.I)
+# Approximate memory of one minidom node (element, attribute or text),
+# besides its text; a parsed document is some 30x its source.
+_DOM_NODE_SIZE = 512
+
+
+def cache_ttl(headers, now=None):
+    """Return how long (seconds) a response may be cached according to its
+    Cache-Control/Expires headers: 0 for no-store/no-cache, None when the
+    headers say nothing.
+    """
+    control = headers.get("cache-control") or ""
+    if control:
+        if _NO_STORE.search(control):
+            return 0.0
+        match = _MAX_AGE.search(control)
+        if match:
+            return float(match.group(1))
+    expires = headers.get("expires")
+    if expires:
+        try:
+            when = parsedate_to_datetime(expires).timestamp()
+        except (TypeError, ValueError, IndexError, OverflowError):
+            # An invalid Expires means "already expired" (RFC 9111 5.3).
+            return 0.0
+        date = headers.get("date")
+        try:
+            base = parsedate_to_datetime(date).timestamp() if date else None
+        except (TypeError, ValueError, IndexError, OverflowError):
+            base = None
+        if base is None:
+            base = time.time() if now is None else now
+        return max(0.0, when - base)
+    return None
+
+
+class _Flight:
+    __slots__ = ("done", "value", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = self.error = None
+        self.waiters = 0
+
+
+class ResolverCache:
+    """Cache of resolved URIs: an LRU bounded by size in bytes, with
+    per-entry expiry and single-flight fetching (concurrent lookups of a
+    missing key wait for one fetch instead of each fetching).
+
+    max_bytes -- total size of cached values; least recently used entries
+        are evicted beyond it
+    default_ttl -- seconds to keep entries whose response had no caching
+        headers; None keeps them until evicted
+    max_ttl -- upper bound for any entry's lifetime, or None
+    """
+
+    def __init__(self, max_bytes=16 << 20, default_ttl=None, max_ttl=None,
+                 clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.max_ttl = max_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, size, expires)
+        self._flights = {}
+        self._bytes = 0
+        self._stats = dict.fromkeys(("hits", "misses", "coalesced", "stores",
+                                     "evictions", "expirations"), 0)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._lookup(key) is not None
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires = entry[2]
+        if expires is not None and expires <= self._clock():
+            self._drop(key)
+            self._stats["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _drop(self, key):
+        value, size, expires = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default."""
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return default
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def put(self, key, value, size, ttl=None):
+        """Cache value; ttl of 0 (or a size above max_bytes) skips it."""
+        if ttl is None:
+            ttl = self.default_ttl
+        if self.max_ttl is not None and (ttl is None or ttl > self.max_ttl):
+            ttl = self.max_ttl
+        if ttl is not None and ttl <= 0 or size > self.max_bytes:
+            return False
+        expires = None if ttl is None else self._clock() + ttl
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, expires)
+            self._bytes += size
+            self._stats["stores"] += 1
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._stats["evictions"] += 1
+        return True
+
+    def get_or_fetch(self, key, fetch):
+        """Return the cached value for key, or call fetch() once for all
+        concurrent callers; fetch returns (value, size, ttl).
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self._stats["hits"] += 1
+                return entry[0]
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                leader = True
+                self._stats["misses"] += 1
+            else:
+                flight.waiters += 1
+                leader = False
+                self._stats["coalesced"] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value, size, ttl = fetch()
+            self.put(key, value, size, ttl)
+            flight.value = value
+            return value
+        except BaseException as ex:
+            flight.error = ex
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def discard(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def clear(self):
+        """Drop all entries; statistics are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return hit/miss/eviction counters plus current entries and bytes."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        return stats
+
+
+default_cache = ResolverCache()
 
 
 def _transfer_encoding(headers):
@@ -33,74 +219,152 @@ def _to_text(data, charset=None):
     return data.decode("latin-1")
 
 
-def Opaque(uri, tc, ps, **keywords):
-    """Resolve a URI and return its content as a string or bytes."""
-    _log.debug("resolve opaque", event="resolver.fetch", uri=uri)
+def _fetch(uri, keywords):
+    """Fetch uri; return ((body, charset, transfer encoding), size, ttl)."""
+    _log.debug("fetch uri", event="resolver.fetch", uri=uri)
+    source = urllib.request.urlopen(uri, **keywords)
+    info = source.info()
+    body = source.read()
+    resource = (body, info.get_content_charset(), _transfer_encoding(info))
+    return resource, len(body), cache_ttl(info)
+
+
+def _resource(uri, cache, keywords):
+    if cache is False:
+        return _fetch(uri, keywords)[0]
+    return cache.get_or_fetch(("uri", uri), lambda: _fetch(uri, keywords))
+
+
+def Opaque(uri, tc, ps, cache=None, **keywords):
+    """Resolve a URI and return its content as a string or bytes.
+
+    cache -- ResolverCache to use (default_cache if None, False for none)
+    """
+    if cache is None:
+        cache = default_cache
     with span("zsi.resolve.opaque", uri=uri):
-        cache_key = _CACHE_URL_TO_KEY.get(uri)
-        if cache_key and cache_key in _CACHE_CONTENT:
-            _log.debug("cache hit", event="resolver.cache.hit", uri=uri, cache_key=cache_key)
-            return _CACHE_CONTENT[cache_key]
-
-        source = urllib.request.urlopen(uri, **keywords)
-        enc = _transfer_encoding(source.info())
-        body = source.read()
+        body, charset, enc = _resource(uri, cache, keywords)
         if enc in ("7bit", "8bit", "binary"):
-            value = body
-        else:
-            value = _to_text(body, source.info().get_content_charset())
-
-        digest_source = value if isinstance(value, bytes) else value.encode("utf-8", errors="replace")
-        digest = hashlib.sha256(digest_source).hexdigest()
-        cache_key = f"{uri}#{digest}"
-        _CACHE_URL_TO_KEY[uri] = cache_key
-        _CACHE_CONTENT[cache_key] = value
-        _log.debug("cache store", event="resolver.cache.store", uri=uri, cache_key=cache_key)
-        return value
-
-
-def XML(uri, tc, ps, **keywords):
-    """Resolve a URI and return its content as an XML DOM element."""
-    _log.debug("resolve xml", event="resolver.fetch", uri=uri)
+            return body
+        return _to_text(body, charset)
+
+
+def _dom_size(node):
+    """Estimate the bytes of memory held by the DOM tree under node."""
+    size = 0
+    nodes = [node]
+    while nodes:
+        node = nodes.pop()
+        size += _DOM_NODE_SIZE + len(node.nodeValue or "")
+        attributes = node.attributes
+        if attributes:
+            for i in range(attributes.length):
+                size += _DOM_NODE_SIZE + len(attributes.item(i).value)
+        nodes.extend(node.childNodes)
+    return size
+
+
+def _parse_xml(uri, readerclass, cache, keywords):
+    body, charset, enc = _resource(uri, cache, keywords)
+    dom = readerclass().fromStream(io.StringIO(_to_text(body, charset)))
+    root = _child_elements(dom)[0]
+    return root, max(len(body), _dom_size(root)), None
+
+
+def XML(uri, tc, ps, cache=None, **keywords):
+    """Resolve a URI and return its content as an XML DOM element.
+
+    The parsed document is cached; each call returns a deep copy of its
+    root element, which the caller may modify or import into its own
+    document.
+    cache -- ResolverCache to use (default_cache if None, False for none)
+    """
+    if cache is None:
+        cache = default_cache
+    readerclass = ps.readerclass
     with span("zsi.resolve.xml", uri=uri):
-        source = urllib.request.urlopen(uri, **keywords)
-        body = source.read()
-        stream = io.StringIO(_to_text(body, source.info().get_content_charset()))
-        dom = ps.readerclass().fromStream(stream)
-        return _child_elements(dom)[0]
+        if cache is False:
+            return _parse_xml(uri, readerclass, cache, keywords)[0]
+        key = ("xml", uri, readerclass)
+        if ("uri", uri) not in cache:
+            # The parsed document lives only as long as its source.
+            cache.discard(key)
+        root = cache.get_or_fetch(key, lambda: _parse_xml(uri, readerclass, cache, keywords))
+        return root.cloneNode(True)
 
 
 class NetworkResolver:
-    """A resolver that supports string and XML references."""
+    """A resolver that supports string and XML references.
 
-    def __init__(self, prefix=None):
+    prefix -- list of allowed URI prefixes
+    cache -- ResolverCache shared by this resolver (default_cache if None,
+        False to fetch every time)
+    """
+
+    def __init__(self, prefix=None, cache=None):
         self.allowed = prefix or []
+        self.cache = cache
 
-    def _check_allowed(self, uri):
+    def IsAllowed(self, uri):
         for a in self.allowed:
             if uri.startswith(a):
-                return
-        _log.warning("resolver rejected uri", event="resolver.reject", uri=uri)
-        raise EvaluateException("Disallowed URI prefix")
+                return True
+        return False
+
+    def _check_allowed(self, uri):
+        if not self.IsAllowed(uri):
+            _log.warning("resolver rejected uri", event="resolver.reject", uri=uri)
+            raise EvaluateException("Disallowed URI prefix")
 
     def Opaque(self, uri, tc, ps, **keywords):
         self._check_allowed(uri)
-        return Opaque(uri, tc, ps, **keywords)
+        return Opaque(uri, tc, ps, cache=self.cache, **keywords)
 
     def XML(self, uri, tc, ps, **keywords):
         self._check_allowed(uri)
-        return XML(uri, tc, ps, **keywords)
+        return XML(uri, tc, ps, cache=self.cache, **keywords)
 
     def Resolve(self, uri, tc, ps, **keywords):
         if isinstance(tc, TC.XML):
-            return XML(uri, tc, ps, **keywords)
-        return Opaque(uri, tc, ps, **keywords)
+            return self.XML(uri, tc, ps, **keywords)
+        return self.Opaque(uri, tc, ps, **keywords)
+
+    def Prefetch(self, ps, max_workers=8, **keywords):
+        """Fetch the allowed external HREFs of ps concurrently into the
+        cache, so that parsing ps finds them there instead of fetching
+        them one at a time.  Returns the URIs fetched; a failed fetch is
+        logged and left for Resolve to report when parsing reaches it.
+        """
+        cache = default_cache if self.cache is None else self.cache
+        if cache is False:
+            return []
+        uris = [uri for uri in ps.ExternalHREFs()
+                if self.IsAllowed(uri) and ("uri", uri) not in cache]
+        if not uris:
+            return uris
+
+        def fetch(uri):
+            try:
+                _resource(uri, cache, keywords)
+            except Exception as ex:
+                _log.warning("prefetch failed", event="resolver.prefetch.error",
+                             uri=uri, error=repr(ex))
+
+        with span("zsi.resolve.prefetch", count=len(uris)):
+            workers = min(max_workers, len(uris))
+            if workers <= 1:
+                for uri in uris:
+                    fetch(uri)
+            else:
+                with ThreadPoolExecutor(max_workers=workers,
+                                        thread_name_prefix="zsi-prefetch") as pool:
+                    list(pool.map(fetch, uris))
+        return uris
 
 
 def ClearNetworkResolverCache():
-    """Clear process-local resolver cache."""
-    _CACHE_URL_TO_KEY.clear()
-    _CACHE_CONTENT.clear()
+    """Clear the process-wide resolver cache (default_cache)."""
+    default_cache.clear()
 
 
 class MIMEResolver:
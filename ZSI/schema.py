@@ -282,7 +282,7 @@ class TypeDefinition(metaclass=SchemaInstanceType):
 
         typeName = _find_type(elt)
         prefix,typeName = SplitQName(typeName)
-        uri = ps.GetElementNSdict(elt).get(prefix)
+        uri = ps.GetElementNSScope(elt).get(prefix)
         subclass = SchemaInstanceType.getTypeDefinition(uri, typeName)
         if subclass is None:
             raise EvaluateException(
@@ -1,61 +1,285 @@
-"""Optional telemetry hooks for parse/serialize/resolve/generator paths.
+"""Optional telemetry for the parse/serialize/transport/dispatch paths.
 
-This module is intentionally dependency-optional:
-- If OpenTelemetry is installed, spans are emitted.
-- If not installed, all hooks are no-ops.
+Two outputs, neither of which needs a third-party package:
+
+- Phase histograms: the time spent in each processing phase (see PHASES)
+  is aggregated in-process and exported with ``render_prometheus()`` (or
+  the ``metrics_app`` WSGI endpoint) and ``snapshot()``.
+- Spans: when OpenTelemetry is installed, sampled spans are emitted
+  through its tracer; sampled spans are also logged at debug level.
+
+Sampling is head-based: the outermost span makes the decision
+(``sample_rate``) and every span nested inside it follows.  Histograms
+record every observation regardless of sampling.  ``configure()`` or the
+``ZSI_TELEMETRY`` (``off`` disables everything) and
+``ZSI_TELEMETRY_SAMPLE_RATE`` environment variables control the behavior.
 """
 
 from __future__ import annotations
 
-from contextlib import contextmanager
-import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar
+import functools
+import json
+import os
+import random
+import threading
+from time import perf_counter
 from typing import Any
 
 from ZSI.wstools.logging import getLogger as _GetLogger
 
 _log = _GetLogger("ZSI.telemetry")
 
+PHASES = (
+    "parse",
+    "typecode_parse",
+    "serialize",
+    "transport_write",
+    "transport_wait",
+    "dispatch",
+)
+
+# Upper bounds in seconds, as in the Prometheus client defaults.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_UNRESOLVED = object()
+
+_enabled = True
+_metrics = True
+_sample_rate = 1.0
+_tracer: Any = _UNRESOLVED
+_sampled: ContextVar = ContextVar("zsi_telemetry_sampled", default=None)
+_NOOP = nullcontext()
+
+
+class Histogram:
+    """Cumulative latency histogram with fixed bucket bounds."""
+
+    __slots__ = ("buckets", "counts", "count", "sum", "_lock")
+
+    def __init__(self, buckets: tuple = BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.count = 0
+            self.sum = 0.0
 
-def _otel_tracer():
+    def observe(self, seconds: float) -> None:
+        i = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def as_dict(self) -> dict:
+        """Return count, sum and cumulative bucket counts keyed by bound."""
+        with self._lock:
+            counts, count, total = list(self.counts), self.count, self.sum
+        cumulative, buckets = 0, {}
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            buckets[repr(bound)] = cumulative
+        buckets["+Inf"] = count
+        return {"count": count, "sum": total, "buckets": buckets}
+
+
+_histograms = {phase: Histogram() for phase in PHASES}
+_histograms_lock = threading.Lock()
+
+
+def _resolve_tracer() -> Any:
+    global _tracer
     try:
         from opentelemetry import trace  # type: ignore
     except Exception:
-        return None
-    return trace.get_tracer("ZSI")
+        _tracer = None
+    else:
+        _tracer = trace.get_tracer("ZSI")
+    return _tracer
+
 
+def configure(
+    enabled: bool | None = None,
+    metrics: bool | None = None,
+    sample_rate: float | None = None,
+    tracer: Any = _UNRESOLVED,
+) -> None:
+    """Change telemetry settings; arguments left out keep their value.
 
-@contextmanager
-def span(name: str, **attrs: Any):
-    """Create an optional telemetry span and log a debug event."""
-    tracer = _otel_tracer()
-    start = time.perf_counter()
-    if tracer is None:
-        _log.debug("span start", event="telemetry.span.start", span=name)
+    enabled -- False turns span() into a shared no-op context manager
+    metrics -- record phase histograms
+    sample_rate -- fraction (0.0-1.0) of outermost spans that are traced
+    tracer -- an OpenTelemetry tracer, or None to never emit spans;
+        by default it is looked up once, on first use
+    """
+    global _enabled, _metrics, _sample_rate, _tracer
+    if enabled is not None:
+        _enabled = bool(enabled)
+    if metrics is not None:
+        _metrics = bool(metrics)
+    if sample_rate is not None:
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0.0 and 1.0")
+        _sample_rate = float(sample_rate)
+    if tracer is not _UNRESOLVED:
+        _tracer = tracer
+
+
+def _configure_from_env() -> None:
+    if os.environ.get("ZSI_TELEMETRY", "").strip().lower() in ("0", "off", "false", "no"):
+        configure(enabled=False)
+    rate = os.environ.get("ZSI_TELEMETRY_SAMPLE_RATE", "").strip()
+    if rate:
         try:
-            yield None
-        finally:
-            duration_ms = (time.perf_counter() - start) * 1000.0
-            _log.debug(
-                "span end",
-                event="telemetry.span.end",
-                span=name,
-                duration_ms=round(duration_ms, 3),
-            )
+            configure(sample_rate=float(rate))
+        except ValueError:
+            _log.warning("ignoring ZSI_TELEMETRY_SAMPLE_RATE=%r", rate)
+
+
+def observe(phase: str, seconds: float) -> None:
+    """Record a duration for phase; unknown phases get a new histogram."""
+    if not _metrics:
         return
+    histogram = _histograms.get(phase)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault(phase, Histogram())
+    histogram.observe(seconds)
 
-    with tracer.start_as_current_span(name) as otel_span:
-        for key, value in attrs.items():
-            if value is None:
-                continue
-            try:
-                otel_span.set_attribute(key, value)
-            except Exception:
-                continue
-        try:
-            yield otel_span
-        except Exception as ex:
-            try:
-                otel_span.record_exception(ex)
-            except Exception:
-                pass
-            raise
+
+def reset() -> None:
+    """Zero all phase histograms."""
+    for histogram in list(_histograms.values()):
+        histogram.reset()
+
+
+def snapshot() -> dict:
+    """Return the phase histograms as a JSON-serializable dict."""
+    return {
+        "sample_rate": _sample_rate,
+        "phases": {phase: h.as_dict() for phase, h in list(_histograms.items())},
+    }
+
+
+def render_prometheus() -> str:
+    """Return the phase histograms in the Prometheus text format."""
+    name = "zsi_phase_duration_seconds"
+    lines = [
+        "# HELP %s Time spent in each ZSI processing phase." % name,
+        "# TYPE %s histogram" % name,
+    ]
+    for phase, h in list(_histograms.items()):
+        data = h.as_dict()
+        for bound, n in data["buckets"].items():
+            lines.append('%s_bucket{phase="%s",le="%s"} %d' % (name, phase, bound, n))
+        lines.append('%s_sum{phase="%s"} %r' % (name, phase, data["sum"]))
+        lines.append('%s_count{phase="%s"} %d' % (name, phase, data["count"]))
+    return "\n".join(lines) + "\n"
+
+
+def metrics_app(environ: dict, start_response: Any) -> list:
+    """WSGI endpoint: Prometheus text, or JSON for paths ending in .json."""
+    if environ.get("PATH_INFO", "").endswith(".json"):
+        body = json.dumps(snapshot()).encode("utf-8")
+        content_type = "application/json"
+    else:
+        body = render_prometheus().encode("utf-8")
+        content_type = PROMETHEUS_CONTENT_TYPE
+    start_response("200 OK", [("Content-Type", content_type),
+                              ("Content-Length", str(len(body)))])
+    return [body]
+
+
+class _Span:
+    __slots__ = ("name", "phase", "attrs", "token", "sampled", "otel",
+                 "manager", "start")
+
+    def __init__(self, name: str, phase: str | None, attrs: dict) -> None:
+        self.name, self.phase, self.attrs = name, phase, attrs
+
+    def __enter__(self) -> Any:
+        self.token = self.otel = None
+        sampled = _sampled.get()
+        if sampled is None:
+            rate = _sample_rate
+            # Only a fractional rate needs the decision passed down.
+            sampled = rate >= 1.0
+            if 0.0 < rate < 1.0:
+                sampled = random.random() < rate
+                self.token = _sampled.set(sampled)
+        self.sampled = sampled
+
+        if sampled:
+            tracer = _tracer if _tracer is not _UNRESOLVED else _resolve_tracer()
+            if tracer is not None:
+                self.manager = tracer.start_as_current_span(self.name)
+                self.otel = self.manager.__enter__()
+                for key, value in self.attrs.items():
+                    if value is None:
+                        continue
+                    try:
+                        self.otel.set_attribute(key, value)
+                    except Exception:
+                        continue
+            if _log.debugOn():
+                _log.debug("span start", event="telemetry.span.start", span=self.name)
+        self.start = perf_counter()
+        return self.otel
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> bool:
+        duration = perf_counter() - self.start
+        if self.phase is not None and _metrics:
+            histogram = _histograms.get(self.phase)
+            if histogram is not None:
+                histogram.observe(duration)
+            else:
+                observe(self.phase, duration)
+        if self.sampled:
+            if self.otel is not None:
+                self.manager.__exit__(exc_type, exc, tb)
+            if _log.debugOn():
+                _log.debug(
+                    "span end",
+                    event="telemetry.span.end",
+                    span=self.name,
+                    duration_ms=round(duration * 1000.0, 3),
+                )
+        if self.token is not None:
+            _sampled.reset(self.token)
+        return False
+
+
+def span(name: str, phase: str | None = None, **attrs: Any) -> Any:
+    """Return a context manager timing name (into the phase histogram,
+    if given) and, when sampled, tracing it; it yields the OpenTelemetry
+    span or None.
+    """
+    if not _enabled:
+        return _NOOP
+    return _Span(name, phase, attrs)
+
+
+def traced(name: str, phase: str | None = None) -> Any:
+    """Decorator running the function inside span(name, phase)."""
+
+    def decorate(f: Any) -> Any:
+        @functools.wraps(f)
+        def wrapper(*args: Any, **kw: Any) -> Any:
+            with span(name, phase):
+                return f(*args, **kw)
+
+        return wrapper
+
+    return decorate
+
+
+_configure_from_env()
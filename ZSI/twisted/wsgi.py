@@ -14,6 +14,7 @@ from ZSI import _get_element_nsuri_name, EvaluateException, ParseException,\
     fault, ParsedSoap, SoapWriter
 from ZSI.twisted.reverse import DataHandler, ReverseHandlerChain,\
     HandlerChainInterface
+from ZSI.wsgi import soapmethod as soapmethod
 
 """
 EXAMPLES:
@@ -23,23 +24,6 @@ EXAMPLES:
 
 """
 
-def soapmethod(requesttypecode, responsetypecode, soapaction='',
-               operation=None, **kw):
-    """@soapmethod
-    decorator function for soap methods
-    """
-    def _closure(func_cb):
-        func_cb.root = (requesttypecode.nspname,requesttypecode.pname)
-        func_cb.action = soapaction
-        func_cb.requesttypecode = requesttypecode
-        func_cb.responsetypecode = responsetypecode
-        func_cb.soapmethod = True
-        func_cb.operation = None
-        return func_cb
-
-    return _closure
-
-
 class SOAPCallbackHandler:
     """ ps --> pyobj, pyobj --> sw
     class variables:
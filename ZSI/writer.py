@@ -31,6 +31,9 @@ class SoapWriter:
            encodingStyle --
            header -- add SOAP Header?
            outputclass -- ElementProxy class.
+
+       reset() readies the writer for another message, and release()
+       (or leaving a with block) frees the DOM of the current one.
     '''
 
     def __init__(self, envelope=True, encodingStyle=None, header=True,
@@ -53,7 +56,45 @@ class SoapWriter:
         self._MIMEBoundary = ""
         self._startCID = ""
 
-    def __str__(self):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def release(self):
+        '''Free the DOM of the current message.
+        '''
+        node = getattr(self.dom, 'node', None)
+        if node is None:
+            return
+        self.dom.node = None
+        self.body = self._header = None
+        document = getattr(node, 'ownerDocument', None) or node
+        unlink = getattr(document, 'unlink', None)
+        if unlink is not None:
+            unlink()
+
+    def reset(self, **kw):
+        '''Release the current message and clear the per-message state
+        (memo, callbacks, attachments) in place, so the writer and its
+        ElementProxy can serialize another message.
+            kw -- new values for envelope, encodingStyle, header or nsdict;
+                the others keep their value.
+        '''
+        self.release()
+        del self.memo[:]
+        del self.callbacks[:]
+        del self._attachments[:]
+        self.closed = False
+        self._MIMEBoundary = self._startCID = ""
+        self.dom.reset()
+        for name in ('envelope', 'encodingStyle', 'header', 'nsdict'):
+            if name in kw:
+                setattr(self, name, kw[name])
+        return self
+
+    def _finish(self):
         if getattr(self.dom, 'node', None) is None:
             if self.envelope:
                 soap_env = _reserved_ns['SOAP-ENV']
@@ -67,6 +108,9 @@ class SoapWriter:
             else:
                 self.dom.createDocument(None, None)
         self.close()
+
+    def __str__(self):
+        self._finish()
         if len(self._attachments) == 0:
             #we have no attachment let's return the SOAP message
             return str(self.dom)
@@ -82,6 +126,19 @@ class SoapWriter:
             self._startCID = msg.getStartCID()
             return msg.toString()
 
+    def iterencode(self, encoding='utf-8', chunk_size=65536):
+        '''Return the SOAP message (without attachments) as a list of
+        encoded chunks of about chunk_size bytes, written out of the DOM
+        piece by piece rather than joined into one string first.
+        '''
+        self._finish()
+        out = _ChunkWriter(encoding, chunk_size)
+        self.dom.canonicalize(out)
+        return out.chunks()
+
+    def getAttachments(self):
+        return list(self._attachments)
+
     def getMIMEBoundary(self):
         #return the httpHeader if any
         return self._MIMEBoundary
@@ -129,7 +186,8 @@ class SoapWriter:
               instance must specify the typecode attribute.
         '''
         tc_name = getattr(typecode, "pname", None)
-        with span("zsi.serialize.body", typecode_name=str(tc_name) if tc_name else None):
+        with span("zsi.serialize.body", phase="serialize",
+                  typecode_name=str(tc_name) if tc_name else None):
             self.body = None
             if self.envelope:
                 soap_env = _reserved_ns['SOAP-ENV']
@@ -231,8 +289,29 @@ class SoapWriter:
             func(*arglist)
         self.closed = True
 
-    def __del__(self):
-        if not self.closed: self.close()
+
+class _ChunkWriter:
+    '''File-like sink that encodes text into chunks of about size bytes.
+    '''
+
+    def __init__(self, encoding, size):
+        self.encoding, self.size = encoding, size
+        self._done, self._pending, self._length = [], [], 0
+
+    def write(self, text):
+        self._pending.append(text)
+        self._length += len(text)
+        if self._length >= self.size:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self._done.append(''.join(self._pending).encode(self.encoding))
+            self._pending, self._length = [], 0
+
+    def chunks(self):
+        self._flush()
+        return self._done
 
 
 if __name__ == '__main__': print(_copyright)
@@ -0,0 +1,248 @@
+"""WSGI application for @soapmethod callbacks, without Twisted.
+
+The request body is read from ``wsgi.input`` in chunks and fed straight to
+the XML parser.  The reply is returned as a list of encoded chunks written
+out of the DOM.  Neither is ever joined into one string::
+
+    class EchoService(SOAPApplication):
+        @soapmethod(EchoRequest.typecode, EchoResponse.typecode)
+        def soap_Echo(self, request, response):
+            response.value = request.value
+            return request, response
+
+    wsgiref.simple_server.make_server("", 8080, EchoService()).serve_forever()
+
+SOAP with Attachments requests (multipart/related) are read through
+MIMEResolver, so hrefs to their parts resolve.  Replies carrying
+attachments are streamed as multipart/related, with each attachment read
+from its file in blocks.  Where the server offers ``wsgi.file_wrapper``,
+the whole multipart body is handed to it.
+
+gzip and deflate request bodies are decoded as they are read, and plain
+replies are compressed when the client's Accept-Encoding allows it.
+"""
+
+from __future__ import annotations
+
+import inspect
+import io
+import sys
+from typing import Any, Callable, Iterable
+
+from ZSI import ParseException, _get_element_nsuri_name, compression, resolvers
+from ZSI._io import ConcatReader
+from ZSI.fault import FaultFromException, FaultFromZSIException
+from ZSI.parse import IncrementalReader, ParsedSoap
+from ZSI.wstools.MIMEAttachment import NL, _fmt, _make_boundary
+from ZSI.wstools.logging import getLogger as _GetLogger
+from ZSI.writer import SoapWriter
+
+_log = _GetLogger("ZSI.wsgi")
+
+
+def soapmethod(requesttypecode, responsetypecode, soapaction='',
+               operation=None, **kw):
+    """@soapmethod
+    decorator function for soap methods
+    """
+    def _closure(func_cb):
+        func_cb.root = (requesttypecode.nspname, requesttypecode.pname)
+        func_cb.action = soapaction
+        func_cb.requesttypecode = requesttypecode
+        func_cb.responsetypecode = responsetypecode
+        func_cb.soapmethod = True
+        func_cb.operation = None
+        return func_cb
+
+    return _closure
+
+
+def soapmethods(resource: Any) -> dict:
+    """Return the @soapmethod callbacks of resource by request root
+    (namespace, name).
+    """
+    methods = {}
+    for name, method in inspect.getmembers(resource, inspect.ismethod):
+        if getattr(method, "soapmethod", False):
+            methods.setdefault(method.root, method)
+    return methods
+
+
+class _BodyReader(io.RawIOBase):
+    """wsgi.input limited to CONTENT_LENGTH bytes."""
+
+    def __init__(self, stream: Any, length: int | None) -> None:
+        self._stream = stream
+        self._left = length
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        size = len(buffer)
+        if self._left is not None:
+            size = min(size, self._left)
+        if size <= 0:
+            return 0
+        data = self._stream.read(size)
+        buffer[:len(data)] = data
+        if self._left is not None:
+            self._left -= len(data)
+        return len(data)
+
+
+class SOAPApplication:
+    """WSGI application dispatching SOAP requests by the root element of
+    the Body to the @soapmethod callbacks of resource (the application
+    itself by default).
+
+    Class attributes:
+        encoding -- charset of replies
+        chunk_size -- bytes read from wsgi.input, and written per reply
+            chunk, at a time
+        readerclass -- DOM reader for multipart requests (ParsedSoap's
+            default if None)
+        writerclass -- ElementProxy implementation for replies
+        compress_min_size -- smallest reply compressed for clients that
+            accept it (None to never compress)
+        compress_level -- zlib compression level
+        max_decoded_size -- largest decoded size of a compressed request
+    """
+
+    encoding = "UTF-8"
+    chunk_size = 64 * 1024
+    readerclass = None
+    writerclass = None
+    compress_min_size = compression.DEFAULT_MIN_SIZE
+    compress_level = compression.DEFAULT_LEVEL
+    max_decoded_size = 64 * 1024 * 1024
+
+    def __init__(self, resource: Any = None, chunk_size: int | None = None) -> None:
+        self.resource = self if resource is None else resource
+        if chunk_size:
+            self.chunk_size = chunk_size
+        self._methods = None
+
+    def __call__(self, environ: dict, start_response: Callable) -> Iterable[bytes]:
+        if environ.get("REQUEST_METHOD") != "POST":
+            start_response("405 Method Not Allowed",
+                           [("Allow", "POST"), ("Content-Type", "text/plain")])
+            return [b"SOAP requests must use POST\n"]
+        try:
+            ps = self.parse_request(environ)
+        except ParseException as ex:
+            return self.send_fault(FaultFromZSIException(ex), start_response)
+        except Exception as ex:
+            return self.send_fault(FaultFromException(ex, True, sys.exc_info()[2]),
+                                   start_response)
+        with ps:
+            try:
+                sw = self.dispatch(ps, environ)
+            except Exception as ex:
+                return self.send_fault(FaultFromException(ex, False, sys.exc_info()[2]),
+                                       start_response)
+        return self.send_reply(sw, environ, start_response)
+
+    def parse_request(self, environ: dict) -> ParsedSoap:
+        """Parse the request body from wsgi.input, feeding it to the XML
+        parser as it is read.
+        """
+        length = environ.get("CONTENT_LENGTH")
+        length = int(length) if length else None
+        if length is None and not environ.get("wsgi.input_terminated"):
+            length = 0
+        body = _BodyReader(environ["wsgi.input"], length)
+        if environ.get("HTTP_CONTENT_ENCODING"):
+            body = compression.DecodingReader(body, environ["HTTP_CONTENT_ENCODING"],
+                                              self.max_decoded_size, self.chunk_size)
+        ct = environ.get("CONTENT_TYPE", "")
+        if ct.startswith("multipart/"):
+            cid = resolvers.MIMEResolver(ct, io.BufferedReader(body, self.chunk_size))
+            return ParsedSoap(cid.GetSOAPPart(), readerclass=self.readerclass,
+                              resolver=cid.Resolve)
+        reader = IncrementalReader()
+        chunk = bytearray(self.chunk_size)
+        view = memoryview(chunk)
+        while True:
+            n = body.readinto(chunk)
+            if not n:
+                break
+            reader.feed(view[:n])
+        return ParsedSoap(reader.close())
+
+    def dispatch(self, ps: ParsedSoap, environ: dict) -> SoapWriter:
+        """Call the @soapmethod for the Body root of ps and return a
+        SoapWriter holding its reply.
+        """
+        if self._methods is None:
+            self._methods = soapmethods(self.resource)
+        root = _get_element_nsuri_name(ps.body_root)
+        method = self._methods.get(root)
+        if method is None:
+            raise RuntimeError('Missing soap callback method for root "%s"' % (root,))
+        request = ps.Parse(method.requesttypecode)
+        response = method.responsetypecode.pyclass()
+        request, response = method(request, response)
+        sw = SoapWriter(outputclass=self.writerclass)
+        sw.serialize(response, method.responsetypecode)
+        return sw
+
+    def send_reply(self, sw: SoapWriter, environ: dict,
+                   start_response: Callable) -> Iterable[bytes]:
+        with sw:
+            chunks = sw.iterencode(self.encoding, self.chunk_size)
+            attachments = sw.getAttachments()
+        if not attachments:
+            headers = [("Content-Type", 'text/xml; charset="%s"' % self.encoding)]
+            chunks = self._compress(chunks, environ.get("HTTP_ACCEPT_ENCODING"), headers)
+            headers.append(("Content-Length", str(sum(map(len, chunks)))))
+            start_response("200 OK", headers)
+            return chunks
+
+        boundary = _make_boundary()
+        start = "<%s>" % (_fmt % id(sw))
+        parts = [("%s--%s%sContent-Type: text/xml; charset=\"%s\"%s"
+                  "Content-Transfer-Encoding: binary%sContent-Id: %s%s%s" % (
+                      NL, boundary, NL, self.encoding, NL, NL, start, NL, NL)
+                  ).encode("ascii")]
+        parts.extend(chunks)
+        for f in attachments:
+            parts.append(("%s--%s%sContent-Type: application/octet-stream%s"
+                          "Content-Transfer-Encoding: binary%sContent-Id: <%d>%s%s" % (
+                              NL, boundary, NL, NL, NL, id(f), NL, NL)).encode("ascii"))
+            if hasattr(f, "seek"):
+                f.seek(0)
+            parts.append(f)
+        parts.append(("%s--%s--%s" % (NL, boundary, NL)).encode("ascii"))
+        start_response("200 OK", [(
+            "Content-Type",
+            'multipart/related; boundary="%s"; start="%s"; type="text/xml"' % (boundary, start),
+        )])
+        body = io.BufferedReader(ConcatReader(parts, self.encoding), self.chunk_size)
+        wrapper = environ.get("wsgi.file_wrapper")
+        if wrapper is not None:
+            return wrapper(body, self.chunk_size)
+        return iter(lambda: body.read(self.chunk_size), b"")
+
+    def _compress(self, chunks: list[bytes], accept_encoding: str | None,
+                  headers: list) -> list[bytes]:
+        """Return chunks compressed for accept_encoding, adding the
+        response headers that say so; unchanged if they are too small or
+        the client does not accept a compressed reply.
+        """
+        if self.compress_min_size is None or sum(map(len, chunks)) < self.compress_min_size:
+            return chunks
+        coding = compression.negotiate(accept_encoding)
+        if coding is None:
+            return chunks
+        headers.extend([("Content-Encoding", coding), ("Vary", "Accept-Encoding")])
+        return [c for c in compression.itercompress(chunks, coding, self.compress_level) if c]
+
+    def send_fault(self, f: Any, start_response: Callable) -> list[bytes]:
+        _log.debug("sending fault", event="wsgi.fault", code=f.code)
+        data = f.AsSOAP().encode(self.encoding)
+        start_response("500 Internal Server Error", [
+            ("Content-Type", 'text/xml; charset="%s"' % self.encoding),
+            ("Content-Length", str(len(data))),
+        ])
+        return [data]
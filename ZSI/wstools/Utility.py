@@ -872,6 +872,13 @@ class ElementProxy(Base, MessageInterface):
     def __str__(self):
         return self.toString()
 
+    def reset(self):
+        '''Forget the current document and generated prefixes, so the
+        proxy can build a new document.
+        '''
+        self._indx = 0
+        self.node = None
+
     def evaluate(self, expression, processorNss=None):
         '''expression -- XPath compiled expression
         '''
@@ -1050,8 +1057,9 @@ class ElementProxy(Base, MessageInterface):
     def loadFromString(self, data):
         self.node = self._dom.loadDocument(StringIO(data))
 
-    def canonicalize(self):
-        return Canonicalize(self.node)
+    def canonicalize(self, output=None):
+        """Return the canonical text, or write it to output.write."""
+        return Canonicalize(self.node, output)
 
     def toString(self):
         return self.canonicalize()
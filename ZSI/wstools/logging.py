@@ -12,12 +12,30 @@ import time
 WARN = 1
 DEBUG = 2
 
+# Fast path: logger classes whose level is below DEBUG (WARN) get
+# debug/debugOn (warning/warnOn) rebound to constant no-op functions.
+# The level is resolved when it is set, not on every call.
+_fast_path = False
+_patched = []
+_bound_classes = set()
+_MISSING = object()
+
+def _no_log(self, *args, **kw):
+    return
+
+def _log_off(self):
+    return False
+
 
 class ILogger:
     '''Logger interface, by default this class
     will be used and logging calls are no-ops.
+
+    honours_level -- debug/warning do nothing below their level, so the
+        fast path may replace them with no-ops.
     '''
     level = 0
+    honours_level = True
     def __init__(self, msg):
         return
     def warning(self, *args, **kw):
@@ -28,12 +46,14 @@ class ILogger:
         return
     def setLevel(cls, level):
         cls.level = level
+        _rebind_loggers()
     setLevel = classmethod(setLevel)
 
     debugOn = lambda self: self.level >= DEBUG
     warnOn = lambda self: self.level >= WARN
 
 
+
 class BasicLogger(ILogger):
     last = ''
 
@@ -117,6 +137,8 @@ _LoggerClass = BasicLogger
 _structured_env_checked = False
 
 class GridLogger(ILogger):
+    honours_level = False
+
     def debug(self, msg, *args, **kw):
         kw['component'] = self.msg
         gridLog(event=msg %args, level='DEBUG', **kw)
@@ -307,6 +329,63 @@ def setLevel(level=0):
     '''Set Global Logging Level.
     '''
     ILogger.level = level
+    _rebind_loggers()
+
+def setFastPath(enabled=True):
+    '''Resolve the debug/warning state of the logger classes once, when
+    the level is set (setLevel, Logger.setLevel, setFastPath), instead of
+    on every call; disabled calls become no-ops.  Assigning a level
+    attribute directly bypasses this, so use the setters while it is on.
+    '''
+    global _fast_path
+    _fast_path = bool(enabled)
+    _rebind_loggers()
+
+def getFastPath():
+    return _fast_path
+
+def _logger_classes():
+    classes, todo = [], [ILogger]
+    while todo:
+        cls = todo.pop()
+        if cls not in classes:
+            classes.append(cls)
+            todo.extend(cls.__subclasses__())
+    return classes
+
+def _rebind_loggers():
+    '''Restore the logger classes, then rebind the fast path methods
+    of those whose level disables them.
+    '''
+    while _patched:
+        cls, name, method = _patched.pop()
+        if method is _MISSING:
+            delattr(cls, name)
+        else:
+            setattr(cls, name, method)
+    _bound_classes.clear()
+    if not _fast_path:
+        return
+    classes = _logger_classes()
+    # Resolve every class before patching any: subclasses inherit patches.
+    states = []
+    for cls in classes:
+        probe = object.__new__(cls)
+        states.append((cls, cls.debugOn(probe), cls.warnOn(probe)))
+    for cls, debug, warn in states:
+        names = []
+        if not debug:
+            names.append(('debugOn', _log_off))
+            if cls.honours_level:
+                names.append(('debug', _no_log))
+        if not warn:
+            names.append(('warnOn', _log_off))
+            if cls.honours_level:
+                names.append(('warning', _no_log))
+        for name, func in names:
+            _patched.append((cls, name, cls.__dict__.get(name, _MISSING)))
+            setattr(cls, name, func)
+        _bound_classes.add(cls)
 
 def getLevel():
     return ILogger.level
@@ -315,6 +394,8 @@ def getLogger(msg):
     '''Return instance of Logging class.
     '''
     _configure_from_env_once()
+    if _fast_path and _LoggerClass not in _bound_classes:
+        _rebind_loggers()
     return _LoggerClass(msg)
 
 
@@ -325,8 +406,11 @@ def _configure_from_env_once():
         return
     _structured_env_checked = True
 
+    global _fast_path
     fmt = os.environ.get("ZSI_LOG_FORMAT", "").strip().lower()
     level = os.environ.get("ZSI_LOG_LEVEL", "").strip().lower()
+    if os.environ.get("ZSI_LOG_FASTPATH", "").strip().lower() in ("1", "on", "true", "yes"):
+        _fast_path = True
     if fmt == "json":
         setLoggerClass(JSONLogger)
 
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+"""Memory benchmark: RSS over many in-process dispatch round trips.
+
+Each request parses a SOAP message, dispatches it to a handler and
+serializes the reply, as dispatch.SOAPRequestHandler does.  RSS is sampled
+at regular intervals; with deterministic DOM release it should stay flat.
+--no-release skips ParsedSoap.close() to compare against leaving the DOMs
+to the garbage collector.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from ZSI import ParsedSoap  # noqa: E402
+from ZSI.dispatch import _Dispatch  # noqa: E402
+
+REQUEST = """<SOAP-ENV:Envelope
+    xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/">
+<SOAP-ENV:Body><Echo><name>%d</name><items><i>a</i><i>b</i><i>c</i></items>
+</Echo></SOAP-ENV:Body>
+</SOAP-ENV:Envelope>"""
+
+
+class _Handlers:
+    @staticmethod
+    def Echo(name, items):
+        return {"name": name, "items": items}
+
+
+def rss_bytes() -> int:
+    """Current resident set size (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def run(requests: int, samples: int, release: bool) -> dict:
+    replies = []
+
+    def send(text: str, **kw: object) -> None:
+        replies.append(len(text))
+
+    def fault(f: object, **kw: object) -> None:
+        raise RuntimeError(f.AsSOAP())
+
+    modules = (_Handlers,)
+    step = max(1, requests // samples)
+    points = []
+    gen2 = gc.get_stats()[2]["collections"]
+    start = time.perf_counter()
+    for i in range(requests):
+        ps = ParsedSoap(REQUEST % i)
+        _Dispatch(ps, modules, send, fault, rpc=True)
+        if release:
+            ps.close()
+        del ps
+        replies.clear()
+        if i % step == 0 or i == requests - 1:
+            points.append({"requests": i + 1, "rss_mb": rss_bytes() / 1048576.0})
+    elapsed = time.perf_counter() - start
+
+    # Ignore warm-up (first tenth of the run) when computing growth.
+    warm = points[len(points) // 10]["rss_mb"]
+    return {
+        "requests": requests,
+        "release": release,
+        "seconds": elapsed,
+        "gen2_collections": gc.get_stats()[2]["collections"] - gen2,
+        "rss_start_mb": warm,
+        "rss_end_mb": points[-1]["rss_mb"],
+        "rss_growth_mb": points[-1]["rss_mb"] - warm,
+        "rss_peak_mb": max(p["rss_mb"] for p in points),
+        "samples": points,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument(
+        "--no-release",
+        action="store_true",
+        help="Leave request DOMs to the garbage collector.",
+    )
+    parser.add_argument(
+        "--max-growth-mb",
+        type=float,
+        default=None,
+        help="Fail if RSS grows by more than this after warm-up.",
+    )
+    parser.add_argument("--json", help="Write the result to this file.")
+    args = parser.parse_args()
+
+    result = run(args.requests, args.samples, not args.no_release)
+    for point in result["samples"]:
+        print(f"[memory] {point['requests']:>8} requests: {point['rss_mb']:8.1f} MB")
+    print(
+        f"[memory] {result['requests']} requests in {result['seconds']:.1f}s, "
+        f"growth {result['rss_growth_mb']:+.1f} MB, "
+        f"peak {result['rss_peak_mb']:.1f} MB, "
+        f"gen2 collections {result['gen2_collections']}"
+    )
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2), encoding="utf-8")
+    if args.max_growth_mb is not None and result["rss_growth_mb"] > args.max_growth_mb:
+        print(f"[memory] FAIL: growth exceeds {args.max_growth_mb} MB")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,5 +1,9 @@
 #!/usr/bin/env python
-"""Create cProfile baselines for core ZSI test entrypoints."""
+"""Create cProfile baselines for core ZSI test entrypoints.
+
+With --typecodes the cases run under ZSI.profiling instead, which reports
+time per typecode and writes flamegraph-compatible collapsed stacks.
+"""
 
 from __future__ import annotations
 
@@ -32,6 +36,19 @@ def run_case(name: str, args: list[str], out_dir: Path, top_n: int) -> None:
     print("")
 
 
+def run_typecode_case(name: str, args: list[str], out_dir: Path, top_n: int) -> None:
+    stacks_file = out_dir / f"{name}.collapsed"
+    cmd = [sys.executable, "-m", "ZSI.profiling", "-o", str(stacks_file),
+           "-n", str(top_n), *args]
+    env = os.environ.copy()
+    env.setdefault("PYTHONPATH", ".")
+
+    print(f"[profile] running {name}: {' '.join(cmd)}")
+    subprocess.run(cmd, cwd=ROOT, env=env, check=True)
+    print(f"[profile] collapsed stacks for {name}: {stacks_file}")
+    print("")
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument(
@@ -45,13 +62,21 @@ def main() -> int:
         default=30,
         help="How many top cumulative entries to print per case.",
     )
+    parser.add_argument(
+        "--typecodes",
+        action="store_true",
+        help="Profile per typecode (ZSI.profiling) instead of cProfile.",
+    )
     args = parser.parse_args()
 
     out_dir = (ROOT / args.out_dir).resolve()
     out_dir.mkdir(parents=True, exist_ok=True)
 
     for name, case_args in DEFAULT_CASES:
-        run_case(name, list(case_args), out_dir, args.top)
+        if args.typecodes:
+            run_typecode_case(name, list(case_args), out_dir, args.top)
+        else:
+            run_case(name, list(case_args), out_dir, args.top)
 
     print(f"[profile] completed. Profiles written to: {out_dir}")
     return 0
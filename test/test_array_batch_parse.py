@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+import array
+import unittest
+from unittest import mock
+
+from ZSI import ParsedSoap, TC, EvaluateException
+from ZSI.TCnumbers import Ibyte
+from ZSI.TCtimes import gDate
+
+ENVELOPE = """<SOAP-ENV:Envelope
+    xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/"
+    xmlns:SOAP-ENC="http://schemas.xmlsoap.org/soap/encoding/"
+    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+    xmlns:xsd="http://www.w3.org/2001/XMLSchema">
+<SOAP-ENV:Body><a SOAP-ENC:arrayType="xsd:anyType[3]">%s</a></SOAP-ENV:Body>
+</SOAP-ENV:Envelope>"""
+
+
+def _items(*texts):
+    return "".join("<item>%s</item>" % t for t in texts)
+
+
+def _parse(tc, body):
+    ps = ParsedSoap(ENVELOPE % body)
+    return ps.Parse(tc)
+
+
+class ArrayBatchParseTests(unittest.TestCase):
+    def test_simple_types(self):
+        self.assertEqual([1, -2, 3], _parse(TC.Array("xsd:int", TC.Integer(), "a"), _items("1", "-2", " 3 ")))
+        self.assertEqual([1.5, float("inf"), 0.0], _parse(TC.Array("xsd:double", TC.Decimal(), "a"), _items("1.5", "INF", "0.0")))
+        self.assertEqual([True, False, True], _parse(TC.Array("xsd:boolean", TC.Boolean(), "a"), _items("TRUE", "0", "1")))
+        self.assertEqual(["x", "y z", ""], _parse(TC.Array("xsd:string", TC.String(), "a"), _items(" x ", "y z<!-- c -->", "<![CDATA[]]>")))
+        self.assertEqual((2024, 2, 29), _parse(TC.Array("xsd:date", gDate(), "a"), _items("2024-02-29"))[0][:3])
+
+    def test_matches_item_by_item_parse(self):
+        body = _items("1", "2") + '<item xsi:type="xsd:int">3</item>'
+        self.assertEqual([1, 2, 3], _parse(TC.Array("xsd:int", TC.Integer(), "a"), body))
+
+    def test_errors_name_the_offending_item(self):
+        tc = TC.Array("xsd:byte", Ibyte(), "a")
+        with self.assertRaises(EvaluateException) as cm:
+            _parse(tc, _items("1", "300"))
+        self.assertIn("Overflow", str(cm.exception))
+        self.assertRaises(EvaluateException, _parse, TC.Array("xsd:int", TC.Integer(), "a"), _items("1", "x"))
+        self.assertRaises(EvaluateException, _parse, TC.Array("xsd:double", TC.Decimal(), "a"), _items("nan"))
+        self.assertRaises(EvaluateException, _parse, TC.Array("xsd:boolean", TC.Boolean(), "a"), _items(" yes"))
+
+    def test_asarray(self):
+        v = _parse(TC.Array("xsd:int", TC.Integer(), "a", asarray="array"), _items("1", "2"))
+        self.assertEqual(array.array("q", [1, 2]), v)
+        v = _parse(TC.Array("xsd:double", TC.Decimal(), "a", asarray="numpy"), _items("1.5"))
+        self.assertEqual([1.5], list(v))
+        v = _parse(TC.Array("xsd:string", TC.String(), "a", asarray="array"), _items("s"))
+        self.assertEqual(["s"], v)
+
+    def test_asarray_does_not_depend_on_wire_shape(self):
+        typed = '<item xsi:type="xsd:int">1</item><item xsi:type="xsd:int">2</item>'
+        tc = TC.Array("xsd:int", TC.Iint(), "a", asarray="array")
+        with mock.patch.object(tc.ofwhat, "parse", wraps=tc.ofwhat.parse) as parse:
+            self.assertEqual(array.array("q", [1, 2]), _parse(tc, typed))
+            self.assertFalse(parse.called)
+            self.assertRaises(EvaluateException, _parse, tc,
+                              typed.replace("xsd:int", "xsd:short", 1))
+            self.assertTrue(parse.called)
+
+        tc = TC.Array("xsd:int", TC.Iint(nillable=True), "a", asarray="array")
+        body = '<item xsi:type="xsd:int">1</item><item xsi:nil="1"/>'
+        self.assertEqual([1, None], _parse(tc, body))
+        offset = ENVELOPE.replace('<a ', '<a SOAP-ENC:offset="[1]" ')
+        tc = TC.Array("xsd:int", TC.Iint(), "a", asarray="array", fill=0)
+        self.assertEqual(array.array("q", [0, 1, 2]), ParsedSoap(offset % typed).Parse(tc))
+        self.assertEqual(array.array("q", [0, 1, 2]), ParsedSoap(offset % _items("1", "2")).Parse(tc))
+
+
+def makeTestSuite():
+    return unittest.defaultTestLoader.loadTestsFromTestCase(ArrayBatchParseTests)
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+import array
+import unittest
+
+from ZSI import SoapWriter, TC
+from ZSI.TCcompound import Array
+from ZSI.TCnumbers import Iint
+from ZSI.wstools.Namespaces import SCHEMA
+
+XSD = SCHEMA.XSD3
+XSD_INT = (XSD, "int")
+
+
+def _serialize(tc, pyobj):
+    sw = SoapWriter()
+    sw.serialize(pyobj, tc)
+    return str(sw)
+
+
+class ArrayBatchSerializeTests(unittest.TestCase):
+    def assertSameAsItemByItem(self, tc, pyobj):
+        fast = _serialize(tc, pyobj)
+        batch, Array._serialize_batch = Array._serialize_batch, \
+            lambda self, *args: False
+        try:
+            slow = _serialize(tc, pyobj)
+        finally:
+            Array._serialize_batch = batch
+        self.assertEqual(slow, fast)
+        return fast
+
+    def test_sequence_types(self):
+        tc = TC.Array(XSD_INT, Iint(typed=True), "a")
+        xml = self.assertSameAsItemByItem(tc, [1, -2, 3])
+        self.assertTrue('SOAP-ENC:arrayType="xsd:int[]"' in xml)
+        self.assertTrue('<element xsi:type="xsd:int">-2</element>' in xml)
+        self.assertEqual(xml, _serialize(tc, array.array("q", [1, -2, 3])))
+        self.assertEqual(xml, _serialize(tc, memoryview(array.array("q", [1, -2, 3]))))
+        self.assertEqual(xml, _serialize(tc, (1, -2, 3)))
+
+    def test_decimal_and_boolean(self):
+        self.assertSameAsItemByItem(TC.Array((XSD, "double"), TC.Decimal(), "a"),
+                                    array.array("d", [1.5, float("inf"), 0.0]))
+        self.assertSameAsItemByItem(TC.Array((XSD, "boolean"), TC.Boolean(), "a"),
+                                    [True, False])
+
+    def test_offset_and_childnames(self):
+        tc = TC.Array(XSD_INT, Iint(typed=True), "a", fill=0,
+                      nooffset=False, childnames="n")
+        xml = self.assertSameAsItemByItem(tc, [0, 0, 7, 8])
+        self.assertTrue('SOAP-ENC:offset="[2]"' in xml)
+        self.assertTrue('<n xsi:type="xsd:int">7</n>' in xml)
+
+    def test_untyped_items(self):
+        tc = TC.Array(XSD_INT, TC.Integer(), "a")
+        xml = self.assertSameAsItemByItem(tc, [4, 5])
+        self.assertTrue("<element>4</element>" in xml)
+
+
+def makeTestSuite():
+    return unittest.defaultTestLoader.loadTestsFromTestCase(ArrayBatchSerializeTests)
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")
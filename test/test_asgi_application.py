@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+import asyncio
+import threading
+import unittest
+from unittest import mock
+
+from ZSI import TC, ParsedSoap, SoapWriter, asgi
+from ZSI.ServiceContainer import ServiceSOAPBinding
+from ZSI.asgi import SOAPApplication
+from ZSI.wsgi import soapmethod
+
+
+class EchoRequest:
+    pass
+
+
+class EchoResponse:
+    pass
+
+
+EchoRequest.typecode = TC.Struct(EchoRequest, [TC.String("value")], ("urn:echo", "Echo"))
+EchoResponse.typecode = TC.Struct(EchoResponse, [TC.String("value")],
+                                  ("urn:echo", "EchoResponse"))
+
+
+class EchoService(ServiceSOAPBinding):
+    root = {("urn:echo", "Echo"): "soap_Echo"}
+
+    def soap_Echo(self, ps):
+        request = ps.Parse(EchoRequest.typecode)
+        if request.value == "deny":
+            raise ValueError("denied")
+        response = EchoResponse()
+        response.value = "%s from %s" % (request.value, threading.current_thread().name)
+        return request, response
+
+
+class AsyncResource:
+    @soapmethod(EchoRequest.typecode, EchoResponse.typecode)
+    async def soap_Echo(self, request, response):
+        await asyncio.sleep(0)
+        response.value = request.value * 50
+        return request, response
+
+
+def request_body(value):
+    req = EchoRequest()
+    req.value = value
+    return str(SoapWriter().serialize(req, EchoRequest.typecode)).encode("utf-8")
+
+
+def run(app, path, body, method="POST", piece=10):
+    pieces = [body[i:i + piece] for i in range(0, len(body), piece)] or [b""]
+    messages = [{"type": "http.request", "body": p, "more_body": i < len(pieces) - 1}
+                for i, p in enumerate(pieces)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "server": ("testhost", 8000),
+             "headers": [(b"content-type", b"text/xml")]}
+    asyncio.run(app(scope, receive, send))
+    return sent, messages
+
+
+class ASGIApplicationTests(unittest.TestCase):
+    def setUp(self):
+        self.app = SOAPApplication(services=[EchoService("/echo")], resource=AsyncResource(),
+                                   max_workers=2)
+        self.app.chunk_size = 32
+
+    def tearDown(self):
+        self.app.close()
+
+    def test_sync_service_runs_on_worker_threads(self):
+        sent, unread = run(self.app, "/echo", request_body("hi"))
+        self.assertEqual([], unread)
+        start, body = sent[0], sent[1:]
+        self.assertEqual(200, start["status"])
+        data = b"".join(m["body"] for m in body)
+        self.assertEqual(str(len(data)).encode(), dict(start["headers"])[b"content-length"])
+        self.assertTrue(all(m["more_body"] for m in body[:-1]))
+        self.assertFalse(body[-1]["more_body"])
+        value = ParsedSoap(data).Parse(EchoResponse.typecode).value
+        self.assertTrue(value.startswith("hi from zsi-asgi"), value)
+
+    def test_async_soapmethod_is_awaited(self):
+        sent, unread = run(self.app, "/other", request_body("ab"))
+        self.assertEqual(200, sent[0]["status"])
+        self.assertGreater(len(sent), 3)
+        data = b"".join(m["body"] for m in sent[1:])
+        self.assertEqual("ab" * 50, ParsedSoap(data).Parse(EchoResponse.typecode).value)
+
+    def test_errors_become_faults(self):
+        sent, unread = run(self.app, "/echo", request_body("deny"))
+        self.assertEqual(500, sent[0]["status"])
+        self.assertTrue(ParsedSoap(sent[1]["body"]).IsAFault())
+        self.assertIn(b"denied", sent[1]["body"])
+
+        sent, unread = run(self.app, "/echo", b"<broken")
+        self.assertEqual(500, sent[0]["status"])
+
+    def test_large_messages_are_parsed_and_serialized_off_the_loop(self):
+        threads = {}
+
+        def record(name, fn):
+            def wrapper(*args, **kw):
+                threads.setdefault(name, set()).add(threading.current_thread().name)
+                return fn(*args, **kw)
+            return wrapper
+
+        patches = [
+            mock.patch("ZSI.asgi.ParsedSoap", record("parse", ParsedSoap)),
+            mock.patch("ZSI.asgi._SerializeResponse",
+                       record("serialize", asgi._SerializeResponse)),
+            mock.patch.object(SoapWriter, "iterencode",
+                              record("encode", SoapWriter.iterencode)),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        run(self.app, "/echo", request_body("small"))
+        self.assertEqual({"MainThread"}, set.union(*threads.values()))
+
+        threads.clear()
+        self.app.offload_size = 1024
+        sent, unread = run(self.app, "/echo", request_body("x" * 2000), piece=500)
+        self.assertEqual(200, sent[0]["status"])
+        for name in ("parse", "serialize", "encode"):
+            self.assertTrue(all(t.startswith("zsi-asgi") for t in threads[name]),
+                            (name, threads))
+
+    def test_get_is_not_allowed(self):
+        sent, unread = run(self.app, "/echo", b"", method="GET")
+        self.assertEqual(405, sent[0]["status"])
+
+    def test_lifespan_shuts_down_workers(self):
+        run(self.app, "/echo", request_body("hi"))
+        self.assertIsNotNone(self.app._executor)
+        messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message["type"])
+
+        asyncio.run(self.app({"type": "lifespan"}, receive, send))
+        self.assertEqual(["lifespan.startup.complete", "lifespan.shutdown.complete"], sent)
+        self.assertIsNone(self.app._executor)
+
+
+def makeTestSuite():
+    return unittest.defaultTestLoader.loadTestsFromTestCase(ASGIApplicationTests)
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+import threading
+import unittest
+from unittest import mock
+
+from ZSI import FaultException
+from ZSI.batch import BatchExecutor
+from ZSI.client import Binding
+
+
+class _FakeBinding(Binding):
+    """Binding whose RPC echoes the request and records the calling thread."""
+
+    def __init__(self, **kw):
+        Binding.__init__(self, url="http://localhost/echo", **kw)
+        self.calls = []
+        self.failures = {}
+
+    def RPC(self, url, opname, obj, replytype=None, **kw):
+        self.calls.append(threading.current_thread().name)
+        remaining = self.failures.get(obj, 0)
+        if remaining:
+            self.failures[obj] = remaining - 1
+            raise ConnectionResetError("reset")
+        if obj == "fault":
+            raise FaultException("server fault")
+        return (opname, obj, kw.get("soapaction"))
+
+
+class BatchExecutorTests(unittest.TestCase):
+    def test_results_stream_in_order(self):
+        binding = _FakeBinding()
+        results = list(binding.map("echo", range(20), concurrency=4, soapaction="urn:echo"))
+        self.assertEqual(list(range(20)), [r.index for r in results])
+        self.assertEqual([("echo", i, "urn:echo") for i in range(20)], [r.response for r in results])
+        self.assertTrue(all(r.ok for r in results))
+        self.assertTrue(all(name.startswith("zsi-batch") for name in binding.calls))
+
+    def test_clone_has_private_request_state(self):
+        binding = _FakeBinding()
+        binding.AddHeader("X-Test", "1")
+        other = binding.clone()
+        other.AddHeader("X-Other", "2")
+        self.assertEqual([("X-Test", "1")], binding.user_headers)
+        self.assertIsNone(other.ps)
+        self.assertEqual(binding.url, other.url)
+
+    def test_fault_and_retry_are_per_item(self):
+        binding = _FakeBinding()
+        binding.failures = {"flaky": 1, "broken": 5}
+        with BatchExecutor(binding, concurrency=2, retries=1) as executor:
+            results = list(executor.map("op", ["ok", "flaky", "fault", "broken"]))
+        self.assertEqual([True, True, False, False], [r.ok for r in results])
+        self.assertEqual([1, 2, 1, 2], [r.attempts for r in results])
+        self.assertIsInstance(results[2].error, FaultException)
+        self.assertIsInstance(results[3].error, ConnectionResetError)
+
+    def test_callable_operation(self):
+        binding = _FakeBinding()
+        with BatchExecutor(binding, concurrency=3) as executor:
+            results = list(executor.map(lambda b, r: (b is binding, r * 2), [1, 2, 3]))
+        self.assertEqual([(False, 2), (False, 4), (False, 6)], [r.response for r in results])
+
+    def test_failed_binding_connection_is_closed(self):
+        connections = []
+
+        def op(b, request):
+            b.h = mock.Mock()
+            connections.append(b.h)
+            if request == "reset":
+                raise ConnectionResetError("reset")
+            if request == "error":
+                raise ValueError("error")
+            return request
+
+        with BatchExecutor(_FakeBinding(), concurrency=1) as executor:
+            results = list(executor.map(op, ["ok", "reset", "error", "ok"]))
+        self.assertEqual([True, False, False, True], [r.ok for r in results])
+        self.assertEqual([0, 1, 1, 1], [c.close.call_count for c in connections])
+
+    def test_close_closes_worker_connections(self):
+        connections = []
+
+        def op(b, request):
+            if b.h is None:
+                b.h = mock.Mock()
+                connections.append(b.h)
+            return request
+
+        executor = BatchExecutor(_FakeBinding(), concurrency=3)
+        list(executor.map(op, range(10)))
+        self.assertTrue(connections)
+        self.assertFalse(any(c.close.called for c in connections))
+        executor.close()
+        self.assertEqual([1] * len(connections), [c.close.call_count for c in connections])
+
+
+def makeTestSuite():
+    return unittest.defaultTestLoader.loadTestsFromTestCase(BatchExecutorTests)
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")
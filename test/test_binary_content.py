@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+import base64
+import io
+import os
+import unittest
+
+from ZSI import ParsedSoap, SoapWriter, TC
+
+ENVELOPE = """<SOAP-ENV:Envelope
+    xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/">
+<SOAP-ENV:Body><data>%s</data></SOAP-ENV:Body>
+</SOAP-ENV:Envelope>"""
+
+PAYLOAD = os.urandom(100003)
+
+
+def _parse(tc, content):
+    ps = ParsedSoap(ENVELOPE % content)
+    return ps.Parse(tc)
+
+
+def _serialize(tc, pyobj):
+    sw = SoapWriter()
+    sw.serialize(pyobj, tc)
+    return str(sw)
+
+
+class BinaryContentTests(unittest.TestCase):
+    def test_base64_chunks_decode_to_bytes(self):
+        text = base64.encodebytes(PAYLOAD).decode("ascii")
+        content = "\n%s<![CDATA[%s]]>  \n" % (text[:1001], text[1001:])
+        self.assertEqual(PAYLOAD, _parse(TC.Base64Binary("data"), content))
+        self.assertEqual(PAYLOAD, _parse(TC.Base64String("data", binary=True), content))
+        self.assertEqual(PAYLOAD.decode("latin-1"), _parse(TC.Base64String("data"), content))
+
+    def test_spool_to_file(self):
+        content = base64.b64encode(PAYLOAD).decode("ascii")
+        f = _parse(TC.Base64Binary("data", spool_threshold=1024), content)
+        self.assertTrue(f._rolled)
+        self.assertEqual(PAYLOAD, f.read())
+        f = _parse(TC.Base64Binary("data", spool_threshold=1 << 20), content)
+        self.assertFalse(f._rolled)
+        self.assertEqual(PAYLOAD, f.read())
+
+    def test_hex(self):
+        content = PAYLOAD[:999].hex().upper()
+        self.assertEqual(PAYLOAD[:999], _parse(TC.HexBinaryString("data", binary=True), content))
+        self.assertEqual(PAYLOAD[:999].decode("latin-1"), _parse(TC.HexBinaryString("data"), content))
+
+    def test_invalid_content_is_rejected(self):
+        self.assertRaises(Exception, _parse, TC.HexBinaryString("data", binary=True), "ABC")
+        self.assertRaises(Exception, _parse, TC.Base64Binary("data"), "QUJ")
+
+    def test_serialize_matches_single_text_node(self):
+        tc = TC.Base64Binary("data")
+        xml = _serialize(tc, PAYLOAD)
+        self.assertTrue(">%s</data>" % base64.b64encode(PAYLOAD).decode("ascii") in xml)
+        self.assertEqual(xml, _serialize(tc, io.BytesIO(PAYLOAD)))
+        self.assertEqual(xml, _serialize(tc, bytearray(PAYLOAD)))
+        self.assertTrue("\"></data>" in _serialize(tc, b""))
+
+        tc = TC.Base64String("data")
+        self.assertEqual("\n" + base64.b64encode(b"\xe9t\xe9").decode("ascii"),
+                         tc.get_formatted_content("\xe9t\xe9"))
+        tc = TC.HexBinaryString("data")
+        self.assertTrue(">%s</data>" % PAYLOAD[:10].hex().upper()
+                        in _serialize(tc, io.BytesIO(PAYLOAD[:10])))
+
+
+def makeTestSuite():
+    return unittest.defaultTestLoader.loadTestsFromTestCase(BinaryContentTests)
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+import re
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from ZSI import TC, FaultException
+from ZSI.client import Binding
+
+RESPONSE = """<SOAP-ENV:Envelope
+    xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/">
+<SOAP-ENV:Body><EchoResponse><value>%s</value></EchoResponse></SOAP-ENV:Body>
+</SOAP-ENV:Envelope>"""
+
+FAULT = """<SOAP-ENV:Envelope
+    xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/">
+<SOAP-ENV:Body><SOAP-ENV:Fault><faultcode>SOAP-ENV:Server</faultcode>
+<faultstring>nope</faultstring></SOAP-ENV:Fault></SOAP-ENV:Body>
+</SOAP-ENV:Envelope>"""
+
+
+class EchoResponse:
+    pass
+
+
+EchoResponse.typecode = TC.Struct(EchoResponse, [TC.String("value")], "EchoResponse")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+        if "<fail" in body:
+            code, text = 500, FAULT
+        else:
+            code, text = 200, RESPONSE % re.search(r">([^<]*)</value>", body).group(1)
+        data = text.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", 'text/xml; charset="utf-8"')
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Set-Cookie", "session=abc")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class BindingCallTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(("127.0.0.1", 0), _Handler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.url = "http://127.0.0.1:%d/echo" % cls.server.server_port
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_call_returns_immutable_response(self):
+        b = Binding(url=self.url)
+        rsp = b.call("Echo", {"value": "hi"}, EchoResponse)
+        self.assertEqual(200, rsp.status)
+        self.assertEqual("hi", rsp.reply.value)
+        self.assertTrue(rsp.ps.body_root is not None)
+        self.assertIn("serialize", rsp.timings)
+        self.assertIn("parse", rsp.timings)
+        self.assertRaises(AttributeError, setattr, rsp, "status", 500)
+        with self.assertRaises(TypeError):
+            rsp.timings["x"] = 1
+        self.assertIsNone(b.ps)
+        self.assertIn("session", b.cookies)
+
+    def test_call_is_thread_safe(self):
+        b = Binding(url=self.url)
+        results = {}
+
+        def worker(i):
+            results[i] = b.call("Echo", {"value": "v%d" % i}, EchoResponse).reply.value
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual({i: "v%d" % i for i in range(8)}, results)
+
+    def test_send_receive_reuses_connection_with_keepalive(self):
+        b = Binding(url=self.url, keepalive=True)
+        self.assertEqual("a", b.RPC(None, "Echo", {"value": "a"}, replytype=EchoResponse).value)
+        h = b.h
+        self.assertEqual("b", b.RPC(None, "Echo", {"value": "b"}, replytype=EchoResponse).value)
+        self.assertIs(h, b.h)
+
+    def test_fault_raises(self):
+        b = Binding(url=self.url)
+        self.assertRaises(FaultException, b.call, "Echo", {"fail": "x"}, EchoResponse)
+
+
+def makeTestSuite():
+    return unittest.defaultTestLoader.loadTestsFromTestCase(BindingCallTests)
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+import asyncio
+import io
+import threading
+import types
+import unittest
+import zlib
+from http.server import HTTPServer
+from wsgiref.util import setup_testing_defaults
+
+from ZSI import TC, SoapWriter, compression
+from ZSI.asgi import SOAPApplication as ASGIApplication
+from ZSI.client import Binding
+from ZSI.dispatch import SOAPRequestHandler
+from ZSI.wsgi import SOAPApplication, soapmethod
+
+
+class EchoRequest:
+    pass
+
+
+class EchoResponse:
+    pass
+
+
+EchoRequest.typecode = TC.Struct(EchoRequest, [TC.String("value")], ("urn:zip", "Echo"))
+EchoResponse.typecode = TC.Struct(EchoResponse, [TC.String("value")],
+                                  ("urn:zip", "EchoResponse"))
+
+
+class RPCResponse:
+    pass
+
+
+RPCResponse.typecode = TC.Struct(RPCResponse, [TC.String("value")], "EchoResponse")
+
+
+class EchoService:
+    @soapmethod(EchoRequest.typecode, EchoResponse.typecode)
+    def soap_Echo(self, request, response):
+        response.value = request.value * 100
+        return request, response
+
+
+def request_body(value):
+    req = EchoRequest()
+    req.value = value
+    return str(SoapWriter().serialize(req, EchoRequest.typecode)).encode("utf-8")
+
+
+class CodingTests(unittest.TestCase):
+    def test_negotiate(self):
+        self.assertEqual("gzip", compression.negotiate("gzip, deflate"))
+        self.assertEqual("deflate", compression.negotiate("gzip;q=0.5, deflate"))
+        self.assertEqual("gzip", compression.negotiate("*"))
+        self.assertEqual("gzip", compression.negotiate("x-gzip"))
+        self.assertIsNone(compression.negotiate("gzip;q=0, br"))
+        self.assertIsNone(compression.negotiate(None))
+
+    def test_round_trip_in_blocks(self):
+        data = b"<item>value</item>" * 10000
+        for coding in compression.ENCODINGS:
+            encoded = b"".join(compression.itercompress([data[:7], data[7:]], coding))
+            self.assertLess(len(encoded) * 10, len(data))
+            blocks = [encoded[i:i + 100] for i in range(0, len(encoded), 100)]
+            self.assertEqual(data, b"".join(compression.iterdecode(blocks, coding)))
+            self.assertEqual(data, compression.DecodingReader(io.BytesIO(encoded), coding).read())
+
+    def test_raw_deflate_and_errors(self):
+        c = zlib.compressobj(6, zlib.DEFLATED, -15)
+        raw = c.compress(b"abc" * 100) + c.flush()
+        self.assertEqual(b"abc" * 100, compression.decode(raw, "deflate"))
+        for body in (raw, compression.compress(b"abc" * 100, "deflate")):
+            for split in (0, 1, 2):
+                blocks = [body[:split], body[split:split + 1], body[split + 1:]]
+                self.assertEqual(b"abc" * 100,
+                                 b"".join(compression.iterdecode(blocks, "deflate")))
+        self.assertRaises(compression.DecodingError, compression.decode, raw[:1], "deflate")
+        gz = compression.compress(b"\0" * (8 << 20), "gzip")
+        self.assertRaises(compression.DecodingError, compression.decode, gz, "gzip",
+                          max_size=1 << 20)
+        self.assertRaises(compression.DecodingError, compression.decode, gz[:-8], "gzip")
+        self.assertRaises(compression.DecodingError, compression.decode, b"x", "br")
+        self.assertEqual(b"x", compression.decode(b"x", "identity"))
+
+
+class _Handler(SOAPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def read_body(self):
+        self.server.encodings.append(self.headers.get("content-encoding"))
+        return SOAPRequestHandler.read_body(self)
+
+
+class ClientServerTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        def Echo(value):
+            return {"value": value * 100}
+
+        cls.server = HTTPServer(("127.0.0.1", 0), _Handler)
+        cls.server.modules = (types.SimpleNamespace(Echo=Echo),)
+        cls.server.docstyle = False
+        cls.server.nsdict = {}
+        cls.server.typesmodule = None
+        cls.server.rpc = True
+        cls.server.encodings = []
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.url = "http://127.0.0.1:%d/echo" % cls.server.server_port
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def rpc(self, b, value):
+        return b.RPC(None, "Echo", {"value": value}, replytype=RPCResponse).value
+
+    def test_reply_is_compressed_when_accepted(self):
+        b = Binding(url=self.url)
+        self.assertEqual("0123456789" * 100, self.rpc(b, "0123456789"))
+        self.assertEqual("gzip", b.reply_headers["Content-Encoding"])
+        self.assertEqual("ab" * 100, self.rpc(b, "ab"))
+        self.assertIsNone(b.reply_headers["Content-Encoding"])
+
+        b.accept_encoding = None
+        self.assertEqual("0123456789" * 100, self.rpc(b, "0123456789"))
+        self.assertIsNone(b.reply_headers["Content-Encoding"])
+
+    def test_request_compression(self):
+        del self.server.encodings[:]
+        b = Binding(url=self.url)
+        self.rpc(b, "a")
+        b.compress_min_size = 0
+        self.rpc(b, "a")
+        with b.call("Echo", {"value": "c"}, RPCResponse) as rsp:
+            self.assertEqual("c" * 100, rsp.reply.value)
+        self.assertEqual([None, "gzip", "gzip"], self.server.encodings)
+
+
+class WSGITests(unittest.TestCase):
+    def call(self, body, **env):
+        environ = {"REQUEST_METHOD": "POST", "wsgi.input": io.BytesIO(body),
+                   "CONTENT_LENGTH": str(len(body)), "CONTENT_TYPE": "text/xml"}
+        environ.update(env)
+        setup_testing_defaults(environ)
+        status = []
+        data = b"".join(SOAPApplication(EchoService())(
+            environ, lambda s, h, *a: status.append(dict(h))))
+        return status[0], data
+
+    def test_gzip_request_and_reply(self):
+        body = compression.compress(request_body("xy" * 10), "gzip")
+        headers, data = self.call(body, HTTP_CONTENT_ENCODING="gzip",
+                                  HTTP_ACCEPT_ENCODING="deflate")
+        self.assertEqual("deflate", headers["Content-Encoding"])
+        self.assertEqual(str(len(data)), headers["Content-Length"])
+        self.assertIn(b"xy" * 1000, compression.decode(data, "deflate"))
+
+        headers, data = self.call(request_body("xy" * 10))
+        self.assertNotIn("Content-Encoding", headers)
+        self.assertIn(b"xy" * 1000, data)
+
+
+class ASGITests(unittest.TestCase):
+    def test_gzip_request_and_reply(self):
+        app = ASGIApplication(resource=EchoService())
+        body = compression.compress(request_body("xy" * 10), "gzip")
+        pieces = [body[i:i + 10] for i in range(0, len(body), 10)]
+        sent = []
+
+        async def receive():
+            piece = pieces.pop(0)
+            return {"type": "http.request", "body": piece, "more_body": bool(pieces)}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "POST", "path": "/", "headers": [
+            (b"content-type", b"text/xml"), (b"content-encoding", b"gzip"),
+            (b"accept-encoding", b"gzip")]}
+        try:
+            asyncio.run(app(scope, receive, send))
+        finally:
+            app.close()
+        self.assertEqual(200, sent[0]["status"])
+        headers = dict(sent[0]["headers"])
+        self.assertEqual(b"gzip", headers[b"content-encoding"])
+        data = b"".join(m["body"] for m in sent[1:])
+        self.assertIn(b"xy" * 1000, compression.decode(data, "gzip"))
+
+
+def makeTestSuite():
+    suite = unittest.TestSuite()
+    for case in (CodingTests, ClientServerTests, WSGITests, ASGITests):
+        suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(case))
+    return suite
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+import hashlib
+import re
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ZSI import TC
+from ZSI.auth import AUTH
+from ZSI.client import Binding
+from ZSI.digest_auth import DigestAuthSession
+
+REALM, USER, PASSWORD = "soap", "ada", "secret"
+REPLY = b"""<SOAP-ENV:Envelope
+    xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/">
+<SOAP-ENV:Body><EchoResponse><value>ok</value></EchoResponse></SOAP-ENV:Body>
+</SOAP-ENV:Envelope>"""
+
+
+class EchoResponse:
+    pass
+
+
+EchoResponse.typecode = TC.Struct(EchoResponse, [TC.String("value")], "EchoResponse")
+
+
+def _md5(value):
+    return hashlib.md5(value.encode("utf-8")).hexdigest()
+
+
+class _DigestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def authorized(self):
+        """None if the Authorization header is valid, else the value of
+        the stale parameter of the challenge to send.
+        """
+        server = self.server
+        header = self.headers.get("Authorization", "")
+        params = dict(re.findall(r'(\w+)="?([^",]*)"?', header))
+        server.authorizations.append(params)
+        if not header.startswith("Digest ") or params.get("username") != USER:
+            return "false"
+        ha1 = _md5("%s:%s:%s" % (USER, REALM, server.password))
+        ha2 = _md5("POST:%s" % params["uri"])
+        expected = _md5(":".join((ha1, params["nonce"], params["nc"], params["cnonce"],
+                                  params["qop"], ha2)))
+        if params["response"] != expected or params.get("opaque") != "xyz":
+            return "false"
+        if params["nonce"] != server.nonce:
+            return "true"
+        nc = int(params["nc"], 16)
+        if nc <= server.last_nc:
+            return "false"
+        server.last_nc = nc
+        return None
+
+    def challenge(self, stale):
+        self.send_response(401)
+        self.send_header("WWW-Authenticate",
+                         'Digest realm="%s", qop="auth,auth-int", nonce="%s", '
+                         'opaque="xyz", stale=%s' % (REALM, self.server.nonce, stale))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def handle_expect_100(self):
+        stale = self.authorized()
+        if stale is None:
+            return BaseHTTPRequestHandler.handle_expect_100(self)
+        self.server.rejected_early += 1
+        self.close_connection = True
+        self.challenge(stale)
+        return False
+
+    def do_POST(self):
+        self.server.expects.append(self.headers.get("Expect"))
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.body_bytes += len(body)
+        # handle_expect_100 has checked the Authorization already.
+        stale = None if self.headers.get("Expect") else self.authorized()
+        if stale is not None:
+            return self.challenge(stale)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml")
+        self.send_header("Content-Length", str(len(REPLY)))
+        self.end_headers()
+        self.wfile.write(REPLY)
+
+
+class DigestAuthSessionTests(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _DigestHandler)
+        self.server.password = PASSWORD
+        self.server.nonce = "n1"
+        self.server.last_nc = 0
+        self.server.authorizations = []
+        self.server.body_bytes = 0
+        self.server.rejected_early = 0
+        self.server.expects = []
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = "http://127.0.0.1:%d/echo" % self.server.server_port
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def binding(self, **kw):
+        return Binding(url=self.url, auth=(AUTH.httpdigest, USER, PASSWORD), **kw)
+
+    def rpc(self, b, value="a"):
+        return b.RPC(None, "Echo", {"value": value}, replytype=EchoResponse).value
+
+    def test_challenge_is_answered_preemptively(self):
+        b = self.binding()
+        self.assertEqual("ok", self.rpc(b))
+        self.assertEqual(2, len(self.server.authorizations))
+        self.assertEqual("ok", self.rpc(b))
+        self.assertEqual("ok", self.rpc(b))
+        self.assertEqual(4, len(self.server.authorizations))
+        self.assertEqual(["00000001", "00000002", "00000003"],
+                         [a["nc"] for a in self.server.authorizations[1:]])
+
+    def test_stale_nonce_refetches_challenge(self):
+        b = self.binding()
+        self.rpc(b)
+        self.server.nonce, self.server.last_nc = "n2", 0
+        self.assertEqual("ok", self.rpc(b))
+        self.assertEqual(["n1", "n1", "n2"],
+                         [a.get("nonce") for a in self.server.authorizations[1:]])
+        self.assertEqual(1, b.digest_session.nc)
+
+    def test_call_and_clones_share_session(self):
+        b = self.binding()
+        with b.call("Echo", {"value": "a"}, EchoResponse) as rsp:
+            self.assertEqual("ok", rsp.reply.value)
+        other = b.clone()
+        self.assertIs(b.digest_session, other.digest_session)
+        with other.call("Echo", {"value": "b"}, EchoResponse) as rsp:
+            self.assertEqual("ok", rsp.reply.value)
+        self.assertEqual(3, len(self.server.authorizations))
+        self.assertEqual("00000002", self.server.authorizations[-1]["nc"])
+
+    def test_rejected_body_is_not_sent(self):
+        b = self.binding()
+        b.expect_continue_size = 0
+        self.assertEqual("ok", self.rpc(b, "x" * 1000))
+        self.assertEqual(1, self.server.rejected_early)
+        self.assertEqual(2, len(self.server.authorizations))
+        sent = self.server.body_bytes
+        self.assertGreater(sent, 1000)
+        self.assertLess(sent, 2000)
+
+        with b.call("Echo", {"value": "y" * 1000}, EchoResponse) as rsp:
+            self.assertEqual("ok", rsp.reply.value)
+        self.assertEqual(1, self.server.rejected_early)
+
+    def test_expect_is_opt_in(self):
+        b = self.binding()
+        self.assertEqual("ok", self.rpc(b, "x" * (100 * 1024)))
+        self.assertEqual([None, None], self.server.expects)
+        self.assertEqual(0, self.server.rejected_early)
+
+    def test_wrong_password(self):
+        self.server.password = "other"
+        self.assertRaises(RuntimeError, self.rpc, self.binding())
+        self.assertRaises(RuntimeError, self.binding().call, "Echo", {"value": "a"},
+                          EchoResponse)
+
+
+class SessionTests(unittest.TestCase):
+    def test_nextnonce_and_reset(self):
+        session = DigestAuthSession(USER, PASSWORD)
+        self.assertIsNone(session.authorization("POST", "/"))
+        self.assertTrue(session.challenge(
+            'Digest realm="r", qop="auth", nonce="a", stale=true'))
+        self.assertIn('nc=00000001', session.authorization("POST", "/"))
+        session.info('nextnonce="b", qop=auth')
+        self.assertIn('nonce="b"', session.authorization("POST", "/"))
+        self.assertEqual(1, session.nc)
+        session.reset()
+        self.assertIsNone(session.authorization("POST", "/"))
+        self.assertRaises(RuntimeError, session.challenge, 'Basic realm="r"')
+
+
+def makeTestSuite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(DigestAuthSessionTests))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(SessionTests))
+    return suite
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+import threading
+import types
+import unittest
+from http.server import HTTPServer
+from unittest import mock
+
+from ZSI import TC, ParsedSoap, ServiceContainer
+from ZSI.client import Binding
+from ZSI.dispatch import SOAPRequestHandler
+
+
+class EchoResponse:
+    pass
+
+
+EchoResponse.typecode = TC.Struct(EchoResponse, [TC.String("value")], "EchoResponse")
+REQUEST = b"""<SOAP-ENV:Envelope
+    xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/">
+<SOAP-ENV:Body><Echo><value>a</value></Echo></SOAP-ENV:Body>
+</SOAP-ENV:Envelope>"""
+
+
+class _Handler(SOAPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class DomReleaseTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.seen = []
+
+        def Echo(value):
+            cls.seen.append(value)
+            return {"value": value}
+
+        cls.server = HTTPServer(("127.0.0.1", 0), _Handler)
+        cls.server.modules = (types.SimpleNamespace(Echo=Echo),)
+        cls.server.docstyle = False
+        cls.server.nsdict = {}
+        cls.server.typesmodule = None
+        cls.server.rpc = True
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.url = "http://127.0.0.1:%d/echo" % cls.server.server_port
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_next_send_releases_previous_reply(self):
+        b = Binding(url=self.url)
+        b.release_dom = True
+        self.assertEqual("a", b.RPC(None, "Echo", {"value": "a"}, replytype=EchoResponse).value)
+        first = b.ps
+        dom = first.dom
+        self.assertEqual("b", b.RPC(None, "Echo", {"value": "b"}, replytype=EchoResponse).value)
+        self.assertIsNone(first.dom)
+        self.assertEqual([], list(dom.childNodes))
+        b.ReleaseReply()
+        self.assertIsNone(b.ps.dom)
+
+    def test_reply_dom_is_kept_by_default(self):
+        b = Binding(url=self.url)
+        b.RPC(None, "Echo", {"value": "a"}, replytype=EchoResponse)
+        first = b.ps
+        body = first.body_root
+        b.RPC(None, "Echo", {"value": "b"}, replytype=EchoResponse)
+        self.assertIsNotNone(first.dom)
+        self.assertEqual("a", body.firstChild.firstChild.nodeValue)
+        b.ReleaseReply()
+        self.assertIsNone(b.ps.dom)
+        self.assertIsNotNone(first.dom)
+
+    def test_call_response_context_manager(self):
+        with Binding(url=self.url).call("Echo", {"value": "c"}, EchoResponse) as rsp:
+            self.assertEqual("c", rsp.reply.value)
+            self.assertIsNotNone(rsp.ps.dom)
+        self.assertIsNone(rsp.ps.dom)
+
+
+class ServiceContainerCleanupTests(unittest.TestCase):
+    def test_failed_fault_still_releases_request(self):
+        handler = ServiceContainer.SOAPRequestHandler.__new__(
+            ServiceContainer.SOAPRequestHandler)
+        handler.headers = {"content-type": "text/xml"}
+        handler.path = "/echo"
+        handler.server = handler.connection = None
+        handler.read_body = lambda: REQUEST
+        handler.send_fault = mock.Mock(side_effect=BrokenPipeError())
+        parsed = []
+
+        def parse(xml, **kw):
+            parsed.append(ParsedSoap(xml, **kw))
+            return parsed[-1]
+
+        with mock.patch.object(ServiceContainer, "ParsedSoap", parse), \
+                mock.patch.object(ServiceContainer, "_Dispatch",
+                                  side_effect=ValueError("boom")):
+            self.assertRaises(BrokenPipeError, handler.do_POST)
+        self.assertIsNone(parsed[0].dom)
+        self.assertNotIn(threading.get_ident(), ServiceContainer._contexts)
+
+
+def makeTestSuite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(DomReleaseTests))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(
+        ServiceContainerCleanupTests))
+    return suite
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")
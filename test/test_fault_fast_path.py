@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+import sys
+import unittest
+
+from ZSI import ParsedSoap, ParseException
+from ZSI.fault import Fault, FaultFromActor, FaultFromException, FaultFromFaultMessage, \
+    FaultFromNotUnderstood, FaultFromZSIException, GetTracebackRate, SetTracebackRate, \
+    ZSIFaultDetail, ZSIParseFaultDetail
+
+
+def raised(ex):
+    try:
+        raise ex
+    except Exception:
+        return sys.exc_info()
+
+
+def slow(fault):
+    # Any SoapWriter option takes the DOM path.
+    return fault.AsSOAP(header=True)
+
+
+class FaultFastPathTests(unittest.TestCase):
+    def setUp(self):
+        self.rate = GetTracebackRate()[:2]
+
+    def tearDown(self):
+        SetTracebackRate(*self.rate)
+
+    def test_template_matches_soap_writer_output(self):
+        SetTracebackRate(None)
+        exc_type, exc, tb = raised(ValueError("a < b & c\r"))
+        faults = [
+            FaultFromException(exc, False, tb, request_id="r1"),
+            FaultFromException(exc, True, None, request_id="r2"),
+            FaultFromZSIException(ParseException("bad <x>", 0), request_id="r3",
+                                  context_summary="at line 1"),
+            FaultFromNotUnderstood("urn:x", "name"),
+            FaultFromActor("urn:actor"),
+            Fault(Fault.Server, "Not authorized"),
+            Fault(Fault.Client, "empty trace", detail=ZSIFaultDetail("s", "")),
+        ]
+        for fault in faults:
+            self.assertEqual(slow(fault), fault.AsSOAP())
+
+    def test_parse_fault_detail_is_structured(self):
+        fault = FaultFromZSIException(ParseException("bad <x>", 0), request_id="r4")
+        parsed = FaultFromFaultMessage(ParsedSoap(fault.AsSOAP()))
+        self.assertEqual("Unparseable message", parsed.string)
+        self.assertIsInstance(parsed.detail[0], ZSIParseFaultDetail)
+        self.assertEqual("bad <x>", parsed.detail[0].string)
+
+    def test_other_details_use_the_soap_writer(self):
+        fault = Fault(Fault.Client, "custom", actor="urn:me", detail=ZSIFaultDetail("x"))
+        self.assertEqual(slow(fault), fault.AsSOAP())
+        self.assertIn("urn:me", fault.AsSOAP())
+
+    def test_traceback_rendering_is_rate_limited(self):
+        SetTracebackRate(0.001, burst=2)
+        faults = []
+        for _ in range(4):
+            exc_type, exc, tb = raised(KeyError("k"))
+            faults.append(FaultFromException(exc, False, tb))
+        traces = [f.detail[0].trace for f in faults]
+        self.assertEqual(2, sum(t is not None for t in traces))
+        self.assertIn("KeyError", faults[-1].context_summary)
+        self.assertEqual(2, GetTracebackRate()[2])
+
+        SetTracebackRate(0)
+        exc_type, exc, tb = raised(KeyError("k"))
+        self.assertIsNone(FaultFromException(exc, False, tb).detail[0].trace)
+
+
+def makeTestSuite():
+    return unittest.defaultTestLoader.loadTestsFromTestCase(FaultFastPathTests)
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")
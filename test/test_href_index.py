@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+import unittest
+
+from ZSI import ParsedSoap, TC, EvaluateException
+
+ENVELOPE = """<SOAP-ENV:Envelope
+    xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/"
+    xmlns:SOAP-ENC="http://schemas.xmlsoap.org/soap/encoding/"
+    xmlns:xsd="http://www.w3.org/2001/XMLSchema"
+    SOAP-ENV:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/">
+<SOAP-ENV:Body>
+  <Pair><first href="#p1"/><second href="#p1"/><names href="#a1"/><more href="#a1"/></Pair>
+  <Point id="p1" SOAP-ENC:root="0"><x>1</x><y>2</y></Point>
+  <Names id="a1" SOAP-ENC:root="0" SOAP-ENC:arrayType="xsd:string[2]">
+    <item>a</item><item>b</item>
+  </Names>
+</SOAP-ENV:Body>
+</SOAP-ENV:Envelope>"""
+
+
+class Point:
+    pass
+
+
+class Pair:
+    pass
+
+
+_anonymous = TC.Struct(Point, [TC.Integer("x"), TC.Integer("y")])
+_names = TC.Array("xsd:string", TC.String(), "names")
+_pair = TC.Struct(
+    Pair,
+    [
+        TC.Struct(Point, [TC.Integer("x"), TC.Integer("y")], "first"),
+        TC.Struct(Point, [TC.Integer("x"), TC.Integer("y")], "second"),
+        _names,
+        TC.Array("xsd:string", TC.String(), "more"),
+    ],
+    "Pair",
+)
+
+
+class HREFIndexTests(unittest.TestCase):
+    def test_index_built_in_one_pass(self):
+        ps = ParsedSoap(ENVELOPE)
+        self.assertEqual({}, ps.id_cache)
+        e = ps.FindLocalHREF("#a1", ps.body_root)
+        self.assertEqual("Names", e.localName)
+        self.assertEqual(["a1", "p1"], sorted(ps.id_cache))
+        self.assertRaises(EvaluateException, ps.FindLocalHREF, "#zz", ps.body_root)
+
+    def test_shared_reference_parsed_once(self):
+        first = _pair.ofwhat[0]
+        ps = ParsedSoap(ENVELOPE)
+        pair = ps.Parse(_pair)
+        self.assertEqual((1, 2), (pair.first.x, pair.first.y))
+        self.assertEqual(["a", "b"], pair.names)
+        self.assertEqual(["a", "b"], pair.more)
+        self.assertIs(pair.first, ps.href_objects[("#p1", first)])
+        self.assertIs(pair.names, ps.href_objects[("#a1", _names)])
+
+    def test_same_typecode_keeps_identity(self):
+        ps = ParsedSoap(ENVELOPE)
+        e1 = ps.body_root.firstChild
+        e2 = e1.nextSibling
+        self.assertIs(_anonymous.parse(e1, ps), _anonymous.parse(e2, ps))
+
+
+def makeTestSuite():
+    return unittest.defaultTestLoader.loadTestsFromTestCase(HREFIndexTests)
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")
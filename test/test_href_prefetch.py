@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+import threading
+import unittest
+from unittest import mock
+
+from ZSI import TC, ParsedSoap
+from ZSI.resolvers import NetworkResolver, ResolverCache
+
+MESSAGE = """<SOAP-ENV:Envelope
+    xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/">
+<SOAP-ENV:Body><parts>
+<a href="http://files.example/a"/><b href="http://files.example/b"/>
+<c href="http://files.example/c"/><e href="#local"/>
+<f href="http://files.example/a"/></parts>
+<x id="local">local</x><d href="http://other.example/d"/></SOAP-ENV:Body>
+</SOAP-ENV:Envelope>"""
+
+
+class _Info:
+    def get(self, name, default=None):
+        return default
+
+    def get_content_charset(self):
+        return "utf-8"
+
+
+class _Source:
+    def __init__(self, uri):
+        self.uri = uri
+
+    def info(self):
+        return _Info()
+
+    def read(self):
+        return self.uri.rsplit("/", 1)[1].encode()
+
+
+class Parts:
+    pass
+
+
+Parts.typecode = TC.Struct(Parts, [TC.String(n) for n in "abcef"], "parts")
+
+
+class PrefetchTests(unittest.TestCase):
+    def setUp(self):
+        self.resolver = NetworkResolver(["http://files.example/"], cache=ResolverCache())
+        self.fetched = []
+        self.barrier = threading.Barrier(3, timeout=5)
+
+    def urlopen(self, uri, **kw):
+        # Only completes when all three fetches run at the same time.
+        self.barrier.wait()
+        self.fetched.append(uri)
+        return _Source(uri)
+
+    def test_external_hrefs(self):
+        ps = ParsedSoap(MESSAGE)
+        self.assertEqual(["http://files.example/a", "http://files.example/b",
+                          "http://files.example/c", "http://other.example/d"],
+                         ps.ExternalHREFs())
+
+    def test_prefetch_fetches_allowed_hrefs_concurrently(self):
+        with mock.patch("urllib.request.urlopen", self.urlopen):
+            ps = ParsedSoap(MESSAGE, resolver=self.resolver.Resolve, prefetch=True)
+            self.assertEqual(3, len(self.fetched))
+            parts = ps.Parse(Parts.typecode)
+        self.assertEqual(3, len(self.fetched))
+        self.assertEqual([b"a", b"b", b"c", "local", b"a"],
+                         [getattr(parts, n) for n in "abcef"])
+        self.assertEqual([], self.resolver.Prefetch(ps))
+
+    def test_failed_prefetch_is_reported_by_parse(self):
+        def urlopen(uri, **kw):
+            raise OSError("unreachable")
+
+        with mock.patch("urllib.request.urlopen", urlopen):
+            ps = ParsedSoap(MESSAGE, resolver=self.resolver.Resolve, prefetch=2)
+            self.assertRaises(Exception, ps.Parse, Parts.typecode)
+
+    def test_without_prefetch_nothing_is_fetched_up_front(self):
+        with mock.patch("urllib.request.urlopen", self.urlopen):
+            ParsedSoap(MESSAGE, resolver=self.resolver.Resolve)
+        self.assertEqual([], self.fetched)
+
+
+def makeTestSuite():
+    return unittest.defaultTestLoader.loadTestsFromTestCase(PrefetchTests)
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")
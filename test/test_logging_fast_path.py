@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+import io
+import unittest
+
+from ZSI.wstools import logging
+
+
+def bound(method):
+    return getattr(method, "__func__", method)
+
+
+class LoggingFastPathTests(unittest.TestCase):
+    def setUp(self):
+        self.level = logging.getLevel()
+        self.fast = logging.getFastPath()
+        logging.setLevel(0)
+
+    def tearDown(self):
+        logging.setLevel(self.level)
+        logging.setFastPath(self.fast)
+
+    def test_disabled_calls_are_rebound_to_no_ops(self):
+        out = io.StringIO()
+        logger = logging.BasicLogger("fast", out)
+        logging.setFastPath(True)
+        self.assertIs(logging._no_log, bound(logger.debug))
+        self.assertIs(logging._log_off, bound(logger.debugOn))
+        self.assertFalse(logger.debugOn())
+        logger.debug("hidden %s", 1)
+        self.assertEqual("", out.getvalue())
+
+        logging.setLevel(logging.DEBUG)
+        self.assertTrue(logger.debugOn())
+        logger.debug("shown %s", 2)
+        self.assertIn("shown 2", out.getvalue())
+
+        logging.setLevel(0)
+        self.assertIs(logging._no_log, bound(logger.debug))
+        logging.setFastPath(False)
+        self.assertEqual("BasicLogger.debug", logger.debug.__qualname__)
+        self.assertFalse(logger.debugOn())
+
+    def test_new_loggers_follow_the_fast_path(self):
+        logging.setFastPath(True)
+        logger = logging.getLogger("ZSI.test.fast")
+        self.assertIs(logging._no_log, bound(logger.debug))
+        self.assertIs(logging._no_log, bound(logger.warning))
+        logging.setLevel(logging.WARN)
+        self.assertIs(logging._no_log, bound(logger.debug))
+        self.assertIsNot(logging._no_log, bound(logger.warning))
+
+    def test_class_level_is_honoured(self):
+        logging.setFastPath(True)
+        logging.JSONLogger.setLevel(logging.DEBUG)
+        try:
+            self.assertIsNot(logging._no_log, bound(logging.JSONLogger("json").debug))
+            self.assertIs(logging._no_log, bound(logging.BasicLogger("basic").debug))
+        finally:
+            del logging.JSONLogger.level
+            logging.setLevel(0)
+        self.assertIs(logging._no_log, bound(logging.JSONLogger("json").debug))
+
+    def test_loggers_ignoring_the_level_keep_their_methods(self):
+        logging.setFastPath(True)
+        logger = logging.GridLogger("grid")
+        self.assertFalse(logger.debugOn())
+        self.assertIsNot(logging._no_log, bound(logger.debug))
+
+
+def makeTestSuite():
+    return unittest.defaultTestLoader.loadTestsFromTestCase(LoggingFastPathTests)
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")
@@ -3,20 +3,67 @@ import unittest
 from xml.dom import minidom
 
 import ZSI
+from ZSI import ParsedSoap, EvaluateException
+
+DOC = """<SOAP-ENV:Envelope
+    xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/"
+    xmlns:x="urn:test">
+<SOAP-ENV:Body><x:a><b><c xmlns:x="urn:inner" xmlns="urn:default"><d/></c></b></x:a>
+</SOAP-ENV:Body></SOAP-ENV:Envelope>"""
 
 
 class NamespaceLookupCacheTests(unittest.TestCase):
-    def test_resolve_prefix_populates_cache(self):
+    def test_resolve_prefix_walks_parents(self):
         doc = minidom.parseString('<a xmlns:x="urn:test"><b><x:c/></b></a>')
-        c = doc.getElementsByTagName("x:c")[0]
-        b = c.parentNode
-
-        # call twice to hit cache path on second lookup
-        ns1 = ZSI._resolve_prefix(b, "x")
-        ns2 = ZSI._resolve_prefix(b, "x")
-        self.assertEqual("urn:test", ns1)
-        self.assertEqual(ns1, ns2)
-        self.assertIn((id(b), "x"), ZSI._resolve_prefix.cache)
+        b = doc.getElementsByTagName("x:c")[0].parentNode
+        self.assertEqual("urn:test", ZSI._resolve_prefix(b, "x"))
+        self.assertFalse(hasattr(ZSI._resolve_prefix, "cache"))
+
+    def test_scopes_are_shared_until_redeclared(self):
+        ps = ParsedSoap(DOC)
+        a = ps.body_root
+        b = a.firstChild
+        c = b.firstChild
+        d = c.firstChild
+        self.assertIs(ps.GetElementNSScope(a), ps.GetElementNSScope(b))
+        self.assertIsNot(ps.GetElementNSScope(b), ps.GetElementNSScope(c))
+        self.assertIs(ps.GetElementNSScope(c), ps.GetElementNSScope(d))
+        self.assertEqual("urn:test", ps.ResolvePrefix(b, "x"))
+        self.assertEqual("urn:inner", ps.ResolvePrefix(d, "x"))
+        self.assertEqual("urn:default", ps.ResolvePrefix(d, None))
+        self.assertRaises(EvaluateException, ps.ResolvePrefix, b, None)
+        self.assertRaises(EvaluateException, ps.ResolvePrefix, b, "y")
+
+    def test_scope_is_read_only_and_dict_is_a_copy(self):
+        ps = ParsedSoap(DOC)
+        scope = ps.GetElementNSScope(ps.body_root)
+        with self.assertRaises(TypeError):
+            scope["y"] = "urn:y"
+        d = ps.GetElementNSdict(ps.body_root)
+        d["y"] = "urn:y"
+        self.assertNotIn("y", ps.GetElementNSScope(ps.body_root))
+
+    def test_element_added_after_indexing(self):
+        ps = ParsedSoap(DOC)
+        ps.GetElementNSScope(ps.body_root)
+        e = ps.dom.createElementNS("urn:new", "n:e")
+        e.setAttributeNS("http://www.w3.org/2000/xmlns/", "xmlns:n", "urn:new")
+        ps.body_root.appendChild(e)
+        self.assertEqual("urn:new", ps.ResolvePrefix(e, "n"))
+        self.assertEqual("urn:test", ps.ResolvePrefix(e, "x"))
+
+    def test_closed_message(self):
+        ps = ParsedSoap(DOC)
+        elt = ps.body_root
+        ps.close()
+        self.assertRaises(EvaluateException, ps.GetElementNSScope, elt)
+        self.assertRaises(EvaluateException, ps.ResolvePrefix, elt, "x")
+
+    def test_scopes_are_keyed_by_element(self):
+        ps = ParsedSoap(DOC)
+        ps.GetElementNSScope(ps.body_root)
+        self.assertIn(ps.body_root, ps.ns_scopes)
+        self.assertNotIn(id(ps.body_root), ps.ns_scopes)
 
 
 def makeTestSuite():
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+import threading
+import unittest
+
+from ZSI import TC, ParsedSoap, ParseException, SoapWriter
+from ZSI.pool import ParserPool, WriterPool
+
+
+class Person:
+    pass
+
+
+Person.typecode = TC.Struct(Person, [TC.String("name"), TC.Integer("age")], "person")
+
+
+def person(name, age):
+    p = Person()
+    p.name, p.age = name, age
+    return p
+
+
+MESSAGE = str(SoapWriter().serialize(person("ada", 36), Person.typecode))
+TRAILER = """<SOAP-ENV:Envelope
+    xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/">
+<SOAP-ENV:Body><person><name>bob</name><age>7</age></person></SOAP-ENV:Body>
+<t:extra xmlns:t="urn:t"/>
+</SOAP-ENV:Envelope>"""
+
+
+class ResetTests(unittest.TestCase):
+    def test_parsed_soap_reset_and_close(self):
+        ps = ParsedSoap(MESSAGE)
+        id_cache, reader = ps.id_cache, ps.reader
+        self.assertEqual("ada", ps.Parse(Person.typecode).name)
+        ps.reset(TRAILER, trailers=True)
+        self.assertIs(id_cache, ps.id_cache)
+        self.assertIs(reader, ps.reader)
+        self.assertEqual("bob", ps.Parse(Person.typecode).name)
+        self.assertEqual(1, len(ps.trailer_elements))
+        ps.reset(MESSAGE)
+        self.assertFalse(hasattr(ps, "trailer_elements"))
+        dom = ps.dom
+        ps.close()
+        self.assertIsNone(ps.dom)
+        self.assertEqual([], list(dom.childNodes))
+        ps.close()
+
+    def test_parsed_soap_context_manager_honours_keepdom(self):
+        with ParsedSoap(MESSAGE, keepdom=True) as ps:
+            dom = ps.dom
+        self.assertIsNone(ps.dom)
+        self.assertEqual(1, len(dom.childNodes))
+        with ParsedSoap(MESSAGE) as ps:
+            dom = ps.dom
+        self.assertEqual([], list(dom.childNodes))
+
+    def test_soap_writer_reset(self):
+        sw = SoapWriter(nsdict={"t": "urn:t"})
+        memo = sw.memo
+        first = str(sw.serialize(person("ada", 36), Person.typecode))
+        self.assertIn('xmlns:t="urn:t"', first)
+        sw.reset(nsdict={})
+        self.assertIs(memo, sw.memo)
+        self.assertEqual([], sw.memo)
+        self.assertFalse(sw.closed)
+        second = str(sw.serialize(person("ada", 36), Person.typecode))
+        self.assertEqual(first.replace(' xmlns:t="urn:t"', ""), second)
+        with sw:
+            pass
+        self.assertIsNone(sw.dom.node)
+
+
+class PoolTests(unittest.TestCase):
+    def test_writer_pool_reuses_per_thread(self):
+        pool = WriterPool(maxsize=1, nsdict={"t": "urn:t"})
+        with pool.lease() as sw:
+            self.assertIn('xmlns:t="urn:t"',
+                          str(sw.serialize(person("a", 1), Person.typecode)))
+        self.assertEqual(1, len(pool))
+        with pool.lease(nsdict={}) as again:
+            self.assertIs(sw, again)
+            self.assertNotIn('xmlns:t', str(again.serialize(person("b", 2), Person.typecode)))
+        with pool.lease() as again:
+            self.assertEqual({"t": "urn:t"}, again.nsdict)
+            self.assertIsNot(again, pool.acquire())
+        self.assertEqual(1, len(pool))
+
+        seen = []
+        worker = threading.Thread(target=lambda: seen.append(len(pool)))
+        worker.start()
+        worker.join()
+        self.assertEqual([0], seen)
+
+    def test_parser_pool(self):
+        pool = ParserPool(maxsize=2)
+        with pool.lease(MESSAGE) as ps:
+            self.assertEqual("ada", ps.Parse(Person.typecode).name)
+        with pool.lease(MESSAGE) as again:
+            self.assertIs(ps, again)
+        self.assertRaises(ParseException, pool.acquire, TRAILER)
+        self.assertEqual(1, len(pool))
+        with pool.lease(TRAILER, trailers=True) as again:
+            self.assertIs(ps, again)
+            self.assertEqual("bob", again.Parse(Person.typecode).name)
+
+
+def makeTestSuite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(ResetTests))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(PoolTests))
+    return suite
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+import unittest
+
+from ZSI import TC, ParsedSoap
+from ZSI.generate.pyclass import pyclass_type
+
+NS = "urn:build"
+DOC = """<SOAP-ENV:Envelope
+    xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/" xmlns:b="urn:build">
+<SOAP-ENV:Body><b:Order>
+  <b:item>a</b:item><b:id>7</b:id><b:item>b</b:item><b:item>c</b:item>
+</b:Order></SOAP-ENV:Body>
+</SOAP-ENV:Envelope>"""
+
+
+def order_typecode(pyclass=None):
+    return TC.ComplexType(pyclass, [
+        TC.Integer((NS, "id"), aname="_id"),
+        TC.String((NS, "item"), aname="_item", maxOccurs="unbounded"),
+        TC.String((NS, "note"), aname="_note", minOccurs=0),
+    ], (NS, "Order"))
+
+
+def parse(tc):
+    return ParsedSoap(DOC).Parse(tc)
+
+
+class ConstructionTests(unittest.TestCase):
+    def test_generated_class_builds_in_one_step(self):
+        tc = order_typecode()
+        calls = []
+
+        class Holder(metaclass=pyclass_type):
+            typecode = tc
+
+            def __init__(self):
+                self._id = None
+                self._item = None
+                self._note = None
+
+        generated = Holder._from_parsed
+
+        def _from_parsed(values, pyobj=None):
+            calls.append(list(values))
+            return generated(values, pyobj)
+        Holder._from_parsed = _from_parsed
+        tc.pyclass = Holder
+
+        pyobj = parse(tc)
+        self.assertIsInstance(pyobj, Holder)
+        self.assertEqual(7, pyobj.Id)
+        self.assertEqual(["a", "b", "c"], pyobj.Item)
+        self.assertIsNone(pyobj.Note)
+        self.assertEqual(1, len(calls))
+        self.assertEqual([7, ["a", "b", "c"]], calls[0][:2])
+
+        made = Holder._from_parsed(calls[0])
+        self.assertIsInstance(made, Holder)
+        self.assertEqual(["a", "b", "c"], made.get_element_item())
+
+    def test_plain_and_dict_holders(self):
+        class Order:
+            pass
+
+        pyobj = parse(order_typecode(Order))
+        self.assertEqual({"_id": 7, "_item": ["a", "b", "c"]}, pyobj.__dict__)
+        self.assertEqual({"_id": 7, "_item": ["a", "b", "c"]}, parse(order_typecode()))
+
+    def test_descriptors_and_slots_see_each_value(self):
+        class Checked:
+            seen = []
+
+            @property
+            def _id(self):
+                return self.__dict__["id"]
+
+            @_id.setter
+            def _id(self, value):
+                self.seen.append(value)
+                self.__dict__["id"] = value
+
+        pyobj = parse(order_typecode(Checked))
+        self.assertEqual([7], Checked.seen)
+        self.assertEqual(7, pyobj._id)
+        self.assertEqual(["a", "b", "c"], pyobj._item)
+
+        class Slotted:
+            __slots__ = ("_id", "_item", "_note")
+
+        pyobj = parse(order_typecode(Slotted))
+        self.assertEqual((7, ["a", "b", "c"]), (pyobj._id, pyobj._item))
+        self.assertFalse(hasattr(pyobj, "_note"))
+
+
+def makeTestSuite():
+    return unittest.defaultTestLoader.loadTestsFromTestCase(ConstructionTests)
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+import unittest
+
+from ZSI import ParsedSoap, ParseException
+
+ENVELOPE = """<SOAP-ENV:Envelope
+    xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/"
+    xmlns:h="urn:headers">
+<SOAP-ENV:Header>
+  <h:Auth SOAP-ENV:mustUnderstand="1">secret</h:Auth>
+  <h:Trace SOAP-ENV:actor="urn:tracer">on</h:Trace>
+  <h:Hop SOAP-ENV:actor="http://schemas.xmlsoap.org/soap/actor/next">1</h:Hop>
+  <h:Trace>again</h:Trace>
+</SOAP-ENV:Header>
+<SOAP-ENV:Body><h:Op>%s</h:Op></SOAP-ENV:Body>
+</SOAP-ENV:Envelope>"""
+
+
+class ParsedSoapHeaderIndexTests(unittest.TestCase):
+    def test_must_understand_and_actors(self):
+        ps = ParsedSoap(ENVELOPE % "")
+        self.assertEqual([("urn:headers", "Auth")], ps.WhatMustIUnderstand())
+        self.assertEqual(["urn:tracer"], ps.WhatActorsArePresent())
+
+    def test_my_header_elements_keep_document_order(self):
+        ps = ParsedSoap(ENVELOPE % "")
+        mine = [E.localName for E in ps.GetMyHeaderElements()]
+        self.assertEqual(["Auth", "Hop", "Trace"], mine)
+        mine = [E.localName for E in ps.GetMyHeaderElements(["urn:tracer"])]
+        self.assertEqual(["Auth", "Trace", "Hop", "Trace"], mine)
+
+    def test_index_is_built_once(self):
+        ps = ParsedSoap(ENVELOPE % "")
+        index = ps._get_header_index()
+        ps.WhatMustIUnderstand()
+        self.assertIs(index, ps._get_header_index())
+        self.assertEqual(2, len(index.by_qname[("urn:headers", "Trace")]))
+
+    def test_untrusted_checks_body_eagerly(self):
+        self.assertRaises(ParseException, ParsedSoap, ENVELOPE % "<?pi x?>")
+
+    def test_trusted_checks_body_on_access(self):
+        ps = ParsedSoap(ENVELOPE % "<?pi x?>", trusted=True)
+        self.assertEqual(["urn:tracer"], ps.WhatActorsArePresent())
+        self.assertRaises(ParseException, ps.Parse, object())
+
+
+def makeTestSuite():
+    return unittest.defaultTestLoader.loadTestsFromTestCase(ParsedSoapHeaderIndexTests)
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")
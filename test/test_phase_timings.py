@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+import http.client
+import threading
+import types
+import unittest
+from http.server import HTTPServer
+
+from ZSI import TC
+from ZSI.client import Binding
+from ZSI.diagnostics import PhaseTimings, accept_request_id
+from ZSI.dispatch import SOAPRequestHandler
+
+
+class EchoResponse:
+    pass
+
+
+EchoResponse.typecode = TC.Struct(EchoResponse, [TC.String("value")], "EchoResponse")
+
+REQUEST = """<SOAP-ENV:Envelope
+    xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/">
+<SOAP-ENV:Body><Echo><value>hi</value></Echo></SOAP-ENV:Body>
+</SOAP-ENV:Envelope>"""
+
+
+class _Handler(SOAPRequestHandler):
+    server_timing = True
+
+    def log_message(self, *args):
+        pass
+
+
+class PhaseTimingsTests(unittest.TestCase):
+    def test_marks_accumulate_in_order(self):
+        t = PhaseTimings("abc")
+        t.mark("serialize")
+        t.mark("send")
+        t.mark("serialize")
+        self.assertEqual("abc", t.request_id)
+        self.assertEqual(["serialize", "send"], list(t))
+        self.assertAlmostEqual(t.total, sum(t.values()))
+        with self.assertRaises(TypeError):
+            t["send"] = 1.0
+        data = t.as_dict()
+        self.assertEqual("abc", data["request_id"])
+        self.assertEqual(["serialize", "send"], list(data["phases_ms"]))
+
+    def test_server_timing_header(self):
+        t = PhaseTimings()
+        t.mark("parse")
+        t.mark("dispatch")
+        header = t.server_timing_header()
+        self.assertRegex(header, r"^parse;dur=\d+\.\d{3}, dispatch;dur=\d+\.\d{3}$")
+
+    def test_accept_request_id(self):
+        self.assertEqual("req-1.2_3", accept_request_id("req-1.2_3"))
+        self.assertIsNone(accept_request_id(None))
+        self.assertIsNone(accept_request_id("a b"))
+        self.assertIsNone(accept_request_id("x" * 65))
+
+
+class RequestTimingTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(("127.0.0.1", 0), _Handler)
+        cls.server.modules = (types.SimpleNamespace(Echo=lambda value: {"value": value}),)
+        cls.server.docstyle = False
+        cls.server.nsdict = {}
+        cls.server.typesmodule = None
+        cls.server.rpc = True
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.url = "http://127.0.0.1:%d/echo" % cls.server.server_port
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_binding_records_client_phases(self):
+        b = Binding(url=self.url)
+        self.assertIsNone(b.timings)
+        reply = b.RPC(None, "Echo", {"value": "hi"}, replytype=EchoResponse)
+        self.assertEqual("hi", reply.value)
+        self.assertEqual(
+            ["serialize", "connect", "send", "wait", "receive", "parse", "typecode_parse"],
+            list(b.timings),
+        )
+        self.assertIsNone(b.clone().timings)
+
+    def test_call_records_client_phases(self):
+        rsp = Binding(url=self.url).call("Echo", {"value": "hi"}, EchoResponse)
+        self.assertEqual(
+            ["serialize", "connect", "send", "wait", "receive", "parse", "typecode_parse"],
+            list(rsp.timings),
+        )
+
+    def test_server_reports_phases(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.server.server_port)
+        conn.request("POST", "/echo", REQUEST.encode("utf-8"), {
+            "Content-Type": 'text/xml; charset="utf-8"',
+            "X-Request-Id": "req-42",
+        })
+        response = conn.getresponse()
+        body = response.read()
+        conn.close()
+        self.assertEqual(200, response.status)
+        self.assertEqual(len(body), int(response.getheader("Content-Length")))
+        self.assertEqual("req-42", response.getheader("X-Request-Id"))
+        phases = [p.split(";")[0] for p in response.getheader("Server-Timing").split(", ")]
+        self.assertEqual(["receive", "parse", "dispatch", "serialize"], phases)
+
+
+def makeTestSuite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(PhaseTimingsTests))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(RequestTimingTests))
+    return suite
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")
@@ -2,31 +2,37 @@
 import io
 import os
 import sys
+import threading
 import unittest
 from unittest import mock
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from ZSI import TC
-from ZSI.resolvers import ClearNetworkResolverCache, NetworkResolver
+from ZSI import TC, ParsedSoap
+from ZSI.resolvers import (ClearNetworkResolverCache, NetworkResolver,
+                           ResolverCache, cache_ttl)
 
 
 class _FakeInfo:
+    def __init__(self, headers=None):
+        self.headers = headers or {}
+
     def get(self, name, default=None):
         if name.lower() == "content-transfer-encoding":
             return "binary"
-        return default
+        return self.headers.get(name.lower(), default)
 
     def get_content_charset(self):
         return None
 
 
 class _FakeSource:
-    def __init__(self, body: bytes):
+    def __init__(self, body: bytes, headers=None):
         self._body = body
+        self._headers = headers
 
     def info(self):
-        return _FakeInfo()
+        return _FakeInfo(self._headers)
 
     def read(self):
         return self._body
@@ -57,6 +63,119 @@ class ResolverCacheTests(unittest.TestCase):
         self.assertEqual(a, b)
         self.assertEqual(opener.call_count, 1)
 
+    def test_resolver_honours_cache_headers(self):
+        resolver = NetworkResolver(["urn:", "https://example.internal/"], cache=ResolverCache())
+        uri = "https://example.internal/volatile"
+        opener = mock.Mock(return_value=_FakeSource(b"abc", {"cache-control": "no-store"}))
+        with mock.patch("urllib.request.urlopen", opener):
+            resolver.Opaque(uri, TC.Any(), _FakePS())
+            resolver.Opaque(uri, TC.Any(), _FakePS())
+        self.assertEqual(opener.call_count, 2)
+        self.assertEqual(0, resolver.cache.stats()["entries"])
+
+    def test_xml_returns_copies_of_cached_document(self):
+        resolver = NetworkResolver(["urn:", "https://example.internal/"], cache=ResolverCache())
+        ps = ParsedSoap("""<SOAP-ENV:Envelope
+            xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/">
+            <SOAP-ENV:Body/></SOAP-ENV:Envelope>""")
+        opener = mock.Mock(return_value=_FakeSource(b"<a><b>1</b></a>"))
+        with mock.patch("urllib.request.urlopen", opener):
+            first = resolver.XML("urn:x", TC.XML(), ps)
+            first.removeChild(first.firstChild)
+            second = resolver.XML("urn:x", TC.XML(), ps)
+        self.assertEqual(opener.call_count, 1)
+        self.assertEqual("a", second.nodeName)
+        self.assertEqual("b", second.firstChild.nodeName)
+        self.assertIsNot(first, second)
+        imported = ps.dom.importNode(second, True)
+        self.assertEqual("1", imported.firstChild.firstChild.data)
+
+    def test_xml_entries_are_charged_for_the_dom(self):
+        resolver = NetworkResolver(["urn:"], cache=ResolverCache(max_bytes=256 * 1024))
+        ps = ParsedSoap("""<SOAP-ENV:Envelope
+            xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/">
+            <SOAP-ENV:Body/></SOAP-ENV:Envelope>""")
+        item = b"<b c='1'>x</b>"
+        body = b"<a>" + item * 40 + b"</a>"
+        opener = mock.Mock(return_value=_FakeSource(body))
+        with mock.patch("urllib.request.urlopen", opener):
+            resolver.XML("urn:x", TC.XML(), ps)
+        stats = resolver.cache.stats()
+        self.assertEqual(2, stats["entries"])
+        self.assertGreater(stats["bytes"] - len(body), 10 * len(body))
+
+        opener = mock.Mock(return_value=_FakeSource(b"<a>" + item * 800 + b"</a>"))
+        with mock.patch("urllib.request.urlopen", opener):
+            self.assertEqual("a", resolver.XML("urn:y", TC.XML(), ps).nodeName)
+        self.assertLessEqual(resolver.cache.stats()["bytes"], 256 * 1024)
+
+    def test_concurrent_misses_fetch_once(self):
+        cache = ResolverCache()
+        gate = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            gate.wait(5)
+            return "value", 5, None
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_fetch("k", fetch)))
+                   for _ in range(50)]
+        for t in threads:
+            t.start()
+        while cache.stats()["misses"] + cache.stats()["coalesced"] < 50:
+            threading.Event().wait(0.001)
+        gate.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(1, len(calls))
+        self.assertEqual(["value"] * 50, results)
+        stats = cache.stats()
+        self.assertEqual((1, 49), (stats["misses"], stats["coalesced"]))
+
+    def test_failed_fetch_is_raised_to_every_waiter_and_not_cached(self):
+        cache = ResolverCache()
+
+        def fetch():
+            raise OSError("down")
+
+        self.assertRaises(OSError, cache.get_or_fetch, "k", fetch)
+        self.assertEqual("ok", cache.get_or_fetch("k", lambda: ("ok", 2, None)))
+
+    def test_byte_bound_evicts_least_recently_used(self):
+        cache = ResolverCache(max_bytes=10)
+        cache.put("a", "a", 4)
+        cache.put("b", "b", 4)
+        self.assertEqual("a", cache.get("a"))
+        cache.put("c", "c", 4)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual("a", cache.get("a"))
+        self.assertFalse(cache.put("huge", "x", 11))
+        stats = cache.stats()
+        self.assertEqual((2, 8, 1), (stats["entries"], stats["bytes"], stats["evictions"]))
+
+    def test_entries_expire(self):
+        now = [100.0]
+        cache = ResolverCache(default_ttl=60, max_ttl=3600, clock=lambda: now[0])
+        cache.put("default", 1, 1)
+        cache.put("long", 2, 1, ttl=86400)
+        now[0] += 61
+        self.assertIsNone(cache.get("default"))
+        self.assertEqual(2, cache.get("long"))
+        now[0] += 3600
+        self.assertNotIn("long", cache)
+        self.assertEqual(2, cache.stats()["expirations"])
+
+    def test_cache_ttl_from_headers(self):
+        self.assertIsNone(cache_ttl({}))
+        self.assertEqual(300, cache_ttl({"cache-control": "public, max-age=300"}))
+        self.assertEqual(0, cache_ttl({"cache-control": "no-cache"}))
+        self.assertEqual(120, cache_ttl({
+            "date": "Mon, 19 Oct 2026 10:00:00 GMT",
+            "expires": "Mon, 19 Oct 2026 10:02:00 GMT"}))
+        self.assertEqual(0, cache_ttl({"expires": "0"}))
+
 
 def makeTestSuite():
     return unittest.defaultTestLoader.loadTestsFromTestCase(ResolverCacheTests)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+import io
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from ZSI import TC, compression
+from ZSI.client import Binding
+from ZSI.parse import IncrementalReader
+
+ITEMS = 2000
+REPLY = ("""<SOAP-ENV:Envelope
+    xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/">
+<SOAP-ENV:Body><EchoResponse><value>%s</value></EchoResponse></SOAP-ENV:Body>
+</SOAP-ENV:Envelope>""" % ("été;" * ITEMS)).encode("utf-8")
+
+
+class EchoResponse:
+    pass
+
+
+EchoResponse.typecode = TC.Struct(EchoResponse, [TC.String("value")], "EchoResponse")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        server = self.server
+        body = REPLY
+        self.send_response(200)
+        self.send_header("Content-Type", server.content_type)
+        if server.gzip and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = compression.compress(body, "gzip")
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        half = len(body) // 2
+        self.wfile.write(body[:half])
+        self.wfile.flush()
+        # The rest only follows once the client has started parsing, or
+        # after a while if it waits for the whole body first.
+        server.overlapped.append(server.parsing.wait(2))
+        self.wfile.write(body[half:])
+
+
+class _Reader(IncrementalReader):
+    feeds = []
+    parsing = None
+
+    def feed(self, data):
+        self.feeds.append(len(data))
+        if self.parsing is not None:
+            self.parsing.set()
+        IncrementalReader.feed(self, data)
+
+
+class StreamingReceiveTests(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.content_type = "text/xml"
+        self.server.gzip = False
+        self.server.parsing = threading.Event()
+        self.server.overlapped = []
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = "http://127.0.0.1:%d/echo" % self.server.server_port
+        _Reader.feeds = []
+        _Reader.parsing = self.server.parsing
+        patcher = mock.patch("ZSI.client.IncrementalReader", _Reader)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def rpc(self, b):
+        return b.RPC(None, "Echo", {"value": "a"}, replytype=EchoResponse).value
+
+    def test_reply_is_parsed_while_it_arrives(self):
+        trace = io.StringIO()
+        b = Binding(url=self.url, stream=True, tracefile=trace)
+        b.stream_block_size = 1024
+        self.assertEqual("été;" * ITEMS, self.rpc(b))
+        self.assertEqual([True], self.server.overlapped)
+        self.assertGreater(len(_Reader.feeds), 2)
+        self.assertEqual(len(REPLY), sum(_Reader.feeds))
+        self.assertIsNone(b.data)
+        self.assertEqual(["serialize", "connect", "send", "wait", "receive", "parse",
+                          "typecode_parse"], list(b.timings))
+        self.assertIn(REPLY.decode("utf-8"), trace.getvalue())
+
+        self.server.parsing.clear()
+        self.assertEqual("été;" * ITEMS, self.rpc(b))
+        self.assertEqual([True, True], self.server.overlapped)
+
+    def test_compressed_reply_and_call(self):
+        self.server.gzip = True
+        b = Binding(url=self.url, stream=True)
+        with b.call("Echo", {"value": "a"}, EchoResponse) as rsp:
+            self.assertEqual("été;" * ITEMS, rsp.reply.value)
+        self.assertEqual([True], self.server.overlapped)
+        self.assertEqual(len(REPLY), sum(_Reader.feeds))
+
+    def test_buffered_by_default_and_for_other_content(self):
+        _Reader.parsing = None
+        self.server.parsing.set()
+        b = Binding(url=self.url)
+        self.rpc(b)
+        self.assertEqual(REPLY, b.data)
+        self.assertEqual([], _Reader.feeds)
+
+        self.server.content_type = "text/plain"
+        b = Binding(url=self.url, stream=True)
+        self.assertRaises(TypeError, self.rpc, b)
+        self.assertEqual(REPLY, b.data)
+        self.assertEqual([], _Reader.feeds)
+
+
+def makeTestSuite():
+    return unittest.defaultTestLoader.loadTestsFromTestCase(StreamingReceiveTests)
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")
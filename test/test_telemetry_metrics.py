@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+import json
+import unittest
+
+from ZSI import ParsedSoap, SoapWriter, TC, telemetry
+
+ENVELOPE = """<SOAP-ENV:Envelope
+    xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/">
+<SOAP-ENV:Body><value>hello</value></SOAP-ENV:Body>
+</SOAP-ENV:Envelope>"""
+
+
+class _Tracer:
+    def __init__(self):
+        self.names = []
+
+    def start_as_current_span(self, name):
+        self.names.append(name)
+        return _SpanManager()
+
+
+class _SpanManager:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+
+class TelemetryMetricsTests(unittest.TestCase):
+    def setUp(self):
+        telemetry.reset()
+        self.tracer = _Tracer()
+        telemetry.configure(enabled=True, metrics=True, sample_rate=1.0,
+                            tracer=self.tracer)
+
+    def tearDown(self):
+        telemetry.configure(enabled=True, metrics=True, sample_rate=1.0,
+                            tracer=telemetry._UNRESOLVED)
+        telemetry.reset()
+
+    def test_phases_are_recorded(self):
+        ps = ParsedSoap(ENVELOPE)
+        self.assertEqual("hello", ps.Parse(TC.String("value")))
+        SoapWriter().serialize("hello", TC.String("value"))
+        phases = telemetry.snapshot()["phases"]
+        for phase in ("parse", "typecode_parse", "serialize"):
+            self.assertEqual(1, phases[phase]["count"], phase)
+            self.assertEqual(1, phases[phase]["buckets"]["+Inf"])
+        self.assertEqual(0, phases["dispatch"]["count"])
+        self.assertEqual(["zsi.parse.document", "zsi.parse.body",
+                          "zsi.serialize.body"], self.tracer.names)
+        json.dumps(telemetry.snapshot())
+
+    def test_head_sampling(self):
+        telemetry.configure(sample_rate=0.0)
+        with telemetry.span("outer", phase="dispatch"):
+            with telemetry.span("inner"):
+                pass
+        self.assertEqual([], self.tracer.names)
+        self.assertEqual(1, telemetry.snapshot()["phases"]["dispatch"]["count"])
+
+        # Nested spans follow the outermost span's decision.
+        draws = iter([0.1, 0.9, 0.9])
+        telemetry.configure(sample_rate=0.5)
+        real_random, telemetry.random.random = telemetry.random.random, lambda: next(draws)
+        try:
+            with telemetry.span("outer"):
+                with telemetry.span("inner"):
+                    pass
+            with telemetry.span("unsampled"):
+                pass
+        finally:
+            telemetry.random.random = real_random
+        self.assertEqual(["outer", "inner"], self.tracer.names)
+
+    def test_disabled_is_a_shared_no_op(self):
+        telemetry.configure(enabled=False)
+        self.assertIs(telemetry.span("a"), telemetry.span("b", phase="parse"))
+        with telemetry.span("a", phase="parse") as handle:
+            self.assertIs(None, handle)
+        self.assertEqual(0, telemetry.snapshot()["phases"]["parse"]["count"])
+
+    def test_prometheus_text(self):
+        telemetry.observe("transport_wait", 0.003)
+        telemetry.observe("transport_wait", 20.0)
+        text = telemetry.render_prometheus()
+        self.assertTrue('zsi_phase_duration_seconds_bucket{phase="transport_wait",le="0.0025"} 0' in text)
+        self.assertTrue('zsi_phase_duration_seconds_bucket{phase="transport_wait",le="0.005"} 1' in text)
+        self.assertTrue('zsi_phase_duration_seconds_bucket{phase="transport_wait",le="+Inf"} 2' in text)
+        self.assertTrue('zsi_phase_duration_seconds_count{phase="transport_wait"} 2' in text)
+
+        started = []
+        body = telemetry.metrics_app({"PATH_INFO": "/metrics.json"},
+                                     lambda status, headers: started.append(headers))
+        self.assertEqual(2, json.loads(body[0])["phases"]["transport_wait"]["count"])
+        self.assertEqual("application/json", dict(started[0])["Content-Type"])
+
+
+def makeTestSuite():
+    return unittest.defaultTestLoader.loadTestsFromTestCase(TelemetryMetricsTests)
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+import datetime
+import unittest
+
+from ZSI import ParsedSoap, TC, EvaluateException
+from ZSI.TCtimes import _dict_to_tuple, _parse_duration, _parse_gregorian, \
+    _scan_lexical
+
+ENVELOPE = """<SOAP-ENV:Envelope
+    xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/">
+<SOAP-ENV:Body><when/></SOAP-ENV:Body>
+</SOAP-ENV:Envelope>"""
+
+
+class TemporalCodecTests(unittest.TestCase):
+    def test_scanner_matches_lex_pattern(self):
+        for tc, text in ((TC.gDateTime(), "1968-04-02T13:20:15.511+02:00"),
+                         (TC.gDate(), "-0045-01-01Z"),
+                         (TC.gTime(), "13:20:30.5555")):
+            scan = tc._scan
+            self.assertIsNot(None, _scan_lexical(text, *scan[1:]))
+            d = tc.lex_pattern.match(text).groupdict()
+            self.assertEqual(_dict_to_tuple(d),
+                             _scan_lexical(text, *scan[1:])[0])
+
+    def test_unusual_forms_fall_back_to_regex(self):
+        tc = TC.gDate()
+        self.assertIs(None, _scan_lexical("11968-04-02", True, False))
+        self.assertEqual((11968, 4, 2), tc.text_to_data("11968-04-02", None, None)[:3])
+        ps = ParsedSoap(ENVELOPE)
+        for text in ("1968-4-2", "1968-04-02 ", "1968/04/02"):
+            self.assertRaises(EvaluateException, tc.text_to_data, text, ps.body_root, ps)
+
+    def test_repeated_values_are_cached(self):
+        _parse_gregorian.cache_clear()
+        tc = TC.gDate()
+        for _ in range(3):
+            self.assertEqual((2024, 2, 29, 0, 0, 0, 0, 0, 0),
+                             tc.text_to_data("2024-02-29", None, None))
+        info = _parse_gregorian.cache_info()
+        self.assertEqual((2, 1), (info.hits, info.misses))
+
+    def test_native_pyclass(self):
+        tc = TC.gDateTime(pyclass=datetime.datetime)
+        value = tc.text_to_data("2002-10-10T17:00:00.25Z", None, None)
+        self.assertTrue(isinstance(value, datetime.datetime))
+        self.assertEqual("2002-10-10T17:00:00.250Z", tc.get_formatted_content(value))
+        aware = datetime.datetime(2002, 10, 10, 12, tzinfo=datetime.timezone(datetime.timedelta(hours=-5)))
+        self.assertEqual("2002-10-10T17:00:00Z", tc.get_formatted_content(aware))
+
+        tc = TC.gDate(pyclass=datetime.date)
+        self.assertEqual(datetime.date(1984, 10, 30), tc.text_to_data("1984-10-30", None, None))
+        self.assertEqual("1984-10-30", tc.get_formatted_content(datetime.date(1984, 10, 30)))
+
+    def test_duration(self):
+        _parse_duration.cache_clear()
+        tc = TC.Duration()
+        self.assertEqual((1, 2, 3, 4, 5, 6, 0, 0, 0), tc.text_to_data("P1Y2M3DT4H5M6S", None, None))
+        self.assertEqual((None, None, None, 0, 0, 1, 500, 0, 0), tc.text_to_data("PT1.5S", None, None))
+        self.assertEqual((-1, None, None, 0, 0, 0, 0, 0, 0), tc.text_to_data("-P1Y", None, None))
+        self.assertRaises(EvaluateException, tc.text_to_data, "P1YT", None, None)
+        ps = ParsedSoap(ENVELOPE)
+        self.assertRaises(EvaluateException, tc.text_to_data, "P1.5Y", ps.body_root, ps)
+        self.assertEqual("P1Y2M3DT4H5M6S", tc.get_formatted_content((1, 2, 3, 4, 5, 6, 0, 0, 0)))
+
+
+def makeTestSuite():
+    return unittest.defaultTestLoader.loadTestsFromTestCase(TemporalCodecTests)
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")
@@ -10,7 +10,7 @@ class _FakeConnection:
         self.request = None
         self.body = None
 
-    def putrequest(self, method, uri):
+    def putrequest(self, method, uri, skip_host=False, skip_accept_encoding=False):
         self.request = (method, uri)
 
     def putheader(self, key, value):
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+import io
+import unittest
+
+from ZSI import TC, ParsedSoap, SoapWriter
+from ZSI.TCcompound import ComplexType
+from ZSI.profiling import TypecodeProfiler
+
+
+class Person:
+    pass
+
+
+class Team:
+    pass
+
+
+Person.typecode = TC.Struct(Person, [TC.String("name"), TC.Integer("age")], "person")
+Team.typecode = TC.Struct(Team, [TC.String("title"), TC.Struct(Person, [
+    TC.String("name"), TC.Integer("age")], "lead")], "team")
+
+MESSAGE = """<SOAP-ENV:Envelope
+    xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/">
+<SOAP-ENV:Body><team><title>core</title>
+<lead><name>ada</name><age>36</age></lead></team></SOAP-ENV:Body>
+</SOAP-ENV:Envelope>"""
+
+
+class TypecodeProfilerTests(unittest.TestCase):
+    def parse(self):
+        return ParsedSoap(MESSAGE).Parse(Team.typecode)
+
+    def test_parse_is_charged_per_typecode(self):
+        with TypecodeProfiler() as profiler:
+            team = self.parse()
+        self.assertEqual("ada", team.lead.name)
+        stats = {s.key: s for s in profiler.stats()}
+        # Struct.parse is ComplexType.parse: one call per element, not two.
+        self.assertEqual(1, stats[("Struct", None, "team")].calls)
+        self.assertEqual(1, stats[("Struct", None, "lead")].calls)
+        self.assertEqual(2, stats[("String", None, "name")].calls
+                         + stats[("String", None, "title")].calls)
+        outer = stats[("Struct", None, "team")]
+        self.assertGreaterEqual(outer.inclusive, outer.exclusive)
+        self.assertGreaterEqual(outer.inclusive, stats[("Struct", None, "lead")].inclusive)
+
+    def test_serialize_and_collapsed_stacks(self):
+        person = Person()
+        person.name, person.age = "ada", 36
+        with TypecodeProfiler() as profiler:
+            str(SoapWriter().serialize(person, Person.typecode))
+        out = io.StringIO()
+        profiler.write_collapsed(out)
+        lines = out.getvalue().splitlines()
+        self.assertIn("Struct(person);String(name)",
+                      [line.rsplit(" ", 1)[0] for line in lines])
+        for line in lines:
+            self.assertTrue(line.rsplit(" ", 1)[1].isdigit())
+
+    def test_report_is_sorted(self):
+        with TypecodeProfiler() as profiler:
+            self.parse()
+        rows = profiler.stats("calls")
+        self.assertEqual(sorted((s.calls for s in rows), reverse=True),
+                         [s.calls for s in rows])
+        report = profiler.report("inclusive", limit=2)
+        self.assertEqual(3, len(report.splitlines()))
+        self.assertIn("Struct(team)", report)
+        self.assertRaises(ValueError, profiler.stats, "bogus")
+
+    def test_disable_restores_methods(self):
+        parse = ComplexType.__dict__["parse"]
+        profiler = TypecodeProfiler()
+        with profiler:
+            self.assertIsNot(parse, ComplexType.__dict__["parse"])
+            self.assertRaises(RuntimeError, TypecodeProfiler().enable)
+        self.assertIs(parse, ComplexType.__dict__["parse"])
+        self.parse()
+        self.assertEqual([], profiler.stats())
+
+    def test_sampling(self):
+        with TypecodeProfiler(sample_rate=0.0) as profiler:
+            self.parse()
+        self.assertEqual([], profiler.stats())
+        self.assertRaises(ValueError, TypecodeProfiler, sample_rate=2)
+
+
+def makeTestSuite():
+    return unittest.defaultTestLoader.loadTestsFromTestCase(TypecodeProfilerTests)
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")
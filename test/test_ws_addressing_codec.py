@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+import unittest
+from unittest import mock
+
+from ZSI import TC, ParsedSoap, SoapWriter, address
+from ZSI.address import Address, GetWSACodec
+from ZSI.schema import ElementDeclaration, TypeDefinition
+from ZSI.TCcompound import ComplexType
+from ZSI.wstools.Namespaces import WSA200408
+
+WSA = WSA200408.ADDRESS
+
+
+class EndpointReferenceType_Def(ComplexType, TypeDefinition):
+    schema = WSA
+    type = (schema, "EndpointReferenceType")
+
+    def __init__(self, pname, **kw):
+        ComplexType.__init__(self, None, [TC.URI((WSA, "Address"), aname="_Address")],
+                             pname=pname, **kw)
+
+        class Holder:
+            typecode = self
+        self.pyclass = Holder
+
+
+class _URIHeader(TC.URI):
+    def __init__(self, **kw):
+        kw.setdefault("minOccurs", 0)
+        TC.URI.__init__(self, (WSA, self.literal), **kw)
+
+        class Holder(str):
+            typecode = self
+        self.pyclass = Holder
+
+
+class MessageID_Dec(_URIHeader, ElementDeclaration):
+    schema, literal = WSA, "MessageID"
+
+
+class Action_Dec(_URIHeader, ElementDeclaration):
+    schema, literal = WSA, "Action"
+
+
+class To_Dec(_URIHeader, ElementDeclaration):
+    schema, literal = WSA, "To"
+
+
+class RelatesTo_Dec(_URIHeader, ElementDeclaration):
+    schema, literal = WSA, "RelatesTo"
+
+
+class From_Dec(EndpointReferenceType_Def, ElementDeclaration):
+    schema, literal = WSA, "From"
+
+    def __init__(self, **kw):
+        EndpointReferenceType_Def.__init__(self, (WSA, "From"), **kw)
+
+
+class CodecTests(unittest.TestCase):
+    def test_codec_resolved_once(self):
+        codec = GetWSACodec(WSA)
+        self.assertIs(codec, GetWSACodec(WSA))
+        self.assertIs(codec, Address(wsAddressURI=WSA).codec)
+        self.assertIs(codec.typecode("Action"), codec.typecode("Action"))
+        self.assertEqual(WSA200408.ANONYMOUS, codec.anonymousURI)
+        self.assertIs(EndpointReferenceType_Def, codec.endPointReferenceType)
+
+    def test_message_ids_are_unique_uuids(self):
+        codec = GetWSACodec(WSA)
+        ids = set(codec.newMessageID() for i in range(100))
+        self.assertEqual(100, len(ids))
+        self.assertTrue(all(i.startswith("urn:uuid:") for i in ids))
+
+    def test_request_round_trip(self):
+        client = Address("http://example.org/echo", wsAddressURI=WSA)
+        client.setRequest(None, "urn:echo")
+        sw = SoapWriter()
+        sw.serialize("ping", TC.String("echo"))
+        client.serialize(sw)
+        ps = ParsedSoap(str(sw))
+
+        server = Address(wsAddressURI=WSA)
+        server.parse(ps)
+        self.assertEqual(client.getMessageID(), server.getMessageID())
+        self.assertEqual("urn:echo", server.getAction())
+        self.assertEqual("http://example.org/echo", server._addressTo)
+        self.assertEqual(WSA200408.ANONYMOUS, server._from._Address)
+
+        reply = Address(action="urn:echo", wsAddressURI=WSA)
+        reply.setResponseFromWSAddress(server, "http://example.org/echo")
+        sw = SoapWriter()
+        sw.serialize("pong", TC.String("echoResponse"))
+        reply.serialize(sw)
+        client.checkResponse(ParsedSoap(str(sw)), "urn:echo")
+
+
+class CheckFromTests(unittest.TestCase):
+    def setUp(self):
+        address._host_addresses.clear()
+
+    def from_(self, url):
+        return GetWSACodec(WSA).endpoint("From", url)
+
+    def test_equivalent_hosts_resolved_once(self):
+        a = Address("http://server.example:8080/echo", wsAddressURI=WSA)
+        hosts = {"server.example": "10.0.0.1", "alias.example": "10.0.0.1"}
+        with mock.patch("socket.gethostbyname", side_effect=hosts.get) as lookup:
+            for i in range(5):
+                a._checkFrom(self.from_("http://alias.example:8080/echo"))
+        self.assertEqual(2, lookup.call_count)
+
+    def test_same_name_needs_no_lookup(self):
+        a = Address("http://server.example/echo", wsAddressURI=WSA)
+        with mock.patch("socket.gethostbyname") as lookup:
+            a._checkFrom(self.from_("http://SERVER.example:80/echo"))
+        self.assertFalse(lookup.called)
+
+    def test_mismatch(self):
+        a = Address("http://server.example/echo", wsAddressURI=WSA)
+        hosts = {"server.example": "10.0.0.1", "other.example": "10.0.0.2"}
+        with mock.patch("socket.gethostbyname", side_effect=hosts.get):
+            self.assertRaises(Exception, a._checkFrom, self.from_("http://other.example/echo"))
+
+        def unknown(host):
+            raise OSError(host)
+        address._host_addresses.clear()
+        with mock.patch("socket.gethostbyname", side_effect=unknown):
+            self.assertRaises(Exception, a._checkFrom, self.from_("http://other.example/echo"))
+
+
+def makeTestSuite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(CodecTests))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(CheckFromTests))
+    return suite
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")
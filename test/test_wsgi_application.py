@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+import io
+import unittest
+from email import message_from_bytes
+from wsgiref.util import FileWrapper, setup_testing_defaults
+from wsgiref.validate import validator
+
+from ZSI import TC, ParsedSoap, SoapWriter
+from ZSI.TCapache import AttachmentRef
+from ZSI.parse import IncrementalReader
+from ZSI.wsgi import SOAPApplication, soapmethod
+
+
+class EchoRequest:
+    pass
+
+
+class EchoResponse:
+    pass
+
+
+EchoRequest.typecode = TC.Struct(EchoRequest, [TC.String("value")], ("urn:echo", "Echo"))
+EchoResponse.typecode = TC.Struct(EchoResponse, [TC.String("value")],
+                                  ("urn:echo", "EchoResponse"))
+
+
+class FileResponse:
+    pass
+
+
+FileResponse.typecode = TC.Struct(FileResponse, [AttachmentRef("file")],
+                                  ("urn:echo", "FileResponse"))
+
+
+class EchoService(SOAPApplication):
+    chunk_size = 16
+
+    @soapmethod(EchoRequest.typecode, EchoResponse.typecode)
+    def soap_Echo(self, request, response):
+        if request.value == "boom":
+            raise ValueError("boom")
+        response.value = request.value * 100
+        return request, response
+
+
+def request_body(value):
+    req = EchoRequest()
+    req.value = value
+    return str(SoapWriter().serialize(req, EchoRequest.typecode)).encode("utf-8")
+
+
+class _Input(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.reads = []
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.reads.append(len(data))
+        return data
+
+
+class WSGIApplicationTests(unittest.TestCase):
+    def call(self, app, body, method="POST", **env):
+        stream = _Input(body)
+        environ = {"REQUEST_METHOD": method, "wsgi.input": stream, "QUERY_STRING": "",
+                   "CONTENT_LENGTH": str(len(body)), "CONTENT_TYPE": "text/xml"}
+        environ.update(env)
+        setup_testing_defaults(environ)
+        status = []
+        result = validator(app)(environ, lambda s, h, *a: status.append((s, dict(h))))
+        try:
+            data = b"".join(result)
+        finally:
+            result.close()
+        return status[0][0], status[0][1], data, stream
+
+    def test_request_is_read_in_chunks_and_reply_streamed(self):
+        app = EchoService()
+        body = request_body("ab")
+        status, headers, data, stream = self.call(app, body)
+        self.assertEqual("200 OK", status)
+        self.assertTrue(all(n <= 16 for n in stream.reads))
+        self.assertEqual(len(body), sum(stream.reads))
+        self.assertEqual(str(len(data)), headers["Content-Length"])
+        self.assertEqual("ab" * 100, ParsedSoap(data).Parse(EchoResponse.typecode).value)
+
+    def test_handler_errors_become_faults(self):
+        status, headers, data, stream = self.call(EchoService(), request_body("boom"))
+        self.assertEqual("500 Internal Server Error", status)
+        self.assertIn(b"boom", data)
+        self.assertTrue(ParsedSoap(data).IsAFault())
+
+        status, headers, data, stream = self.call(EchoService(), b"<not-xml")
+        self.assertEqual("500 Internal Server Error", status)
+        self.assertTrue(ParsedSoap(data).IsAFault())
+
+    def test_get_is_not_allowed(self):
+        status, headers, data, stream = self.call(EchoService(), b"", method="GET")
+        self.assertEqual("405 Method Not Allowed", status)
+        self.assertEqual("POST", headers["Allow"])
+
+    def test_attachments_are_sent_through_file_wrapper(self):
+        attachment = io.BytesIO(b"\x00binary\xff" * 10)
+        wrapped = []
+
+        class FileService(SOAPApplication):
+            @soapmethod(EchoRequest.typecode, FileResponse.typecode)
+            def soap_Echo(self, request, response):
+                response.file = attachment
+                return request, response
+
+        def file_wrapper(f, size):
+            wrapped.append(f)
+            return FileWrapper(f, size)
+
+        status, headers, data, stream = self.call(
+            FileService(), request_body("x"), **{"wsgi.file_wrapper": file_wrapper})
+        self.assertEqual("200 OK", status)
+        self.assertEqual(1, len(wrapped))
+        message = message_from_bytes(
+            b"Content-Type: " + headers["Content-Type"].encode() + b"\r\n\r\n" + data)
+        soap, part = message.get_payload()
+        self.assertEqual(message.get_param("start"), soap["Content-Id"])
+        self.assertIn(b"cid:%d" % id(attachment), soap.get_payload(decode=True))
+        self.assertEqual(attachment.getvalue(), part.get_payload(decode=True))
+
+
+class IncrementalReaderTests(unittest.TestCase):
+    def test_fed_document_parses_like_a_string(self):
+        body = request_body("incremental")
+        reader = IncrementalReader()
+        for i in range(0, len(body), 7):
+            reader.feed(body[i:i + 7])
+        ps = ParsedSoap(reader.close())
+        self.assertEqual("incremental", ps.Parse(EchoRequest.typecode).value)
+
+
+def makeTestSuite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(WSGIApplicationTests))
+    suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(IncrementalReaderTests))
+    return suite
+
+
+if __name__ == "__main__":
+    unittest.main(defaultTest="makeTestSuite")